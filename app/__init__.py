@@ -1,3 +1,4 @@
+import atexit
 import logging
 import sys
 import time
@@ -8,7 +9,13 @@ from flasgger import Swagger
 from flask import Flask, g, request
 from flask_wtf.csrf import CSRFProtect
 
-from app.services import model_registry
+from app.services import (
+    client_pool,
+    gemini_context_cache,
+    model_registry,
+    rate_limiter,
+    response_cache,
+)
 from config import get_config
 
 logger = logging.getLogger(__name__)
@@ -65,6 +72,23 @@ def create_app(config_class=None):
         CSRFProtect(app)
         logger.info("CSRF protection enabled")
 
+    # Opt-in response/step caches shared by all requests handled by this app.
+    cache = response_cache.from_config(app.config)
+    if cache is not None:
+        app.extensions["response_cache"] = cache
+        logger.info("Response cache enabled (backend=%s)", cache.backend_name)
+    step_cache = response_cache.step_cache_from_config(app.config)
+    if step_cache is not None:
+        app.extensions["few_shot_step_cache"] = step_cache
+        logger.info("Few-shot step cache enabled (backend=%s)", step_cache.backend_name)
+
+    # Size the process-wide provider client pool, model-list cache, provider
+    # limiter registry and Gemini context-cache handles.
+    client_pool.configure(app.config)
+    model_registry.configure(app.config)
+    rate_limiter.configure(app.config)
+    gemini_context_cache.configure(app.config)
+
     # Register blueprints
     from app.api import bp as api_bp
 
@@ -72,12 +96,29 @@ def create_app(config_class=None):
     logger.info("Blueprints registered")
 
     # Warm the provider model cache once at startup using configured provider
-    # environment keys. Subsequent refreshes are triggered explicitly by /models.
+    # environment keys. Afterwards a background thread keeps every known
+    # key's list fresh, so requests only read memory (see model_registry).
     try:
         model_registry.refresh_model_cache()
         logger.info("Provider model cache warmed at startup")
     except Exception as e:
         logger.warning("Failed to warm provider model cache at startup: %s", e)
+    if app.config.get("MODEL_REFRESH_ENABLED", True):
+        model_registry.start_background_refresh()
+
+    # Run queued internal async jobs from startup, not only after the first
+    # submit reaches this process; the pool is also started lazily on submit
+    # if Redis is unavailable here.
+    if app.config.get("INTERNAL_ASYNC_ENABLED", True) and app.config.get(
+        "ASYNC_JOB_WORKERS_AUTOSTART", True
+    ):
+        from app.api.routes import start_job_workers, stop_job_workers
+
+        try:
+            start_job_workers(app)
+        except Exception as e:
+            logger.warning("Failed to start async job workers at startup: %s", e)
+        atexit.register(stop_job_workers, app)
 
     # Flasgger / OpenAPI setup.
     swagger_template = {
@@ -1,15 +1,18 @@
+import json
 import logging
 import threading
 import time
 
 import prometheus_client
 from flasgger import swag_from
-from flask import current_app, jsonify, request
+from flask import current_app, jsonify, request, stream_with_context
 
 from app.api import bp
-from app.services import model_registry
-from app.services.async_jobs import AsyncJobStore
+from app.services import model_registry, rate_limiter
+from app.services.async_jobs import TERMINAL_STATUSES, AsyncJobStore
+from app.services.job_queue import JobQueue, JobWorkerPool
 from app.services.llm_service import EmptyResponseError, LLMService
+from app.utils.prompt_builder import PromptTooLargeError
 
 logger = logging.getLogger(__name__)
 
@@ -23,18 +26,93 @@ REQUEST_LATENCY = prometheus_client.Histogram(
 
 # Single, stateless LLMService instance shared across requests. Building it once
 # avoids re-reading and re-parsing the few-shot template file on every request
-# (the per-call provider clients are still created inside each call_* method,
-# keeping per-request API keys isolated).
+# (provider clients are pooled per API key in app.services.client_pool, keeping
+# per-request API keys isolated).
 _llm_service = LLMService()
 _SUPPORTED_PROMPTING_STRATEGIES = {"zero_shot", "few_shot"}
+_JOB_WORKERS_LOCK = threading.Lock()
+
+
+def _job_store(app=None):
+    """Return the app's AsyncJobStore, built once and reused across requests."""
+    app = app or current_app
+    store = app.extensions.get("async_job_store")
+    if store is None:
+        store = AsyncJobStore(
+            redis_url=app.config["REDIS_URL"],
+            ttl_seconds=app.config.get("ASYNC_JOB_TTL_SECONDS", 3600),
+            use_mock=app.config.get("REDIS_USE_MOCK", False),
+        )
+        app.extensions["async_job_store"] = store
+    return store
 
 
-def _job_store():
-    return AsyncJobStore(
-        redis_url=current_app.config["REDIS_URL"],
-        ttl_seconds=current_app.config.get("ASYNC_JOB_TTL_SECONDS", 3600),
-        use_mock=current_app.config.get("REDIS_USE_MOCK", False),
-    )
+def start_job_workers(app):
+    """Start ``app``'s async job worker pool unless it is already running.
+
+    ``create_app`` calls this at startup so jobs left in Redis by a previous
+    process (and orphans it recovers) run without waiting for a new submit.
+    """
+    with _JOB_WORKERS_LOCK:
+        pool = app.extensions.get("async_job_workers")
+        if pool is None:
+            store = _job_store(app)
+            pool = JobWorkerPool(
+                app,
+                store,
+                JobQueue(
+                    store.client,
+                    max_depth=app.config.get("ASYNC_JOB_QUEUE_MAX_DEPTH", 1000),
+                    credential_ttl_seconds=app.config.get(
+                        "ASYNC_JOB_TTL_SECONDS", 3600
+                    ),
+                    use_mock=app.config.get("REDIS_USE_MOCK", False),
+                ),
+                _run_async_generate,
+                threads=app.config.get("ASYNC_JOB_WORKER_THREADS", 4),
+                poll_seconds=app.config.get("ASYNC_JOB_POLL_SECONDS", 1.0),
+                heartbeat_seconds=app.config.get("ASYNC_JOB_HEARTBEAT_SECONDS", 30),
+                max_attempts=app.config.get("ASYNC_JOB_MAX_ATTEMPTS", 2),
+                provider_limits=app.config.get("ASYNC_JOB_PROVIDER_CONCURRENCY"),
+            )
+            pool.start()
+            app.extensions["async_job_workers"] = pool
+    return pool
+
+
+def stop_job_workers(app):
+    """Stop ``app``'s async job worker pool, if one was started."""
+    with _JOB_WORKERS_LOCK:
+        pool = app.extensions.pop("async_job_workers", None)
+    if pool is not None:
+        pool.stop()
+
+
+def _job_workers():
+    """Return this process's async job worker pool, starting it on first use."""
+    return start_job_workers(current_app._get_current_object())
+
+
+def _response_cache():
+    """Return the app's opt-in response cache, or None when disabled."""
+    return current_app.extensions.get("response_cache")
+
+
+def _step_cache():
+    """Return the app's opt-in few-shot step cache, or None when disabled."""
+    return current_app.extensions.get("few_shot_step_cache")
+
+
+def _cache_bypass_requested():
+    """Return True when the caller asked to skip cached responses.
+
+    Either ``X-Cache-Bypass: true`` or ``Cache-Control: no-cache`` forces a
+    fresh provider call (few-shot step memoization is skipped as well); the
+    fresh response still refreshes the response cache entry.
+    """
+    bypass = request.headers.get("X-Cache-Bypass", "").strip().lower()
+    cache_control = request.headers.get("Cache-Control", "").lower()
+    return bypass in {"1", "true", "yes", "on"} or "no-cache" in cache_control
 
 
 def _validate_generate_payload(api_key, data):
@@ -62,16 +140,9 @@ def _validate_generate_payload(api_key, data):
 
     provider = data["provider"]
     model = data["model"]
-    try:
-        model_registry.refresh_model_cache(provider=provider, api_key=api_key)
-    except Exception as refresh_err:
-        logger.warning(
-            "Model cache refresh failed for provider %s: %s",
-            provider,
-            refresh_err,
-        )
-
-    if not model_registry.is_valid(provider, model):
+    # Checked against the caller's key's model list from the registry's TTL
+    # cache, so validation does not call the provider on every request.
+    if not model_registry.is_valid(provider, model, api_key=api_key):
         return _v2_error(
             400,
             "invalid_provider",
@@ -81,10 +152,13 @@ def _validate_generate_payload(api_key, data):
     return None
 
 
-def _run_async_generate(app, job_id, api_key, data):
+def _run_async_generate(app, job_id, api_key, data, use_cached=True):
     with app.app_context():
         store = _job_store()
-        store.update_status(job_id, "running")
+        if not store.update_status(job_id, "running", expected_status="queued"):
+            # Expired, or already picked up/finished by another worker.
+            logger.warning("Skipping async job %s: not in queued state", job_id)
+            return
         try:
             raw_response = _llm_service.generate(
                 api_key=api_key,
@@ -93,34 +167,24 @@ def _run_async_generate(app, job_id, api_key, data):
                 user_text=data["user_text"],
                 system_prompt=current_app.config["SYSTEM_PROMPT"],
                 prompting_strategy=data.get("prompting_strategy", "zero_shot"),
+                response_cache=_response_cache(),
+                use_cached=use_cached,
+                step_cache=_step_cache() if use_cached else None,
             )
             store.update_status(
                 job_id,
                 "succeeded",
                 result={"raw_response": raw_response},
                 error=None,
-            )
-        except EmptyResponseError as e:
-            store.update_status(
-                job_id,
-                "failed",
-                error={
-                    "code": "invalid_request",
-                    "message": "The LLM provider returned an empty response.",
-                    "detail": str(e),
-                },
+                expected_status="running",
             )
         except Exception as e:
-            error_code = "rate_limited" if _is_quota_error(e) else "upstream_error"
-            error_message = (
-                "Provider quota or rate limit exceeded. Try again later or use another model."
-                if error_code == "rate_limited"
-                else "The LLM provider call failed."
-            )
+            _, error_code, error_message = _classify_generate_error(e)
             store.update_status(
                 job_id,
                 "failed",
                 error={"code": error_code, "message": error_message, "detail": str(e)},
+                expected_status="running",
             )
 
 
@@ -150,17 +214,32 @@ def _extract_bearer_key():
     return None
 
 
-def _is_quota_error(exc):
-    """Return True for provider quota/rate-limit style exceptions."""
-    text = str(exc or "").lower()
-    indicators = (
-        "quota",
-        "resourceexhausted",
-        "too many requests",
-        "rate limit",
-        "perday",
-    )
-    return any(token in text for token in indicators)
+def _classify_generate_error(exc):
+    """Map a generation failure to ``(http_status, error_code, message)``."""
+    if isinstance(exc, EmptyResponseError):
+        return 400, "invalid_request", "The LLM provider returned an empty response."
+    if isinstance(exc, PromptTooLargeError):
+        return (
+            400,
+            "invalid_request",
+            f"user_text is too long for the selected model. {exc}",
+        )
+    if isinstance(exc, rate_limiter.ProviderBusyError):
+        return (
+            429,
+            "rate_limited",
+            "Too many requests are waiting for this provider. Try again later.",
+        )
+    if rate_limiter.is_rate_limit_error(exc):
+        return (
+            429,
+            "rate_limited",
+            (
+                "Provider quota or rate limit exceeded. "
+                "Try again later or use another model."
+            ),
+        )
+    return 500, "upstream_error", "The LLM provider call failed."
 
 
 @bp.route("/generate", methods=["POST"])
@@ -170,6 +249,18 @@ def _is_quota_error(exc):
         "summary": "Generate process model",
         "description": "Generate a structured BPMN JSON model from process text.",
         "security": [{"bearerAuth": []}],
+        "parameters": [
+            {
+                "name": "X-Cache-Bypass",
+                "in": "header",
+                "required": False,
+                "schema": {"type": "boolean"},
+                "description": (
+                    "Skip the response cache lookup (when the cache is enabled). "
+                    "Cache-Control: no-cache has the same effect."
+                ),
+            }
+        ],
         "requestBody": {
             "required": True,
             "content": {
@@ -186,6 +277,14 @@ def _is_quota_error(exc):
                                 "enum": ["zero_shot", "few_shot"],
                                 "default": "zero_shot",
                             },
+                            "stream": {
+                                "type": "boolean",
+                                "default": False,
+                                "description": (
+                                    "Relay output as Server-Sent Events "
+                                    "(zero_shot only)."
+                                ),
+                            },
                         },
                     }
                 }
@@ -200,7 +299,16 @@ def _is_quota_error(exc):
                             "type": "object",
                             "properties": {"raw_response": {"type": "string"}},
                         }
-                    }
+                    },
+                    "text/event-stream": {
+                        "schema": {
+                            "type": "string",
+                            "description": (
+                                "With stream=true: chunk events {text}, then a "
+                                "done event {raw_response} or an error event."
+                            ),
+                        }
+                    },
                 },
             },
             "400": {"description": "Invalid request or provider/model"},
@@ -230,16 +338,41 @@ def generate():
         provider = data["provider"]
         model = data["model"]
         prompting_strategy = data.get("prompting_strategy", "zero_shot")
+        stream = data.get("stream", False)
+        if not isinstance(stream, bool):
+            status = "400"
+            return _v2_error(400, "invalid_request", "stream must be a boolean.")
+        if stream and prompting_strategy != "zero_shot":
+            status = "400"
+            return _v2_error(
+                400,
+                "invalid_request",
+                "stream is only supported with prompting_strategy zero_shot.",
+            )
 
-        # Refresh the model cache with the caller's key so is_valid reflects
-        # the live model list for that key rather than a stale startup cache.
-        try:
-            model_registry.refresh_model_cache(provider=provider, api_key=api_key)
-        except Exception as refresh_err:
-            logger.warning(
-                "Model cache refresh failed for provider %s: %s",
+        use_cached = not _cache_bypass_requested()
+        if stream:
+            logger.info(
+                "Invoking LLMService.generate_stream (provider=%s, model=%s)",
                 provider,
-                refresh_err,
+                model,
+            )
+            chunks = _llm_service.generate_stream(
+                api_key=api_key,
+                provider=provider,
+                model=model,
+                user_text=data["user_text"],
+                system_prompt=current_app.config["SYSTEM_PROMPT"],
+                response_cache=_response_cache(),
+                use_cached=use_cached,
+            )
+            # Pull the first chunk here so failures before any output (auth,
+            # quota, empty response) still get a regular JSON error status.
+            first_chunk = next(chunks)
+            return current_app.response_class(
+                stream_with_context(_generate_events(first_chunk, chunks)),
+                mimetype="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
             )
 
         logger.info(
@@ -252,34 +385,22 @@ def generate():
             user_text=data["user_text"],
             system_prompt=current_app.config["SYSTEM_PROMPT"],
             prompting_strategy=prompting_strategy,
+            response_cache=_response_cache(),
+            use_cached=use_cached,
+            step_cache=_step_cache() if use_cached else None,
         )
         return jsonify({"raw_response": raw_response}), 200
 
     except Exception as e:
-        if isinstance(e, EmptyResponseError):
-            status = "400"
-            logger.warning("/generate rejected empty provider response: %s", e)
-            return _v2_error(
-                400,
-                "invalid_request",
-                "The LLM provider returned an empty response.",
-            )
-
-        if _is_quota_error(e):
-            status = "429"
+        status_code, error_code, message = _classify_generate_error(e)
+        status = str(status_code)
+        if status_code == 400:
+            logger.warning("/generate rejected request: %s", e)
+        elif status_code == 429:
             logger.warning("/generate provider quota exceeded: %s", e)
-            return _v2_error(
-                429,
-                "rate_limited",
-                (
-                    "Provider quota or rate limit exceeded. "
-                    "Try again later or use another model."
-                ),
-            )
-
-        status = "500"
-        logger.exception("/generate failed: %s", e)
-        return _v2_error(500, "upstream_error", "The LLM provider call failed.")
+        else:
+            logger.exception("/generate failed: %s", e)
+        return _v2_error(status_code, error_code, message)
     finally:
         REQUEST_COUNT.labels(method="POST", endpoint="/generate", status=status).inc()
         REQUEST_LATENCY.labels(method="POST", endpoint="/generate").observe(
@@ -287,6 +408,25 @@ def generate():
         )
 
 
+def _generate_events(first_chunk, chunks):
+    """SSE body for a streamed /generate: chunk events, then done or error."""
+    parts = [first_chunk]
+    yield _sse_event("chunk", {"text": first_chunk})
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield _sse_event("chunk", {"text": chunk})
+    except Exception as e:
+        status_code, error_code, message = _classify_generate_error(e)
+        if status_code == 500:
+            logger.exception("/generate stream failed: %s", e)
+        else:
+            logger.warning("/generate stream %s: %s", error_code, e)
+        yield _sse_event("error", {"error": {"code": error_code, "message": message}})
+        return
+    yield _sse_event("done", {"raw_response": "".join(parts).strip()})
+
+
 @bp.route("/internal/jobs/generate", methods=["POST"])
 def internal_generate_submit():
     """Internal-only async submit endpoint used by t2p orchestration."""
@@ -299,16 +439,16 @@ def internal_generate_submit():
     if validation_error is not None:
         return validation_error
 
+    # Cheap early rejection; the submit itself re-checks the depth atomically.
+    workers = _job_workers()
+    if workers.is_full():
+        return _queue_full_error()
+
     store = _job_store()
     job_id = store.create()
-
-    app_obj = current_app._get_current_object()
-    worker = threading.Thread(
-        target=_run_async_generate,
-        args=(app_obj, job_id, api_key, data),
-        daemon=True,
-    )
-    worker.start()
+    if not workers.submit(job_id, api_key, data, not _cache_bypass_requested()):
+        store.discard([job_id])
+        return _queue_full_error()
 
     return (
         jsonify(
@@ -322,28 +462,252 @@ def internal_generate_submit():
     )
 
 
+def _queue_full_error():
+    response, status_code = _v2_error(
+        503, "queue_full", "Too many queued jobs; retry later."
+    )
+    response.headers["Retry-After"] = "5"
+    return response, status_code
+
+
+@bp.route("/internal/jobs/generate:batch", methods=["POST"])
+def internal_generate_batch_submit():
+    """Internal-only batch submit: one queued job per item, tracked as a batch.
+
+    Each item has the /generate body shape and is validated like a single
+    submission; if any item is invalid nothing is queued and the per-item
+    errors are returned.
+    """
+    if not current_app.config.get("INTERNAL_ASYNC_ENABLED", True):
+        return _v2_error(404, "not_found", "Internal async endpoint is disabled.")
+
+    api_key = _extract_bearer_key()
+    if api_key is None:
+        return _v2_error(401, "unauthorized", "Missing or malformed Authorization header.")
+
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return _v2_error(400, "invalid_request", "items must be a non-empty array.")
+    max_items = current_app.config.get("ASYNC_BATCH_MAX_ITEMS", 500)
+    if len(items) > max_items:
+        return _v2_error(
+            400, "invalid_request", f"A batch may contain at most {max_items} items."
+        )
+
+    item_errors = []
+    for index, item in enumerate(items):
+        validation_error = _validate_generate_payload(api_key, item)
+        if validation_error is not None:
+            response, _ = validation_error
+            item_errors.append({"index": index, **response.get_json()["error"]})
+    if item_errors:
+        return (
+            jsonify(
+                {
+                    "error": {
+                        "code": "invalid_request",
+                        "message": f"{len(item_errors)} item(s) failed validation.",
+                        "items": item_errors,
+                    }
+                }
+            ),
+            400,
+        )
+
+    # Cheap early rejection; the submit itself re-checks the depth atomically.
+    workers = _job_workers()
+    if not workers.has_capacity(len(items)):
+        return _queue_full_error()
+
+    store = _job_store()
+    batch_id, job_ids = store.create_batch(len(items))
+    use_cached = not _cache_bypass_requested()
+    queued = workers.submit_many(
+        [
+            (job_id, api_key, item, use_cached)
+            for job_id, item in zip(job_ids, items)
+        ]
+    )
+    if not queued:
+        store.discard(job_ids, batch_id)
+        return _queue_full_error()
+
+    return (
+        jsonify(
+            {
+                "batch_id": batch_id,
+                "status": "queued",
+                "total": len(job_ids),
+                "job_ids": job_ids,
+                "status_url": f"/internal/jobs/batches/{batch_id}",
+            }
+        ),
+        202,
+    )
+
+
+@bp.route("/internal/jobs/batches/<batch_id>", methods=["GET"])
+def internal_generate_batch_status(batch_id):
+    """Internal-only batch status: aggregate counts plus a page of job results.
+
+    ``offset``/``limit`` select the page of items (in submission order);
+    ``next_offset`` is null on the last page.
+    """
+    if not current_app.config.get("INTERNAL_ASYNC_ENABLED", True):
+        return _v2_error(404, "not_found", "Internal async endpoint is disabled.")
+
+    page_max = current_app.config.get("ASYNC_BATCH_PAGE_MAX", 200)
+    offset = request.args.get("offset", 0, type=int)
+    limit = request.args.get("limit", min(100, page_max), type=int)
+    if offset < 0 or limit < 1:
+        return _v2_error(
+            400, "invalid_request", "offset must be >= 0 and limit must be >= 1."
+        )
+    limit = min(limit, page_max)
+
+    store = _job_store()
+    batch = store.get_batch(batch_id)
+    if batch is None:
+        return _v2_error(404, "not_found", "Unknown or expired batch id.")
+
+    job_ids = batch["job_ids"]
+    counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0, "expired": 0}
+    for status in store.get_statuses(job_ids):
+        key = status if status in counts else "expired"
+        counts[key] += 1
+    finished = counts["succeeded"] + counts["failed"] + counts["expired"]
+
+    page_ids = job_ids[offset : offset + limit]
+    items = []
+    for index, (job_id, payload) in enumerate(
+        zip(page_ids, store.get_many(page_ids)), start=offset
+    ):
+        if payload is None:
+            items.append({"index": index, "job_id": job_id, "status": "expired"})
+        else:
+            items.append({"index": index, **_job_status_body(payload)})
+
+    next_offset = offset + limit
+    return (
+        jsonify(
+            {
+                "batch_id": batch_id,
+                "created_at": batch["created_at"],
+                "total": batch["total"],
+                "counts": counts,
+                "done": finished == batch["total"],
+                "offset": offset,
+                "limit": limit,
+                "next_offset": next_offset if next_offset < len(job_ids) else None,
+                "items": items,
+            }
+        ),
+        200,
+    )
+
+
 @bp.route("/internal/jobs/<job_id>", methods=["GET"])
 def internal_generate_status(job_id):
     """Internal-only async status endpoint used by t2p orchestration."""
     if not current_app.config.get("INTERNAL_ASYNC_ENABLED", True):
         return _v2_error(404, "not_found", "Internal async endpoint is disabled.")
 
+    wait = request.args.get("wait")
+    if wait is not None:
+        try:
+            wait = float(wait)
+        except ValueError:
+            wait = -1.0
+        if wait < 0:
+            return _v2_error(
+                400, "invalid_request", "wait must be a non-negative number of seconds."
+            )
+        wait = min(wait, current_app.config.get("ASYNC_JOB_MAX_WAIT_SECONDS", 30))
+
+    store = _job_store()
+    payload = store.get(job_id)
+    if payload is None:
+        return _v2_error(404, "not_found", "Unknown or expired job id.")
+
+    if wait and payload["status"] not in TERMINAL_STATUSES:
+        # Long-poll: answer as soon as the job moves on (or wait expires).
+        payload = store.wait_for_change(job_id, payload["status"], wait)
+        if payload is None:
+            return _v2_error(404, "not_found", "Unknown or expired job id.")
+
+    return jsonify(_job_status_body(payload)), 200
+
+
+@bp.route("/internal/jobs/<job_id>/events", methods=["GET"])
+def internal_generate_events(job_id):
+    """Internal-only Server-Sent Events stream of a job's status changes.
+
+    Emits a ``status`` event with the status body on connect and on every
+    change, and closes after a terminal status (or ``timeout``/``expired``
+    events). Comment lines keep idle connections alive.
+    """
+    if not current_app.config.get("INTERNAL_ASYNC_ENABLED", True):
+        return _v2_error(404, "not_found", "Internal async endpoint is disabled.")
+
     store = _job_store()
     payload = store.get(job_id)
     if payload is None:
         return _v2_error(404, "not_found", "Unknown or expired job id.")
 
-    response = {
+    events = _job_events(
+        store,
+        job_id,
+        payload,
+        max_seconds=current_app.config.get("ASYNC_JOB_EVENTS_MAX_SECONDS", 600),
+        keepalive_seconds=current_app.config.get(
+            "ASYNC_JOB_EVENTS_KEEPALIVE_SECONDS", 15
+        ),
+    )
+    return current_app.response_class(
+        events,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _job_status_body(payload):
+    body = {
         "job_id": payload["job_id"],
         "status": payload["status"],
         "created_at": payload["created_at"],
         "updated_at": payload["updated_at"],
     }
     if payload.get("result") is not None:
-        response["result"] = payload["result"]
+        body["result"] = payload["result"]
     if payload.get("error") is not None:
-        response["error"] = payload["error"]
-    return jsonify(response), 200
+        body["error"] = payload["error"]
+    return body
+
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _job_events(store, job_id, payload, max_seconds, keepalive_seconds):
+    deadline = time.monotonic() + max_seconds
+    yield _sse_event("status", _job_status_body(payload))
+    while payload["status"] not in TERMINAL_STATUSES:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield _sse_event("timeout", {"job_id": job_id})
+            return
+        current = store.wait_for_change(
+            job_id, payload["status"], min(keepalive_seconds, remaining)
+        )
+        if current is None:
+            yield _sse_event("expired", {"job_id": job_id})
+            return
+        if current["status"] == payload["status"]:
+            yield ": keepalive\n\n"
+            continue
+        payload = current
+        yield _sse_event("status", _job_status_body(payload))
 
 
 @bp.route("/models", methods=["GET"])
@@ -382,20 +746,17 @@ def internal_generate_status(job_id):
 def models():
     """Return the advertised provider/model pairs from the registry.
 
-    If an ``Authorization: Bearer <key>`` header is present the key is used for
-    live discovery so the caller sees the model list available to their key.
-    Without a key the endpoint falls back to the env-level key (startup cache).
+    If an ``Authorization: Bearer <key>`` header is present the caller sees the
+    model list available to their key (discovered on first use, then cached
+    per key with a TTL). Without a key the env-level key's list is returned.
     """
     start_time = time.time()
     status = "200"
     try:
         provider = request.args.get("provider") or None
         api_key = _extract_bearer_key()
-        model_registry.refresh_model_cache(provider=provider, api_key=api_key)
-        return (
-            jsonify({"models": model_registry.get_cached_models(provider=provider)}),
-            200,
-        )
+        models = model_registry.get_cached_models(provider=provider, api_key=api_key)
+        return jsonify({"models": models}), 200
     except Exception as e:
         status = "500"
         logger.exception("/models failed: %s", e)
@@ -520,6 +881,8 @@ def provider_health():
         "summary": "Readiness probe",
         "description": (
             "Compact readiness check based on provider host connectivity. "
+            "Providers are probed concurrently and the result is reused for "
+            "READINESS_CACHE_SECONDS. "
             "Returns 200 when all providers are reachable, otherwise 503."
         ),
         "responses": {
@@ -533,8 +896,11 @@ def readiness_health():
     start_time = time.time()
     status = "200"
     try:
-        diagnostics = model_registry.provider_connectivity(
-            provider=None, timeout_seconds=3
+        # Serve the last probe result while it is fresh so frequent readiness
+        # checks do not each wait on provider round-trips.
+        diagnostics = model_registry.cached_provider_connectivity(
+            max_age_seconds=current_app.config.get("READINESS_CACHE_SECONDS", 10),
+            timeout_seconds=3,
         )
         all_reachable = all(item.get("reachable") for item in diagnostics)
 
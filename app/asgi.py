@@ -0,0 +1,182 @@
+"""ASGI application serving ``POST /generate`` natively on asyncio.
+
+The WSGI deployment holds one gunicorn thread per in-flight generation. Here,
+``/generate`` is handled by ``AsyncLLMService`` on the event loop, so a single
+process can keep many provider calls in flight. Every other path (models,
+health, jobs, docs, metrics) is delegated to the Flask app through asgiref's
+``WsgiToAsgi`` adapter, and ``/generate`` reuses the Flask route's validation
+and error mapping so the HTTP contract is identical to the WSGI entry point.
+Streamed ``/generate`` requests (``"stream": true``) are also served by Flask.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import request
+from werkzeug.test import EnvironBuilder
+
+from app.api import routes
+from app.services.async_llm_service import AsyncLLMService
+
+logger = logging.getLogger(__name__)
+
+
+async def _read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def _send_json(send, status_code, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _build_environ(scope, body):
+    headers = [
+        (name.decode("latin-1"), value.decode("latin-1"))
+        for name, value in scope.get("headers", [])
+    ]
+    return EnvironBuilder(
+        path=scope["path"],
+        method=scope["method"],
+        headers=headers,
+        data=body,
+        query_string=scope.get("query_string", b"").decode("latin-1"),
+    ).get_environ()
+
+
+def _relayed_by_flask(body):
+    """Return True for /generate bodies the Flask route must handle.
+
+    That is any body with a ``stream`` other than False: streamed generation,
+    and invalid ``stream`` values (so both entry points reject them alike).
+    """
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        return False
+    return isinstance(data, dict) and data.get("stream", False) is not False
+
+
+def _replay(body):
+    """Return an ASGI ``receive`` that yields an already-read request body."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    return receive
+
+
+async def _handle_generate(flask_app, service, scope, body, send):
+    start_time = time.time()
+    status = "200"
+    try:
+        with flask_app.request_context(_build_environ(scope, body)):
+            api_key = routes._extract_bearer_key()
+            data = request.get_json(silent=True)
+            # Validation may refresh the model registry (blocking I/O).
+            validation_error = await asyncio.to_thread(
+                routes._validate_generate_payload, api_key, data
+            )
+            if validation_error is not None:
+                response, status_code = validation_error
+                status = str(status_code)
+                await _send_json(send, status_code, response.get_json())
+                return
+
+            use_cached = not routes._cache_bypass_requested()
+            try:
+                raw_response = await service.generate(
+                    api_key=api_key,
+                    provider=data["provider"],
+                    model=data["model"],
+                    user_text=data["user_text"],
+                    system_prompt=flask_app.config["SYSTEM_PROMPT"],
+                    prompting_strategy=data.get("prompting_strategy", "zero_shot"),
+                    response_cache=routes._response_cache(),
+                    use_cached=use_cached,
+                    step_cache=routes._step_cache() if use_cached else None,
+                )
+            except Exception as e:
+                status_code, error_code, message = routes._classify_generate_error(e)
+                status = str(status_code)
+                if status_code == 500:
+                    logger.exception("/generate (asgi) failed: %s", e)
+                else:
+                    logger.warning("/generate (asgi) %s: %s", error_code, e)
+                await _send_json(
+                    send,
+                    status_code,
+                    {"error": {"code": error_code, "message": message}},
+                )
+                return
+
+        await _send_json(send, 200, {"raw_response": raw_response})
+    finally:
+        duration = time.time() - start_time
+        logger.info("POST /generate <- %s in %.3fs (asgi)", status, duration)
+        routes.REQUEST_COUNT.labels(
+            method="POST", endpoint="/generate", status=status
+        ).inc()
+        routes.REQUEST_LATENCY.labels(method="POST", endpoint="/generate").observe(
+            duration
+        )
+
+
+async def _handle_lifespan(flask_app, receive, send):
+    # The Flask app starts its job workers itself; stop them on shutdown so
+    # in-flight jobs finish (or are left for another process to requeue).
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.to_thread(routes.stop_job_workers, flask_app)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+def create_asgi_app(flask_app):
+    """Wrap ``flask_app`` in an ASGI app with a native async ``/generate``."""
+    wsgi_app = WsgiToAsgi(flask_app)
+    service = AsyncLLMService()
+
+    async def asgi_app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            await _handle_lifespan(flask_app, receive, send)
+            return
+        if (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"] == "/generate"
+        ):
+            body = await _read_body(receive)
+            if _relayed_by_flask(body):
+                await wsgi_app(scope, _replay(body), send)
+            else:
+                await _handle_generate(flask_app, service, scope, body, send)
+            return
+        await wsgi_app(scope, receive, send)
+
+    return asgi_app
@@ -1,4 +1,5 @@
 import json
+import logging
 import threading
 import time
 import uuid
@@ -14,6 +15,8 @@ except ImportError:  # pragma: no cover - optional dev/test dependency
     fakeredis = None
 
 
+logger = logging.getLogger(__name__)
+
 _MOCK_CLIENT_LOCK = threading.Lock()
 _MOCK_CLIENTS = {}
 
@@ -24,12 +27,24 @@ class _InMemoryRedis:
     def __init__(self):
         self._lock = threading.Lock()
         self._store = {}
+        self._lists = {}
+        self._sets = {}
+        self._hashes = {}
 
     def setex(self, key, ttl, value):
         expires_at = time.time() + float(ttl)
         with self._lock:
             self._store[key] = (value, expires_at)
 
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                for space in (self._store, self._lists, self._sets, self._hashes):
+                    if space.pop(key, None) is not None:
+                        removed += 1
+            return removed
+
     def get(self, key):
         with self._lock:
             item = self._store.get(key)
@@ -41,6 +56,164 @@ class _InMemoryRedis:
                 return None
             return value
 
+    def _live_hash(self, key):
+        item = self._hashes.get(key)
+        if item is None:
+            return None
+        fields, expires_at = item
+        if expires_at is not None and time.time() >= expires_at:
+            self._hashes.pop(key, None)
+            return None
+        return fields
+
+    def hset(self, key, mapping):
+        with self._lock:
+            fields = self._live_hash(key)
+            if fields is None:
+                fields = {}
+                self._hashes[key] = (fields, None)
+            fields.update({name: str(value) for name, value in mapping.items()})
+            return len(mapping)
+
+    def hget(self, key, field):
+        with self._lock:
+            return (self._live_hash(key) or {}).get(field)
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._live_hash(key) or {})
+
+    def exists(self, key):
+        with self._lock:
+            return int(self._live_hash(key) is not None)
+
+    def expire(self, key, ttl):
+        with self._lock:
+            fields = self._live_hash(key)
+            if fields is None:
+                return False
+            self._hashes[key] = (fields, time.time() + float(ttl))
+            return True
+
+    def pipeline(self, transaction=True):
+        return _InMemoryPipeline(self)
+
+    def publish(self, channel, message):
+        # No pub/sub here; waiters fall back to polling.
+        return 0
+
+    # Minimal list/set commands used by the async job queue.
+    def lpush(self, key, value):
+        with self._lock:
+            items = self._lists.setdefault(key, [])
+            items.insert(0, value)
+            return len(items)
+
+    def rpush(self, key, *values):
+        with self._lock:
+            items = self._lists.setdefault(key, [])
+            items.extend(values)
+            return len(items)
+
+    def llen(self, key):
+        with self._lock:
+            return len(self._lists.get(key, []))
+
+    def rpoplpush(self, source, destination):
+        with self._lock:
+            items = self._lists.get(source)
+            if not items:
+                return None
+            value = items.pop()
+            self._lists.setdefault(destination, []).insert(0, value)
+            return value
+
+    def lrem(self, key, count, value):
+        with self._lock:
+            items = self._lists.get(key, [])
+            if value in items:
+                items.remove(value)
+                return 1
+            return 0
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            items = self._lists.get(key, [])
+            return list(items[start:] if end == -1 else items[start : end + 1])
+
+    def sadd(self, key, member):
+        with self._lock:
+            members = self._sets.setdefault(key, set())
+            added = member not in members
+            members.add(member)
+            return int(added)
+
+    def srem(self, key, member):
+        with self._lock:
+            members = self._sets.get(key, set())
+            removed = member in members
+            members.discard(member)
+            return int(removed)
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._sets.get(key, set()))
+
+
+class _InMemoryPipeline:
+    """Buffers commands for ``_InMemoryRedis`` and replays them on execute."""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        commands, self._commands = self._commands, []
+        return [getattr(self._client, n)(*a, **kw) for n, a, kw in commands]
+
+
+# Compare-and-set update of a job hash in one round-trip; on success the new
+# status is published on the job's event channel.
+# KEYS[1] job key; KEYS[2] event channel; ARGV[1] TTL; ARGV[2] number of
+# allowed current statuses (0 means any); ARGV[3 .. 2+n] allowed statuses;
+# remaining ARGV field/value pairs.
+_UPDATE_JOB_LUA = """
+local key = KEYS[1]
+if redis.call('EXISTS', key) == 0 then
+    return 0
+end
+local n = tonumber(ARGV[2])
+if n > 0 then
+    local current = redis.call('HGET', key, 'status')
+    local allowed = false
+    for i = 3, 2 + n do
+        if ARGV[i] == current then
+            allowed = true
+        end
+    end
+    if not allowed then
+        return 0
+    end
+end
+redis.call('HSET', key, unpack(ARGV, 3 + n))
+redis.call('EXPIRE', key, ARGV[1])
+redis.call('PUBLISH', KEYS[2], redis.call('HGET', key, 'status'))
+return 1
+"""
+
+# Mock backends live in this process only, so the Lua script's atomicity is
+# emulated with a lock (fakeredis needs the optional lupa package for EVAL).
+_MOCK_UPDATE_LOCK = threading.Lock()
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
 
 class AsyncJobStore:
     """Redis-backed job storage for internal async generation workflows."""
@@ -55,6 +228,9 @@ class AsyncJobStore:
         self._redis = self._build_client(redis_url=redis_url, use_mock=use_mock)
         self._ttl = int(ttl_seconds)
         self._prefix = key_prefix
+        self._update_script = (
+            None if use_mock else self._redis.register_script(_UPDATE_JOB_LUA)
+        )
 
     @staticmethod
     def _build_client(redis_url, use_mock=False):
@@ -87,40 +263,187 @@ class AsyncJobStore:
                 return _InMemoryRedis()
             raise
 
+    @property
+    def client(self):
+        """The underlying Redis client (shared with the async job queue)."""
+        return self._redis
+
     def _key(self, job_id):
         return f"{self._prefix}:{job_id}"
 
+    def _channel(self, job_id):
+        return f"{self._prefix}:events:{job_id}"
+
+    def _batch_key(self, batch_id):
+        return f"{self._prefix}:batch:{batch_id}"
+
+    def _queue_new_job(self, pipe, job_id, now):
+        key = self._key(job_id)
+        pipe.hset(
+            key,
+            mapping={
+                "job_id": job_id,
+                "status": "queued",
+                "created_at": repr(now),
+                "updated_at": repr(now),
+                "result": "null",
+                "error": "null",
+            },
+        )
+        pipe.expire(key, self._ttl)
+
     def create(self):
         job_id = str(uuid.uuid4())
+        pipe = self._redis.pipeline(transaction=True)
+        self._queue_new_job(pipe, job_id, time.time())
+        pipe.execute()
+        return job_id
+
+    def create_batch(self, size):
+        """Create ``size`` queued jobs grouped under a new batch id.
+
+        Returns ``(batch_id, job_ids)``; job ids are in item order.
+        """
+        batch_id = str(uuid.uuid4())
+        job_ids = [str(uuid.uuid4()) for _ in range(size)]
         now = time.time()
-        payload = {
-            "job_id": job_id,
-            "status": "queued",
-            "created_at": now,
-            "updated_at": now,
-            "result": None,
-            "error": None,
+        pipe = self._redis.pipeline(transaction=True)
+        for job_id in job_ids:
+            self._queue_new_job(pipe, job_id, now)
+        pipe.hset(
+            self._batch_key(batch_id),
+            mapping={"batch_id": batch_id, "created_at": repr(now), "total": size},
+        )
+        pipe.expire(self._batch_key(batch_id), self._ttl)
+        pipe.rpush(f"{self._batch_key(batch_id)}:jobs", *job_ids)
+        pipe.expire(f"{self._batch_key(batch_id)}:jobs", self._ttl)
+        pipe.execute()
+        return batch_id, job_ids
+
+    def discard(self, job_ids, batch_id=None):
+        """Delete jobs (and their batch) that were created but never queued."""
+        keys = [self._key(job_id) for job_id in job_ids]
+        if batch_id is not None:
+            keys += [self._batch_key(batch_id), f"{self._batch_key(batch_id)}:jobs"]
+        self._redis.delete(*keys)
+
+    def get_batch(self, batch_id):
+        """Return ``{batch_id, created_at, total, job_ids}`` or None."""
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hgetall(self._batch_key(batch_id))
+        pipe.lrange(f"{self._batch_key(batch_id)}:jobs", 0, -1)
+        fields, job_ids = pipe.execute()
+        if not fields:
+            return None
+        return {
+            "batch_id": fields["batch_id"],
+            "created_at": float(fields["created_at"]),
+            "total": int(fields["total"]),
+            "job_ids": list(job_ids),
         }
-        self._redis.setex(self._key(job_id), self._ttl, json.dumps(payload))
-        return job_id
 
-    def get(self, job_id):
-        raw = self._redis.get(self._key(job_id))
-        if raw is None:
+    @staticmethod
+    def _decode(fields):
+        if not fields:
             return None
-        return json.loads(raw)
+        return {
+            "job_id": fields["job_id"],
+            "status": fields["status"],
+            "created_at": float(fields["created_at"]),
+            "updated_at": float(fields["updated_at"]),
+            "result": json.loads(fields.get("result") or "null"),
+            "error": json.loads(fields.get("error") or "null"),
+        }
+
+    def get(self, job_id):
+        return self._decode(self._redis.hgetall(self._key(job_id)))
+
+    def get_many(self, job_ids):
+        """Return payloads (None for expired jobs) in one round-trip."""
+        pipe = self._redis.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(self._key(job_id))
+        return [self._decode(fields) for fields in pipe.execute()]
+
+    def get_statuses(self, job_ids):
+        """Return each job's status (None when expired) in one round-trip."""
+        pipe = self._redis.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hget(self._key(job_id), "status")
+        return pipe.execute()
 
-    def update_status(self, job_id, status, *, result=None, error=None):
-        payload = self.get(job_id)
-        if payload is None:
-            return False
+    def update_status(
+        self, job_id, status, *, result=None, error=None, expected_status=None
+    ):
+        """Set the job's status (and result/error) atomically.
 
-        payload["status"] = status
-        payload["updated_at"] = time.time()
+        ``expected_status`` (a status or collection of statuses) makes the
+        update conditional on the job's current status. Returns False when the
+        job is missing/expired or its status did not match.
+        """
+        fields = {"status": status, "updated_at": repr(time.time())}
         if result is not None:
-            payload["result"] = result
+            fields["result"] = json.dumps(result)
         if error is not None:
-            payload["error"] = error
+            fields["error"] = json.dumps(error)
+        if expected_status is None:
+            expected = []
+        elif isinstance(expected_status, str):
+            expected = [expected_status]
+        else:
+            expected = list(expected_status)
+
+        key = self._key(job_id)
+        if self._update_script is not None:
+            args = [self._ttl, len(expected), *expected]
+            for name, value in fields.items():
+                args.extend((name, value))
+            return bool(
+                self._update_script(keys=[key, self._channel(job_id)], args=args)
+            )
+
+        with _MOCK_UPDATE_LOCK:
+            if not self._redis.exists(key):
+                return False
+            if expected and self._redis.hget(key, "status") not in expected:
+                return False
+            self._redis.hset(key, mapping=fields)
+            self._redis.expire(key, self._ttl)
+            self._redis.publish(self._channel(job_id), status)
+            return True
 
-        self._redis.setex(self._key(job_id), self._ttl, json.dumps(payload))
-        return True
\ No newline at end of file
+    def _subscribe(self, job_id):
+        try:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(self._channel(job_id))
+            return pubsub
+        except Exception as e:
+            logger.debug("Job event subscription unavailable, polling: %s", e)
+            return None
+
+    def wait_for_change(self, job_id, seen_status, timeout, poll_interval=0.5):
+        """Block until the job's status differs from ``seen_status``.
+
+        Returns the current payload as soon as the status changes, or when
+        ``timeout`` seconds pass, or None if the job is unknown/expired.
+        Changes are picked up from the job's pub/sub channel; backends without
+        pub/sub are polled every ``poll_interval`` seconds instead.
+        """
+        deadline = time.monotonic() + max(0.0, float(timeout))
+        # Subscribe before the first read so no transition is missed.
+        pubsub = self._subscribe(job_id)
+        try:
+            while True:
+                payload = self.get(job_id)
+                if payload is None or payload["status"] != seen_status:
+                    return payload
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return payload
+                if pubsub is None:
+                    time.sleep(min(poll_interval, remaining))
+                else:
+                    pubsub.get_message(timeout=remaining)
+        finally:
+            if pubsub is not None:
+                pubsub.close()
@@ -0,0 +1,512 @@
+"""asyncio variant of ``LLMService`` used by the ASGI entry point.
+
+Provider calls go through ``AsyncOpenAI`` and Gemini's ``generate_content_async``
+so one event loop can hold many concurrent generations without tying up a
+thread per request. Prompt building, JSON handling and validation are inherited
+from ``LLMService``.
+
+The few-shot orchestration is shared with the sync service: it runs in a worker
+thread while each step's provider call is scheduled back onto the event loop.
+Orchestration threads come from a dedicated pool (``ASYNC_FEW_SHOT_THREADS``)
+so long few-shot runs cannot exhaust the loop's default executor. That setting
+bounds orchestrations, not threads: each orchestration runs its concurrent
+steps on up to ``FEW_SHOT_MAX_CONCURRENCY`` threads of its own.
+
+With ``JSON_EARLY_ABORT_ENABLED``, JSON calls stream through the async clients
+and are closed once the first object is complete, as in ``LLMService``.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+from openai import AsyncOpenAI
+
+from app.services import client_pool, gemini_sdk, model_registry, retry_policy
+from app.services.llm_service import JSON_GENERATION_SECONDS, JSON_RETRIES, LLMService
+from app.utils import json_stream
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLLMService(LLMService):
+    """Service class for handling LLM API calls on asyncio"""
+
+    def __init__(self):
+        super().__init__()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _orchestration_executor(self):
+        """Return the thread pool that runs few-shot orchestrations."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._config_value("ASYNC_FEW_SHOT_THREADS", 64),
+                    thread_name_prefix="few-shot",
+                )
+            return self._executor
+
+    def _async_openai_client(self, api_key):
+        """Return a pooled ``AsyncOpenAI`` client for ``api_key``."""
+        return client_pool.openai_client(
+            AsyncOpenAI,
+            api_key,
+            self._config_value("OPENAI_BASE_URL"),
+            provider="openai_async",
+        )
+
+    @staticmethod
+    def _limited_async(limiter, fn):
+        """Wrap coroutine function ``fn`` so each call holds a limiter slot."""
+        if limiter is None:
+            return fn
+
+        async def call():
+            async with limiter.async_slot():
+                return await fn()
+
+        return call
+
+    @staticmethod
+    def _slot_async(limiter):
+        """Return an async context that holds a slot of ``limiter`` (if any)."""
+        if limiter is None:
+            return contextlib.nullcontext()
+        return limiter.async_slot()
+
+    @staticmethod
+    async def _openai_create_async(client, request_kwargs, model, limiter=None):
+        """Async counterpart of ``LLMService._openai_create``."""
+
+        async def create():
+            try:
+                return await client.chat.completions.create(**request_kwargs)
+            except Exception as e:
+                if not LLMService._is_unsupported_temperature_error(e):
+                    raise
+                logger.info(
+                    "Retrying OpenAI call without explicit temperature (model=%s)",
+                    model,
+                )
+                request_kwargs.pop("temperature", None)
+                return await client.chat.completions.create(**request_kwargs)
+
+        return await retry_policy.call_async(
+            "openai",
+            AsyncLLMService._limited_async(limiter, create),
+            LLMService._retry_policy(),
+        )
+
+    @staticmethod
+    async def _openai_generate_once_async(
+        client,
+        system_prompt,
+        model,
+        prompt,
+        json_mode=False,
+        schema=None,
+        limiter=None,
+    ):
+        request_kwargs = LLMService._openai_request_kwargs(
+            system_prompt, model, prompt, json_mode, schema
+        )
+        chat_completion = await AsyncLLMService._openai_create_async(
+            client, request_kwargs, model, limiter
+        )
+        return LLMService._openai_completion_text(chat_completion, model)
+
+    @staticmethod
+    async def _openai_stream_once_async(
+        client,
+        system_prompt,
+        model,
+        prompt,
+        json_mode=False,
+        schema=None,
+        limiter=None,
+    ):
+        """Async counterpart of ``LLMService._openai_stream_once``."""
+        request_kwargs = LLMService._openai_request_kwargs(
+            system_prompt, model, prompt, json_mode, schema
+        )
+        request_kwargs["stream"] = True
+        request_kwargs["stream_options"] = {"include_usage": True}
+        async with AsyncLLMService._slot_async(limiter):
+            # Only opening the stream is retried; chunks may already be relayed.
+            stream = await AsyncLLMService._openai_create_async(
+                client, request_kwargs, model
+            )
+            try:
+                async for chunk in stream:
+                    delta = LLMService._openai_chunk_text(chunk)
+                    if delta:
+                        yield delta
+            finally:
+                close = getattr(stream, "close", None)
+                if callable(close):
+                    await close()
+
+    @staticmethod
+    async def _gemini_generate_once_async(
+        gen_model, prompt, model=None, json_mode=False, schema=None, limiter=None
+    ):
+        response = await retry_policy.call_async(
+            "gemini",
+            AsyncLLMService._limited_async(
+                limiter,
+                lambda: gen_model.generate_content_async(
+                    prompt,
+                    generation_config=LLMService._gemini_generation_config(
+                        model, json_mode, schema
+                    ),
+                ),
+            ),
+            LLMService._retry_policy(),
+        )
+        return LLMService._gemini_response_text(response)
+
+    @staticmethod
+    async def _gemini_stream_once_async(
+        gen_model, prompt, model=None, json_mode=False, schema=None, limiter=None
+    ):
+        """Async counterpart of ``LLMService._gemini_stream_once``."""
+        async with AsyncLLMService._slot_async(limiter):
+            response = await retry_policy.call_async(
+                "gemini",
+                lambda: gen_model.generate_content_async(
+                    prompt,
+                    generation_config=LLMService._gemini_generation_config(
+                        model, json_mode, schema
+                    ),
+                    stream=True,
+                ),
+                LLMService._retry_policy(),
+            )
+            try:
+                async for chunk in response:
+                    text = LLMService._gemini_chunk_text(chunk)
+                    if text:
+                        yield text
+                LLMService._record_gemini_stream_usage(response)
+            finally:
+                gemini_sdk.cancel_stream(response)
+
+    @staticmethod
+    async def _read_until_json_object_async(provider, chunks):
+        """Async counterpart of ``LLMService._read_until_json_object``."""
+        scanner = json_stream.JsonObjectScanner()
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                if scanner.feed(chunk) is not None:
+                    break
+        finally:
+            await chunks.aclose()
+        return LLMService._json_object_text(provider, scanner, parts)
+
+    def _json_generator_async(self, provider, generate_once, stream_once):
+        """Async counterpart of ``LLMService._json_generator``.
+
+        ``generate_once`` returns an awaitable and ``stream_once`` an async
+        iterator of text chunks.
+        """
+        early_abort = bool(self._config_value("JSON_EARLY_ABORT_ENABLED", False))
+
+        async def generate(prompt, schema=None):
+            started = time.monotonic()
+            if early_abort:
+                text, aborted = await self._read_until_json_object_async(
+                    provider, stream_once(prompt, schema)
+                )
+            else:
+                text, aborted = await generate_once(prompt, schema), False
+                self._observe_trailing_output(provider, text)
+            JSON_GENERATION_SECONDS.labels(
+                provider=provider, early_abort=str(aborted).lower()
+            ).observe(time.monotonic() - started)
+            return text
+
+        return generate
+
+    async def _run_few_shot_orchestration_async(
+        self,
+        user_text,
+        generate_once_async,
+        step_cache=None,
+        cache_scope=(),
+        max_prompt_tokens=None,
+        use_response_schemas=False,
+    ):
+        """Run the shared few-shot orchestration with async provider calls.
+
+        The orchestration thread and every step task run in a copy of the
+        caller's context, so the Flask app context (config lookups such as the
+        retry policy) and other context variables carry over.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+
+        def generate_once(prompt, schema=None):
+            # The step task copies the context current when it is scheduled.
+            future = context.copy().run(
+                asyncio.run_coroutine_threadsafe,
+                generate_once_async(prompt, schema),
+                loop,
+            )
+            return future.result()
+
+        return await loop.run_in_executor(
+            self._orchestration_executor(),
+            functools.partial(
+                context.run,
+                self._run_few_shot_orchestration,
+                user_text,
+                generate_once,
+                step_cache=step_cache,
+                cache_scope=cache_scope,
+                max_prompt_tokens=max_prompt_tokens,
+                use_response_schemas=use_response_schemas,
+            ),
+        )
+
+    async def _gemini_step_router_async(self, api_key, model, system_prompt, gen_model):
+        """``_gemini_step_router`` for async models, run off the event loop.
+
+        Creating the cached content is a blocking SDK call, so it runs on the
+        orchestration pool in a copy of the caller's context.
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._orchestration_executor(),
+            functools.partial(
+                contextvars.copy_context().run,
+                self._gemini_step_router,
+                api_key,
+                model,
+                system_prompt,
+                gen_model,
+                asynchronous=True,
+            ),
+        )
+
+    async def call_openai(
+        self,
+        api_key,
+        system_prompt,
+        user_text,
+        prompting_strategy,
+        model="gpt-4o",
+        step_cache=None,
+    ):
+        """Call OpenAI GPT model via ``AsyncOpenAI``."""
+        if not user_text:
+            logger.warning("call_openai: empty user_text provided")
+        start_time = time.time()
+        max_prompt_tokens = self._prompt_token_budget("openai", model, system_prompt)
+        prompt = None
+        if prompting_strategy != "few_shot":
+            # Few-shot step prompts are composed and budget-checked per step.
+            prompt = self.prompt_builder.build_prompt(
+                prompting_strategy, user_text, max_tokens=max_prompt_tokens
+            )
+        client = self._async_openai_client(api_key)
+        limiter = self._provider_limiter("openai", api_key, model)
+        capabilities = model_registry.model_capabilities("openai", model)
+        generate_json = self._json_generator_async(
+            "openai",
+            lambda step_prompt, schema: self._openai_generate_once_async(
+                client,
+                system_prompt,
+                model,
+                step_prompt,
+                capabilities.json_mode,
+                schema,
+                limiter,
+            ),
+            lambda step_prompt, schema: self._openai_stream_once_async(
+                client,
+                system_prompt,
+                model,
+                step_prompt,
+                capabilities.json_mode,
+                schema,
+                limiter,
+            ),
+        )
+
+        try:
+            if prompting_strategy == "few_shot":
+                logger.info("Running OpenAI few-shot multi-call orchestration (async)")
+                return await self._run_few_shot_orchestration_async(
+                    user_text,
+                    generate_json,
+                    step_cache=step_cache,
+                    cache_scope=("openai", model, system_prompt),
+                    max_prompt_tokens=max_prompt_tokens,
+                    use_response_schemas=capabilities.json_schema,
+                )
+
+            logger.info("Calling OpenAI chat.completions async (model=%s)", model)
+            if self._expects_json_object(prompting_strategy, model):
+                content = await generate_json(prompt)
+            else:
+                content = await self._openai_generate_once_async(
+                    client, system_prompt, model, prompt, limiter=limiter
+                )
+            if self._needs_json_retry(prompting_strategy, model, content):
+                logger.warning(
+                    "OpenAI zero-shot produced non-JSON output for GPT-5 (len=%d); retrying with strict JSON reminder",
+                    len(content),
+                )
+                JSON_RETRIES.labels(provider="openai", step="zero_shot").inc()
+                content = await generate_json(self._json_retry_prompt(prompt))
+            logger.info(
+                "OpenAI response received in %.3fs (len=%d)",
+                time.time() - start_time,
+                len(content),
+            )
+            return content.strip()
+        except Exception as e:
+            logger.exception("OpenAI call failed: %s", e)
+            raise
+
+    async def call_gemini(
+        self,
+        api_key,
+        system_prompt,
+        user_text,
+        prompting_strategy,
+        model=None,
+        step_cache=None,
+    ):
+        """Call Google Gemini model via ``generate_content_async``."""
+        if not model:
+            raise ValueError("call_gemini: model must be specified")
+        if not user_text:
+            logger.warning("call_gemini: empty user_text provided")
+        start_time = time.time()
+        max_prompt_tokens = self._prompt_token_budget("gemini", model, system_prompt)
+        prompt = None
+        if prompting_strategy != "few_shot":
+            # Few-shot step prompts are composed and budget-checked per step.
+            prompt = self.prompt_builder.build_prompt(
+                prompting_strategy, user_text, max_tokens=max_prompt_tokens
+            )
+
+        gen_model = genai.GenerativeModel(
+            model_name=model, system_instruction=system_prompt
+        )
+        gemini_sdk.bind_model(
+            gen_model, self._gemini_client_manager(api_key), asynchronous=True
+        )
+        limiter = self._provider_limiter("gemini", api_key, model)
+        capabilities = model_registry.model_capabilities("gemini", model)
+
+        try:
+            if prompting_strategy == "few_shot":
+                logger.info("Running Gemini few-shot multi-call orchestration (async)")
+                route = await self._gemini_step_router_async(
+                    api_key, model, system_prompt, gen_model
+                )
+                return await self._run_few_shot_orchestration_async(
+                    user_text,
+                    self._json_generator_async(
+                        "gemini",
+                        lambda step_prompt, schema: self._gemini_generate_once_async(
+                            *route(step_prompt),
+                            model,
+                            capabilities.json_mode,
+                            schema,
+                            limiter,
+                        ),
+                        lambda step_prompt, schema: self._gemini_stream_once_async(
+                            *route(step_prompt),
+                            model,
+                            capabilities.json_mode,
+                            schema,
+                            limiter,
+                        ),
+                    ),
+                    step_cache=step_cache,
+                    cache_scope=("gemini", model, system_prompt),
+                    max_prompt_tokens=max_prompt_tokens,
+                    use_response_schemas=capabilities.json_schema,
+                )
+
+            logger.info("Calling Gemini generate_content_async (model=%s)", model)
+            text = await self._gemini_generate_once_async(
+                gen_model, prompt, model, limiter=limiter
+            )
+            logger.info(
+                "Gemini response received in %.3fs (len=%d)",
+                time.time() - start_time,
+                len(text),
+            )
+            return text.strip()
+        except Exception as e:
+            logger.exception("Gemini call failed: %s", e)
+            raise
+
+    async def generate(
+        self,
+        api_key,
+        provider,
+        model,
+        user_text,
+        system_prompt,
+        prompting_strategy="zero_shot",
+        response_cache=None,
+        use_cached=True,
+        step_cache=None,
+    ):
+        """Async counterpart of ``LLMService.generate``.
+
+        Cache backends are synchronous, so lookups and stores run in a worker
+        thread to keep the event loop free. Provider requests wait for limiter
+        slots on the event loop itself.
+        """
+        method_name = model_registry.dispatch_method(provider)
+        if method_name is None:
+            raise ValueError(f"Unsupported provider: {provider}")
+        method = getattr(self, method_name)
+
+        cache_key = None
+        if response_cache is not None:
+            cache_key = self._response_cache_key(
+                response_cache,
+                provider,
+                model,
+                user_text,
+                system_prompt,
+                prompting_strategy,
+            )
+            if use_cached:
+                cached = await asyncio.to_thread(
+                    response_cache.get, cache_key, provider=provider
+                )
+                if cached is not None:
+                    logger.info(
+                        "Serving cached response (provider=%s, model=%s)",
+                        provider,
+                        model,
+                    )
+                    return cached
+
+        response = await method(
+            api_key=api_key,
+            system_prompt=system_prompt,
+            user_text=user_text,
+            prompting_strategy=prompting_strategy,
+            model=model,
+            step_cache=step_cache,
+        )
+        if cache_key is not None:
+            await asyncio.to_thread(response_cache.set, cache_key, response)
+        return response
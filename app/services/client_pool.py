@@ -0,0 +1,171 @@
+"""Process-wide pool of reusable provider SDK clients.
+
+Provider clients hold HTTP/gRPC connections, so building a fresh one for every
+call throws away keep-alive connections and pays a TLS handshake each time.
+Clients are therefore cached per ``(provider, api-key fingerprint, host)`` with
+LRU and TTL eviction. Callers pass a zero-argument ``factory`` that builds the
+client on a miss, which keeps SDK construction (and test patching of it) in the
+calling module.
+
+Raw API keys are never stored as pool keys; only a SHA-256 fingerprint is.
+
+Clients evicted by LRU or TTL are closed so their connection pools do not
+linger until garbage collection. A request may still be using a client it
+fetched just before eviction, so evicted clients are closed only after a grace
+period. ``clear()`` closes all clients immediately.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def api_key_fingerprint(api_key):
+    """Return a short, non-reversible fingerprint for an API key."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def close_client(client):
+    """Close ``client`` if it has a ``close()`` method; log instead of raising."""
+    close = getattr(client, "close", None)
+    if not callable(close):
+        return
+    try:
+        close()
+    except Exception as e:
+        logger.warning("Failed to close pooled client %r: %s", client, e)
+
+
+class ProviderClientPool:
+    """Thread-safe LRU/TTL cache of provider clients."""
+
+    def __init__(self, max_size=32, ttl_seconds=900, close_grace_seconds=600):
+        self._max_size = max(1, int(max_size))
+        self._ttl = float(ttl_seconds)
+        self._close_grace = float(close_grace_seconds)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (client, created_at, close)
+        self._retired = []  # (client, close, retired_at), oldest first
+
+    def resize(self, max_size, ttl_seconds):
+        """Apply new limits; clients beyond ``max_size`` are retired (LRU)."""
+        now = time.monotonic()
+        with self._lock:
+            self._max_size = max(1, int(max_size))
+            self._ttl = float(ttl_seconds)
+            self._evict_overflow(now)
+
+    def _evict_overflow(self, now):
+        while len(self._entries) > self._max_size:
+            evicted_key, evicted = self._entries.popitem(last=False)
+            self._retire(evicted, now)
+            logger.debug("Evicted pooled %s client (LRU)", evicted_key[0])
+
+    @staticmethod
+    def _key(provider, api_key, host):
+        return (provider, api_key_fingerprint(api_key), host or "")
+
+    def _retire(self, entry, now):
+        client, _created_at, close = entry
+        self._retired.append((client, close, now))
+
+    def _due_for_close(self, now):
+        """Pop retired clients whose grace period is over (call under the lock)."""
+        due = 0
+        while (
+            due < len(self._retired)
+            and now - self._retired[due][2] >= self._close_grace
+        ):
+            due += 1
+        closing, self._retired = self._retired[:due], self._retired[due:]
+        return closing
+
+    def get(self, provider, api_key, host, factory, close=close_client):
+        """Return the pooled client for the key, building it on a miss.
+
+        ``close(client)`` is called once the client has been evicted and its
+        grace period is over.
+        """
+        key = self._key(provider, api_key, host)
+        now = time.monotonic()
+        with self._lock:
+            closing = self._due_for_close(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[1] < self._ttl:
+                    self._entries.move_to_end(key)
+                    client = entry[0]
+                else:
+                    del self._entries[key]
+                    self._retire(entry, now)
+                    entry = None
+        for retired_client, retired_close, _ in closing:
+            retired_close(retired_client)
+        if entry is not None:
+            return client
+
+        # Build outside the lock so a slow constructor does not block other
+        # providers/keys. If two threads race on the same key, the first
+        # inserted client wins and the other is closed unused.
+        client = factory()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = (client, now, close)
+                self._evict_overflow(now)
+                return client
+            self._entries.move_to_end(key)
+        close(client)
+        return entry[0]
+
+    def clear(self):
+        """Drop and close every pooled and retired client."""
+        with self._lock:
+            closing = [(client, close) for client, _, close in self._entries.values()]
+            closing += [(client, close) for client, close, _ in self._retired]
+            self._entries.clear()
+            self._retired = []
+        for client, close in closing:
+            close(client)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_POOL = ProviderClientPool()
+
+
+def configure(config):
+    """Apply the ``PROVIDER_CLIENT_*`` settings of an app config to the pool."""
+    _POOL.resize(
+        max_size=config.get("PROVIDER_CLIENT_POOL_SIZE", 32),
+        ttl_seconds=config.get("PROVIDER_CLIENT_TTL_SECONDS", 900),
+    )
+
+
+def get_client(provider, api_key, host, factory, close=close_client):
+    """Return a pooled client from the process-wide pool."""
+    return _POOL.get(provider, api_key, host, factory, close)
+
+
+def openai_client(client_cls, api_key, base_url=None, provider="openai"):
+    """Return a pooled ``OpenAI``/``AsyncOpenAI`` client built with ``client_cls``.
+
+    Every OpenAI client is built here so pooled clients share one set of
+    options, whichever caller builds one first. SDK retries are disabled
+    (``max_retries=0``) because ``retry_policy`` owns retries.
+    """
+    kwargs = {"api_key": api_key, "max_retries": 0}
+    if base_url:
+        kwargs["base_url"] = base_url
+    return get_client(provider, api_key, base_url, lambda: client_cls(**kwargs))
+
+
+def clear():
+    """Drop all pooled clients (used by tests and on credential rotation)."""
+    _POOL.clear()
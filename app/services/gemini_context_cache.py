@@ -0,0 +1,133 @@
+"""Gemini cached-content handles for static prompt prefixes.
+
+Every few-shot step sent to a Gemini model repeats the same system prompt and
+shared rules. When ``GEMINI_CONTEXT_CACHE_ENABLED`` is set, that prefix is
+uploaded once per ``(api-key fingerprint, model, prefix)`` as a
+``CachedContent`` resource and the steps send only the text after it.
+
+Handles are reused until shortly before their TTL ends. A failed create (for
+example a prefix below the model's minimum cacheable size) is remembered for
+the same period, so requests do not retry it on every call. At most
+``max_entries`` handles are kept (least recently used first out); a dropped
+handle's resource simply expires at the provider.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import prometheus_client
+
+from app.services import client_pool
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_LOOKUPS = prometheus_client.Counter(
+    "llm_gemini_context_cache_total",
+    "Gemini cached-content lookups for the static prompt prefix",
+    ["result"],
+)
+
+# Stop handing out a handle this long before the provider expires it.
+_EXPIRY_MARGIN = 0.1
+
+
+class ContextCache:
+    """Thread-safe map from a static prefix to its cached-content name."""
+
+    def __init__(self, max_entries=1024):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (name or None, valid_until)
+        self._key_locks = {}
+        self._max_entries = max(1, int(max_entries))
+
+    def configure(self, max_entries=1024):
+        """Apply a new size limit; handles beyond it are dropped (LRU)."""
+        with self._lock:
+            self._max_entries = max(1, int(max_entries))
+            self._evict(time.monotonic())
+
+    def _evict(self, now):
+        """Drop expired handles, then the least recently used (under the lock)."""
+        expired = [key for key, entry in self._entries.items() if entry[1] <= now]
+        for key in expired:
+            del self._entries[key]
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _key(api_key, model, system_prompt, prefix):
+        digest = hashlib.sha256(
+            f"{system_prompt or ''}\0{prefix}".encode("utf-8")
+        ).hexdigest()
+        return (client_pool.api_key_fingerprint(api_key), model, digest)
+
+    def _lookup(self, key, now):
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] > now:
+            self._entries.move_to_end(key)
+            return entry
+        return None
+
+    def get_name(self, api_key, model, system_prompt, prefix, ttl_seconds, create):
+        """Return the cached-content name for the prefix, or None if unavailable.
+
+        ``create(ttl_seconds)`` uploads the prefix and returns the resource
+        name. Concurrent misses for the same key share one create call.
+        """
+        key = self._key(api_key, model, system_prompt, prefix)
+        with self._lock:
+            entry = self._lookup(key, time.monotonic())
+            if entry is None:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+        if entry is not None:
+            CONTEXT_CACHE_LOOKUPS.labels(result="hit").inc()
+            return entry[0]
+
+        with key_lock:
+            with self._lock:
+                entry = self._lookup(key, time.monotonic())
+            if entry is not None:
+                CONTEXT_CACHE_LOOKUPS.labels(result="hit").inc()
+                return entry[0]
+            try:
+                name = create(ttl_seconds)
+                CONTEXT_CACHE_LOOKUPS.labels(result="created").inc()
+            except Exception as e:
+                logger.warning(
+                    "Gemini context cache create failed (model=%s): %s", model, e
+                )
+                CONTEXT_CACHE_LOOKUPS.labels(result="failed").inc()
+                name = None
+            now = time.monotonic()
+            valid_until = now + ttl_seconds * (1 - _EXPIRY_MARGIN)
+            with self._lock:
+                self._entries[key] = (name, valid_until)
+                self._entries.move_to_end(key)
+                self._key_locks.pop(key, None)
+                self._evict(now)
+        return name
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_CACHE = ContextCache()
+
+
+def configure(config):
+    """Apply ``GEMINI_CONTEXT_CACHE_MAX_ENTRIES`` from an app config."""
+    _CACHE.configure(config.get("GEMINI_CONTEXT_CACHE_MAX_ENTRIES", 1024))
+
+
+def cached_content_name(api_key, model, system_prompt, prefix, ttl_seconds, create):
+    """Return the process-wide cached-content name for the prefix, or None."""
+    return _CACHE.get_name(api_key, model, system_prompt, prefix, ttl_seconds, create)
+
+
+def clear():
+    """Forget all cached-content handles (used by tests)."""
+    _CACHE.clear()
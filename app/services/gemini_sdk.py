@@ -0,0 +1,124 @@
+"""Adapter for the private parts of ``google-generativeai`` this service uses.
+
+The SDK only exposes per-key clients through its private ``_ClientManager``.
+Its public ``genai.configure()`` sets process-global state, which races
+between requests that use different API keys. Pooling per key therefore
+needs some private SDK internals:
+
+* ``client._ClientManager``;
+* ``GenerativeModel._client`` and ``GenerativeModel._async_client``;
+* ``GenerativeModel._cached_content``;
+* ``CachedContent._prepare_create_request``; and
+* the ``_iterator`` of streamed responses.
+
+All of that is confined to this module. ``SUPPORTED_VERSIONS`` lists the SDK
+releases it was checked against. With any other release, calls raise
+``UnsupportedSdkError`` rather than failing somewhere inside the SDK.
+"""
+
+import logging
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+from app.services import client_pool
+
+logger = logging.getLogger(__name__)
+
+# (major, minor) releases of google-generativeai whose internals match the
+# attributes used below.
+SUPPORTED_VERSIONS = ((0, 8),)
+
+
+class UnsupportedSdkError(RuntimeError):
+    """Raised when the installed SDK does not match this adapter."""
+
+
+def _sdk_version():
+    try:
+        major, minor = genai.__version__.split(".")[:2]
+        return int(major), int(minor)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _require_supported_sdk():
+    version = _sdk_version()
+    if version not in SUPPORTED_VERSIONS or not hasattr(genai_client, "_ClientManager"):
+        raise UnsupportedSdkError(
+            f"google-generativeai {getattr(genai, '__version__', '?')} is not "
+            f"supported by the Gemini client adapter (expected "
+            f"{', '.join(f'{a}.{b}.x' for a, b in SUPPORTED_VERSIONS)})."
+        )
+
+
+def _new_client_manager(api_key, api_endpoint=None):
+    _require_supported_sdk()
+    kwargs = {"api_key": api_key}
+    if api_endpoint:
+        kwargs["client_options"] = {"api_endpoint": api_endpoint}
+    manager = genai_client._ClientManager()
+    manager.configure(**kwargs)
+    return manager
+
+
+def close_client_manager(manager):
+    """Close the transports of every client the manager has built."""
+    for client in list(getattr(manager, "clients", {}).values()):
+        client_pool.close_client(getattr(client, "transport", None))
+
+
+def client_manager(api_key, api_endpoint=None):
+    """Return the pooled Gemini client manager for a key and endpoint."""
+    return client_pool.get_client(
+        "gemini",
+        api_key,
+        api_endpoint,
+        lambda: _new_client_manager(api_key, api_endpoint),
+        close_client_manager,
+    )
+
+
+def bind_model(gen_model, manager, asynchronous=False):
+    """Make ``gen_model`` call through ``manager`` instead of global state."""
+    if asynchronous:
+        gen_model._async_client = manager.get_default_client("generative_async")
+    else:
+        gen_model._client = manager.get_default_client("generative")
+    return gen_model
+
+
+def bind_cached_content(gen_model, cached_content_name):
+    """Point ``gen_model`` at an existing cached-content resource by name."""
+    gen_model._cached_content = cached_content_name
+    return gen_model
+
+
+def create_cached_content(manager, model, system_prompt, contents, ttl_seconds):
+    """Create a cached-content resource and return its name."""
+    request = genai.caching.CachedContent._prepare_create_request(
+        model=model,
+        system_instruction=system_prompt,
+        contents=contents,
+        ttl=ttl_seconds,
+    )
+    return manager.get_default_client("cache").create_cached_content(request).name
+
+
+def cancel_stream(response):
+    """Cancel the transport call behind a streamed ``generate_content`` response.
+
+    An early stop then does not leave the upstream generation running.
+    """
+    iterator = getattr(response, "_iterator", None)
+    cancel = getattr(iterator, "cancel", None) or getattr(iterator, "close", None)
+    if callable(cancel):
+        cancel()
+
+
+def list_generative_models(manager):
+    """Yield model names (without ``models/``) that support generateContent."""
+    for item in genai.list_models(client=manager.get_default_client("model")):
+        methods = getattr(item, "supported_generation_methods", []) or []
+        if "generateContent" in methods:
+            yield (getattr(item, "name", "") or "").removeprefix("models/")
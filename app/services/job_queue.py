@@ -0,0 +1,442 @@
+"""Redis-backed queue and bounded worker pool for internal async jobs.
+
+Submissions are pushed onto per-provider Redis lists instead of each getting
+its own thread. Every app process runs a fixed pool of worker threads that
+claim entries with ``RPOPLPUSH`` into a per-process processing list, so a
+claimed job is never only in memory. Workers take providers round-robin and
+skip any provider already at its per-process concurrency limit.
+
+Submissions check the queue depth and enqueue in one atomic step (a Lua
+script), so concurrent submitters cannot push the queue past ``max_depth``.
+Requeued orphans are exempt from the limit.
+
+Each process refreshes a heartbeat key; when a process dies (e.g. a gunicorn
+worker restart), any surviving pool notices the expired heartbeat and moves
+the dead process's in-flight entries back onto the queue, failing them once
+``max_attempts`` is exhausted.
+
+Queue entries never contain the caller's provider API key. It is stored
+under a per-job credential key that expires with the job
+(``credential_ttl_seconds``) and is deleted as soon as the job finishes, so
+another process can still run the job.
+"""
+
+import itertools
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Enqueue only if the total queue depth stays within the limit.
+# KEYS[1] providers set; ARGV[1] max depth; ARGV[2] credential TTL;
+# ARGV[3] pending-list key prefix; ARGV[4] credential key prefix;
+# ARGV[5] number of credentials n; then n job id/credential pairs; then
+# provider/entry pairs.
+_ENQUEUE_BOUNDED_LUA = """
+local depth = 0
+for _, provider in ipairs(redis.call('SMEMBERS', KEYS[1])) do
+    depth = depth + redis.call('LLEN', ARGV[3] .. provider)
+end
+local n = tonumber(ARGV[5])
+local first_entry = 6 + 2 * n
+if depth + (#ARGV - first_entry + 1) / 2 > tonumber(ARGV[1]) then
+    return 0
+end
+for i = 6, first_entry - 1, 2 do
+    redis.call('SETEX', ARGV[4] .. ARGV[i], ARGV[2], ARGV[i + 1])
+end
+for i = first_entry, #ARGV, 2 do
+    redis.call('SADD', KEYS[1], ARGV[i])
+    redis.call('LPUSH', ARGV[3] .. ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# Mock backends live in this process only, so the script's atomicity is
+# emulated with a lock (as for AsyncJobStore.update_status).
+_MOCK_ENQUEUE_LOCK = threading.Lock()
+
+
+class JobQueue:
+    """Reliable FIFO of pending jobs stored in Redis lists (one per provider)."""
+
+    def __init__(
+        self,
+        client,
+        key_prefix="llm_async_job",
+        max_depth=1000,
+        credential_ttl_seconds=3600,
+        use_mock=False,
+    ):
+        self._redis = client
+        self._prefix = key_prefix
+        self._max_depth = max(1, int(max_depth))
+        self._credential_ttl = max(1, int(credential_ttl_seconds))
+        self._enqueue_script = (
+            None if use_mock else client.register_script(_ENQUEUE_BOUNDED_LUA)
+        )
+
+    @property
+    def providers_key(self):
+        return f"{self._prefix}:queues"
+
+    @property
+    def workers_key(self):
+        return f"{self._prefix}:workers"
+
+    def pending_key(self, provider):
+        return f"{self._prefix}:queue:{provider}"
+
+    def processing_key(self, worker_id):
+        return f"{self._prefix}:processing:{worker_id}"
+
+    def heartbeat_key(self, worker_id):
+        return f"{self._prefix}:heartbeat:{worker_id}"
+
+    def credential_key(self, job_id):
+        return f"{self._prefix}:credential:{job_id}"
+
+    def providers(self):
+        return sorted(self._redis.smembers(self.providers_key))
+
+    def depth(self):
+        providers = self.providers()
+        if not providers:
+            return 0
+        pipe = self._redis.pipeline(transaction=False)
+        for provider in providers:
+            pipe.llen(self.pending_key(provider))
+        return sum(int(length) for length in pipe.execute())
+
+    def has_capacity(self, count=1):
+        return self.depth() + count <= self._max_depth
+
+    def is_full(self):
+        return not self.has_capacity(1)
+
+    def enqueue(self, entry, credential=None):
+        credentials = {entry["job_id"]: credential} if credential else None
+        self.enqueue_many([entry], credentials)
+
+    def enqueue_many(self, entries, credentials=None):
+        """Push entries regardless of depth (used to requeue orphans).
+
+        ``credentials`` maps job ids to their API keys.
+        """
+        pipe = self._redis.pipeline(transaction=False)
+        for job_id, credential in (credentials or {}).items():
+            pipe.setex(self.credential_key(job_id), self._credential_ttl, credential)
+        for entry in entries:
+            provider = entry["data"]["provider"]
+            pipe.sadd(self.providers_key, provider)
+            pipe.lpush(self.pending_key(provider), json.dumps(entry))
+        pipe.execute()
+
+    def try_enqueue_many(self, entries, credentials=None):
+        """Push all entries only if the queue stays within ``max_depth``.
+
+        Returns False, pushing nothing, when they do not fit.
+        """
+        credentials = credentials or {}
+        if self._enqueue_script is not None:
+            args = [
+                self._max_depth,
+                self._credential_ttl,
+                self.pending_key(""),
+                self.credential_key(""),
+                len(credentials),
+            ]
+            for job_id, credential in credentials.items():
+                args.extend((job_id, credential))
+            for entry in entries:
+                args.extend((entry["data"]["provider"], json.dumps(entry)))
+            return bool(self._enqueue_script(keys=[self.providers_key], args=args))
+
+        with _MOCK_ENQUEUE_LOCK:
+            if not self.has_capacity(len(entries)):
+                return False
+            self.enqueue_many(entries, credentials)
+            return True
+
+    def claim(self, worker_id, provider):
+        """Move ``provider``'s oldest entry to ``worker_id``'s processing list."""
+        return self._redis.rpoplpush(
+            self.pending_key(provider), self.processing_key(worker_id)
+        )
+
+    def ack(self, worker_id, raw_entry):
+        """Drop a finished entry from ``worker_id``'s processing list."""
+        self._redis.lrem(self.processing_key(worker_id), 1, raw_entry)
+
+    def credential(self, job_id):
+        """Return the API key stored for ``job_id``, or None once expired."""
+        return self._redis.get(self.credential_key(job_id))
+
+    def forget_credential(self, job_id):
+        self._redis.delete(self.credential_key(job_id))
+
+    def register(self, worker_id, ttl_seconds):
+        self._redis.sadd(self.workers_key, worker_id)
+        self.heartbeat(worker_id, ttl_seconds)
+
+    def heartbeat(self, worker_id, ttl_seconds):
+        self._redis.setex(self.heartbeat_key(worker_id), int(ttl_seconds), "1")
+
+    def dead_workers(self):
+        return [
+            worker_id
+            for worker_id in self._redis.smembers(self.workers_key)
+            if self._redis.get(self.heartbeat_key(worker_id)) is None
+        ]
+
+    def orphaned_entries(self, worker_id):
+        return self._redis.lrange(self.processing_key(worker_id), 0, -1)
+
+    def release(self, worker_id, raw_entry):
+        """Take an orphaned entry; True only for the caller that removed it."""
+        return bool(self._redis.lrem(self.processing_key(worker_id), 1, raw_entry))
+
+    def unregister(self, worker_id):
+        self._redis.srem(self.workers_key, worker_id)
+        self._redis.delete(self.heartbeat_key(worker_id))
+
+
+class JobWorkerPool:
+    """Fixed pool of threads running queued jobs for one app process."""
+
+    def __init__(
+        self,
+        app,
+        store,
+        queue,
+        handler,
+        threads=4,
+        poll_seconds=1.0,
+        heartbeat_seconds=30,
+        max_attempts=2,
+        provider_limits=None,
+    ):
+        self._app = app
+        self._store = store
+        self._queue = queue
+        self._handler = handler
+        self._threads = max(1, int(threads))
+        self._poll_seconds = float(poll_seconds)
+        self._heartbeat_seconds = max(1, int(heartbeat_seconds))
+        self._max_attempts = max(1, int(max_attempts))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # Per-process cap on concurrently running jobs per provider; providers
+        # without a limit are bounded only by the thread count.
+        self._provider_slots = {
+            provider: threading.BoundedSemaphore(limit)
+            for provider, limit in (provider_limits or {}).items()
+            if int(limit) > 0
+        }
+        self._rotation = itertools.count()
+        self._wakeup = threading.Semaphore(0)
+        self._stopping = threading.Event()
+        self._workers = []
+
+    def start(self):
+        self._queue.register(self.worker_id, self._heartbeat_seconds)
+        self.recover_orphans()
+        for index in range(self._threads):
+            worker = threading.Thread(
+                target=self._work_loop,
+                name=f"async-job-worker-{index}",
+                daemon=True,
+            )
+            worker.start()
+            self._workers.append(worker)
+        supervisor = threading.Thread(
+            target=self._supervise_loop, name="async-job-supervisor", daemon=True
+        )
+        supervisor.start()
+        self._workers.append(supervisor)
+        logger.info(
+            "Async job worker pool started (worker_id=%s, threads=%d)",
+            self.worker_id,
+            self._threads,
+        )
+
+    def stop(self, timeout=5.0):
+        """Stop the threads; unregister once none is still running a job.
+
+        A thread that outlives ``timeout`` keeps its entry in the processing
+        list and the heartbeat expires, so another process requeues the job.
+        """
+        if not self._workers:
+            return
+        self._stopping.set()
+        for _ in range(self._threads):
+            self._wakeup.release()
+        for worker in self._workers:
+            worker.join(timeout)
+        busy = any(worker.is_alive() for worker in self._workers)
+        self._workers = []
+        if not busy:
+            try:
+                self._queue.unregister(self.worker_id)
+            except Exception as e:
+                logger.warning("Async job worker unregister failed: %s", e)
+        logger.info("Async job worker pool stopped (worker_id=%s)", self.worker_id)
+
+    def is_full(self):
+        return self._queue.is_full()
+
+    def has_capacity(self, count):
+        return self._queue.has_capacity(count)
+
+    def submit(self, job_id, api_key, data, use_cached=True):
+        return self.submit_many([(job_id, api_key, data, use_cached)])
+
+    def submit_many(self, jobs):
+        """Enqueue ``(job_id, api_key, data, use_cached)`` tuples in one go.
+
+        Returns False, queueing none of them, when they would overflow the
+        queue.
+        """
+        queued = self._queue.try_enqueue_many(
+            [
+                {
+                    "job_id": job_id,
+                    "data": data,
+                    "use_cached": use_cached,
+                    "attempts": 0,
+                }
+                for job_id, _, data, use_cached in jobs
+            ],
+            {job_id: api_key for job_id, api_key, _, _ in jobs},
+        )
+        if not queued:
+            return False
+        for _ in range(min(len(jobs), self._threads)):
+            self._wakeup.release()
+        return True
+
+    def _work_loop(self):
+        while not self._stopping.is_set():
+            try:
+                raw_entry, slot = self._claim_next()
+            except Exception as e:
+                logger.warning("Async job claim failed: %s", e)
+                raw_entry, slot = None, None
+            if raw_entry is None:
+                # Local submissions wake us immediately; polling picks up
+                # entries queued or requeued by other processes.
+                self._wakeup.acquire(timeout=self._poll_seconds)
+                continue
+            try:
+                self._run(raw_entry)
+            finally:
+                if slot is not None:
+                    slot.release()
+                    # Let an idle thread pick up work this slot was gating.
+                    self._wakeup.release()
+
+    def _claim_next(self):
+        """Claim from the next provider (round-robin) that has a free slot."""
+        providers = self._queue.providers()
+        if not providers:
+            return None, None
+        start = next(self._rotation) % len(providers)
+        for provider in providers[start:] + providers[:start]:
+            slot = self._provider_slots.get(provider)
+            if slot is not None and not slot.acquire(blocking=False):
+                continue
+            try:
+                raw_entry = self._queue.claim(self.worker_id, provider)
+            except Exception:
+                if slot is not None:
+                    slot.release()
+                raise
+            if raw_entry is not None:
+                return raw_entry, slot
+            if slot is not None:
+                slot.release()
+        return None, None
+
+    def _run(self, raw_entry):
+        job_id = None
+        try:
+            entry = json.loads(raw_entry)
+            job_id = entry["job_id"]
+            api_key = self._queue.credential(job_id)
+            if api_key is None:
+                self._store.update_status(
+                    job_id,
+                    "failed",
+                    error={
+                        "code": "credential_expired",
+                        "message": "The job's credentials expired before it could run.",
+                    },
+                    expected_status="queued",
+                )
+            else:
+                self._handler(
+                    self._app,
+                    job_id,
+                    api_key,
+                    entry["data"],
+                    entry.get("use_cached", True),
+                )
+        except Exception as e:
+            logger.exception("Async job crashed outside its handler: %s", e)
+        finally:
+            try:
+                if job_id is not None:
+                    self._queue.forget_credential(job_id)
+                self._queue.ack(self.worker_id, raw_entry)
+            except Exception as e:
+                logger.warning("Async job ack failed: %s", e)
+
+    def _supervise_loop(self):
+        interval = self._heartbeat_seconds / 3.0
+        while not self._stopping.wait(interval):
+            try:
+                self._queue.heartbeat(self.worker_id, self._heartbeat_seconds)
+                self.recover_orphans()
+            except Exception as e:
+                logger.warning("Async job heartbeat/recovery failed: %s", e)
+
+    def recover_orphans(self):
+        """Requeue (or fail) jobs claimed by processes whose heartbeat expired."""
+        recovered = 0
+        for dead_worker in self._queue.dead_workers():
+            if dead_worker == self.worker_id:
+                continue
+            for raw_entry in self._queue.orphaned_entries(dead_worker):
+                if not self._queue.release(dead_worker, raw_entry):
+                    continue  # another process recovered it first
+                entry = json.loads(raw_entry)
+                entry["attempts"] = entry.get("attempts", 0) + 1
+                # Only jobs that never finished are failed or requeued; a
+                # worker may have stored a result right before dying.
+                unfinished = ("queued", "running")
+                if entry["attempts"] >= self._max_attempts:
+                    self._store.update_status(
+                        entry["job_id"],
+                        "failed",
+                        error={
+                            "code": "worker_lost",
+                            "message": "The worker running this job stopped before it finished.",
+                        },
+                        expected_status=unfinished,
+                    )
+                    self._queue.forget_credential(entry["job_id"])
+                elif self._store.update_status(
+                    entry["job_id"], "queued", expected_status=unfinished
+                ):
+                    self._queue.enqueue(entry)
+                    self._wakeup.release()
+                else:
+                    self._queue.forget_credential(entry["job_id"])
+                recovered += 1
+            self._queue.unregister(dead_worker)
+        if recovered:
+            logger.warning("Recovered %d orphaned async job(s)", recovered)
+        return recovered
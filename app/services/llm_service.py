@@ -1,17 +1,104 @@
+import contextlib
+import contextvars
 import json
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import google.generativeai as genai
+import prometheus_client
 from flask import current_app
 from openai import OpenAI
 
-from app.services import model_registry
+from app.services import (
+    client_pool,
+    gemini_context_cache,
+    gemini_sdk,
+    model_registry,
+    rate_limiter,
+    retry_policy,
+    step_schemas,
+)
 from app.services.model_validator import ModelValidator
-from app.utils.prompt_builder import PromptBuilder, STRICT_JSON_REMINDER
+from app.utils import json_stream
+from app.utils.prompt_builder import (
+    PromptBuilder,
+    STRICT_JSON_REMINDER,
+    estimate_tokens,
+)
 
 logger = logging.getLogger(__name__)
 
+JSON_EARLY_ABORTS = prometheus_client.Counter(
+    "llm_json_early_abort_total",
+    "Streamed JSON completions closed as soon as the first object was complete",
+    ["provider"],
+)
+JSON_TRAILING_OUTPUT_TOKENS = prometheus_client.Histogram(
+    "llm_json_trailing_output_tokens",
+    "Estimated output tokens after the first JSON object in fully read "
+    "completions (what early abort saves per call)",
+    ["provider"],
+    buckets=(0, 10, 25, 50, 100, 250, 500, 1000, 2000, 4000),
+)
+JSON_GENERATION_SECONDS = prometheus_client.Histogram(
+    "llm_json_generation_seconds",
+    "Duration of provider calls that must return one JSON object",
+    ["provider", "early_abort"],
+)
+
+LOCAL_REPAIR_FIXES = prometheus_client.Counter(
+    "llm_local_repair_fixes_total",
+    "Structural fixes applied to generated models without an LLM call",
+    ["rule"],
+)
+LLM_REPAIRS_AVOIDED = prometheus_client.Counter(
+    "llm_repair_calls_avoided_total",
+    "Few-shot LLM repair calls skipped because local repair fixed every issue",
+)
+
+JSON_RETRIES = prometheus_client.Counter(
+    "llm_json_retry_total",
+    "Extra provider calls made because the output was not the expected JSON object",
+    ["provider", "step"],
+)
+
+PROMPT_TOKENS = prometheus_client.Counter(
+    "llm_prompt_tokens_total",
+    "Prompt tokens reported by the provider",
+    ["provider"],
+)
+CACHED_PROMPT_TOKENS = prometheus_client.Counter(
+    "llm_cached_prompt_tokens_total",
+    "Prompt tokens the provider served from its prompt or context cache",
+    ["provider"],
+)
+
+
+def _record_prompt_usage(provider, prompt_tokens, cached_tokens):
+    """Export provider-reported token counts; missing counts are skipped."""
+    if isinstance(prompt_tokens, int):
+        PROMPT_TOKENS.labels(provider=provider).inc(prompt_tokens)
+    if isinstance(cached_tokens, int):
+        CACHED_PROMPT_TOKENS.labels(provider=provider).inc(cached_tokens)
+
+
+def _record_openai_usage(usage):
+    details = getattr(usage, "prompt_tokens_details", None)
+    _record_prompt_usage(
+        "openai",
+        getattr(usage, "prompt_tokens", None),
+        getattr(details, "cached_tokens", None),
+    )
+
+
+def _record_gemini_usage(usage_metadata):
+    _record_prompt_usage(
+        "gemini",
+        getattr(usage_metadata, "prompt_token_count", None),
+        getattr(usage_metadata, "cached_content_token_count", None),
+    )
+
 
 class EmptyResponseError(ValueError):
     """Raised when the provider returns no usable completion text."""
@@ -31,23 +118,45 @@ class LLMService:
         except RuntimeError:
             return default
 
+    def _provider_limiter(self, provider, api_key, model):
+        """Return the outbound limiter for this key and model, or None if off."""
+        if not self._config_value("PROVIDER_LIMITER_ENABLED", False):
+            return None
+        concurrency = self._config_value("PROVIDER_LIMITER_MAX_CONCURRENCY") or {}
+        rpm = self._config_value("PROVIDER_LIMITER_RPM") or {}
+        return rate_limiter.limiter_for(
+            provider,
+            api_key,
+            model,
+            max_concurrency=concurrency.get(provider, 16),
+            requests_per_minute=rpm.get(provider),
+            max_queue=self._config_value("PROVIDER_LIMITER_MAX_QUEUE", 64),
+            max_wait_seconds=self._config_value(
+                "PROVIDER_LIMITER_MAX_WAIT_SECONDS", 30
+            ),
+        )
+
+    @staticmethod
+    def _slot(limiter):
+        """Return a context that holds a slot of ``limiter`` (if any)."""
+        return limiter.slot() if limiter is not None else contextlib.nullcontext()
+
+    @staticmethod
+    def _limited(limiter, fn):
+        """Wrap zero-argument ``fn`` so each call holds a limiter slot."""
+        if limiter is None:
+            return fn
+
+        def call():
+            with limiter.slot():
+                return fn()
+
+        return call
+
     @staticmethod
     def _extract_json_object(text):
-        """Extract and parse a JSON object from model output text."""
-        content = (text or "").strip()
-        if content.startswith("```"):
-            lines = content.splitlines()
-            if lines and lines[0].startswith("```"):
-                lines = lines[1:]
-            if lines and lines[-1].startswith("```"):
-                lines = lines[:-1]
-            content = "\n".join(lines).strip()
-
-        start = content.find("{")
-        end = content.rfind("}")
-        if start == -1 or end == -1 or end <= start:
-            raise ValueError("Model output does not contain a JSON object.")
-        return json.loads(content[start:end + 1])
+        """Extract and parse the first JSON object from model output text."""
+        return json_stream.extract_first_object(text)
 
     @staticmethod
     def _merge_known_elements(partials):
@@ -69,9 +178,36 @@ class LLMService:
                     merged[key].append(item)
         return merged
 
-    def _build_repair_prompt(self, user_text, model_json, issues):
-        """Create a repair prompt from validation findings."""
+    def _repair_locally(self, model, issues, user_text):
+        """Apply ``ModelValidator.repair_model`` when it reduces the issues.
+
+        Returns the (possibly repaired) model and its remaining issues; only
+        those are left for the LLM repair pass.
+        """
+        repaired, fixes = self.model_validator.repair_model(model)
+        if not fixes:
+            return model, issues
+        remaining = self.model_validator.validate_model(repaired, user_text)
+        if len(remaining) >= len(issues):
+            return model, issues
+        for fix in fixes:
+            LOCAL_REPAIR_FIXES.labels(rule=fix).inc()
+        logger.info(
+            "Local repair applied %d fix(es); %d of %d issue(s) remain",
+            len(fixes),
+            len(remaining),
+            len(issues),
+        )
+        return repaired, remaining
+
+    def _build_repair_prompt(self, user_text, model_json, issues, loops=()):
+        """Create a repair prompt from validation findings.
+
+        ``loops`` (node-ID lists from ``ModelValidator.find_loops``) name the
+        cycles already present, so the model can fix the right one.
+        """
         issues_block = "\n".join(f"- {issue}" for issue in issues)
+        loops_block = "\n".join(f"- {', '.join(loop)}" for loop in loops) or "- none"
         model_block = json.dumps(model_json, ensure_ascii=False, indent=2)
         return (
             "You are repairing a BPMN JSON model to satisfy strict structural rules.\n"
@@ -81,6 +217,8 @@ class LLMService:
             f"{user_text}\n\n"
             "Validation issues to fix:\n"
             f"{issues_block}\n\n"
+            "Loops in the current model (node IDs per loop):\n"
+            f"{loops_block}\n\n"
             "Current model:\n"
             f"{model_block}\n"
         )
@@ -114,16 +252,74 @@ class LLMService:
 
         return ""
 
-    def _has_json_object(self, text):
+    @staticmethod
+    def _has_json_object(text):
         """Return True when text contains a parseable JSON object."""
         try:
-            self._extract_json_object(text)
+            LLMService._extract_json_object(text)
             return True
         except Exception:  # noqa: BLE001
             return False
 
-    def _run_few_shot_orchestration(self, user_text, generate_once):
-        """Run real multi-call few-shot extraction and merge with validation."""
+    def _few_shot_max_concurrency(self):
+        """Return the configured cap for concurrently running few-shot steps."""
+        try:
+            value = int(self._config_value("FEW_SHOT_MAX_CONCURRENCY", 4))
+        except (TypeError, ValueError):
+            return 1
+        return max(1, value)
+
+    @staticmethod
+    def _run_concurrently(calls, max_concurrency):
+        """Run zero-argument callables with at most ``max_concurrency`` in flight.
+
+        Results are returned in the order of ``calls``. Each call runs in a copy
+        of the caller's context so Flask's app context stays available inside
+        worker threads. The first exception (in call order) is re-raised after
+        pending calls are cancelled.
+        """
+        if max_concurrency <= 1 or len(calls) <= 1:
+            return [call() for call in calls]
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(max_concurrency, len(calls)),
+            thread_name_prefix="few-shot-step",
+        )
+        try:
+            futures = [
+                executor.submit(contextvars.copy_context().run, call)
+                for call in calls
+            ]
+            return [future.result() for future in futures]
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run_few_shot_orchestration(
+        self,
+        user_text,
+        generate_once,
+        step_cache=None,
+        cache_scope=(),
+        max_prompt_tokens=None,
+        use_response_schemas=False,
+    ):
+        """Run real multi-call few-shot extraction and merge with validation.
+
+        When ``step_cache`` is given, each step's parsed JSON is memoized under
+        the step name, the composed step prompt and ``cache_scope`` (provider,
+        model, system prompt). A retried or re-submitted run therefore resumes
+        at the first step without a cached result.
+
+        Step prompts larger than ``max_prompt_tokens`` raise
+        ``PromptTooLargeError`` before any call, so the step takes its
+        fallback instead of spending a call that would be truncated.
+
+        Every step output is checked against its schema in ``step_schemas``;
+        a mismatch is handled like non-JSON output (one strict retry, then the
+        step's fallback). With ``use_response_schemas`` the schema is also
+        passed to ``generate_once(prompt, schema)`` for provider-side
+        structured output.
+        """
         pack = self.prompt_builder.few_shot_prompt_pack
         shared = pack.get("00_shared_rules.txt", "")
 
@@ -139,55 +335,79 @@ class LLMService:
             if not pack.get(file_name):
                 raise ValueError(f"Missing few-shot prompt file: {file_name}")
 
-        def compose_prompt(step_text, known_elements=None, partial_outputs=None):
-            body = step_text.replace(
-                "{{PROCESS_TEXT}}",
+        def compose_prompt(file_name, known_elements=None, partial_outputs=None):
+            return self.prompt_builder.render_step(
+                file_name,
                 "Summarized process context (derived from full input):\n"
                 f"{process_context}",
+                known_elements_json=json.dumps(
+                    known_elements or {}, ensure_ascii=False, indent=2
+                ),
+                partial_outputs_json=json.dumps(
+                    partial_outputs or {}, ensure_ascii=False, indent=2
+                ),
+                max_tokens=max_prompt_tokens,
             )
-            if "{{KNOWN_ELEMENTS_JSON}}" in body:
-                body = body.replace(
-                    "{{KNOWN_ELEMENTS_JSON}}",
-                    json.dumps(known_elements or {}, ensure_ascii=False, indent=2),
-                )
-            if "{{PARTIAL_OUTPUTS_JSON}}" in body:
-                body = body.replace(
-                    "{{PARTIAL_OUTPUTS_JSON}}",
-                    json.dumps(partial_outputs or {}, ensure_ascii=False, indent=2),
-                )
-            return (
-                f"{shared}\n\n{body}\n\n"
-                f"{STRICT_JSON_REMINDER}\n"
-                "Return only JSON matching the step schema."
-            ).strip()
 
         def run_json_step(step_name, prompt):
-            response_text = generate_once(prompt)
+            if step_cache is None:
+                return run_json_step_uncached(step_name, prompt)
+
+            cache_key = step_cache.make_key(step_name, prompt, *cache_scope)
+            cached = step_cache.get(
+                cache_key, provider=cache_scope[0] if cache_scope else None
+            )
+            if cached is not None:
+                logger.info("few-shot step '%s' served from step cache", step_name)
+                return json.loads(cached)
+            result = run_json_step_uncached(step_name, prompt)
+            step_cache.set(cache_key, json.dumps(result, ensure_ascii=False))
+            return result
+
+        def generate_step(step_name, prompt):
+            if not use_response_schemas:
+                return generate_once(prompt)
+            return generate_once(prompt, step_schemas.response_schema(step_name))
+
+        def parse_step(step_name, response_text):
+            result = self._extract_json_object(response_text)
+            step_schemas.validate_step(step_name, result)
+            return result
+
+        def run_json_step_uncached(step_name, prompt):
+            response_text = generate_step(step_name, prompt)
             try:
-                return self._extract_json_object(response_text)
+                return parse_step(step_name, response_text)
             except ValueError as first_error:
                 logger.warning(
-                    "few-shot step '%s' returned non-JSON output; retrying with strict JSON reminder",
+                    "few-shot step '%s' returned invalid output (%s); retrying with strict JSON reminder",
                     step_name,
+                    first_error,
                 )
+                JSON_RETRIES.labels(
+                    provider=cache_scope[0] if cache_scope else "unknown",
+                    step=step_name,
+                ).inc()
                 retry_prompt = (
                     f"{prompt}\n\n"
                     f"{STRICT_JSON_REMINDER} "
                     "Respond again with exactly one JSON object matching the requested schema."
                 )
-                retry_response_text = generate_once(retry_prompt)
+                retry_response_text = generate_step(step_name, retry_prompt)
                 try:
-                    return self._extract_json_object(retry_response_text)
+                    return parse_step(step_name, retry_response_text)
                 except ValueError:
                     raise ValueError(
-                        f"Few-shot step '{step_name}' did not return a JSON object after retry."
+                        f"Few-shot step '{step_name}' did not return a valid JSON object after retry."
                     ) from first_error
 
         # Build a compact context once from the raw process text so follow-up
         # steps do not need the full source text again.
+        # Shared rules lead every step prompt (and the system prompt precedes
+        # them), so providers can reuse the cached prefix across all calls.
         context_summary_prompt = (
-            "You are preparing context for a multi-step BPMN extraction pipeline.\n"
             f"{shared}\n\n"
+            "You are preparing context for a multi-step BPMN extraction pipeline.\n"
             f"{STRICT_JSON_REMINDER}\n"
             "Return exactly one JSON object with this schema:\n"
             '{"process_context": "..."}\n\n'
@@ -198,76 +418,80 @@ class LLMService:
             f"{user_text}"
         )
 
-        context_obj = run_json_step("context_summary", context_summary_prompt)
+        context_obj = run_json_step(
+            "context_summary",
+            self.prompt_builder.check_budget(context_summary_prompt, max_prompt_tokens),
+        )
         process_context = (context_obj.get("process_context") or "").strip()
         if not process_context:
             raise ValueError("few-shot context_summary returned empty process_context")
 
-        partials = {}
-
-        try:
-            start_obj = run_json_step(
-                "start_event", compose_prompt(pack["01_start_event_prompt.txt"])
-            )
-        except ValueError as start_error:
-            logger.warning(
-                "few-shot start_event step failed (%s); falling back to default start event",
-                start_error,
-            )
-            start_obj = {
-                "events": [
-                    {
-                        "id": "startEvent1",
-                        "type": "startEvent",
-                        "name": "Start",
-                    }
-                ]
-            }
-        partials["start"] = start_obj
-
-        try:
-            tasks_obj = run_json_step(
-                "tasks", compose_prompt(pack["02_tasks_prompt.txt"])
-            )
-        except ValueError as tasks_error:
-            logger.warning(
-                "few-shot tasks step failed (%s); falling back to empty tasks list",
-                tasks_error,
-            )
-            tasks_obj = {"tasks": []}
-        partials["tasks"] = tasks_obj
+        # start_event, tasks, gateways and end_event only depend on
+        # process_context, so they are fanned out concurrently and joined
+        # before the flows step (which needs all four as known elements).
+        independent_steps = [
+            (
+                "start_event",
+                "01_start_event_prompt.txt",
+                {
+                    "events": [
+                        {
+                            "id": "startEvent1",
+                            "type": "startEvent",
+                            "name": "Start",
+                        }
+                    ]
+                },
+                "default start event",
+            ),
+            ("tasks", "02_tasks_prompt.txt", {"tasks": []}, "empty tasks list"),
+            (
+                "gateways",
+                "03_gateways_prompt.txt",
+                {"gateways": []},
+                "empty gateways list",
+            ),
+            (
+                "end_event",
+                "05_end_event_prompt.txt",
+                {
+                    "events": [
+                        {
+                            "id": "endEvent1",
+                            "type": "endEvent",
+                            "name": "End",
+                        }
+                    ]
+                },
+                "default end event",
+            ),
+        ]
 
-        try:
-            gateways_obj = run_json_step(
-                "gateways", compose_prompt(pack["03_gateways_prompt.txt"])
-            )
-        except ValueError as gateways_error:
-            logger.warning(
-                "few-shot gateways step failed (%s); falling back to empty gateways list",
-                gateways_error,
-            )
-            gateways_obj = {"gateways": []}
-        partials["gateways"] = gateways_obj
+        def run_step_with_fallback(step_name, file_name, fallback, fallback_label):
+            try:
+                return run_json_step(step_name, compose_prompt(file_name))
+            except ValueError as step_error:
+                logger.warning(
+                    "few-shot %s step failed (%s); falling back to %s",
+                    step_name,
+                    step_error,
+                    fallback_label,
+                )
+                return fallback
 
-        try:
-            end_obj = run_json_step(
-                "end_event", compose_prompt(pack["05_end_event_prompt.txt"])
-            )
-        except ValueError as end_error:
-            logger.warning(
-                "few-shot end_event step failed (%s); falling back to default end event",
-                end_error,
-            )
-            end_obj = {
-                "events": [
-                    {
-                        "id": "endEvent1",
-                        "type": "endEvent",
-                        "name": "End",
-                    }
-                ]
-            }
-        partials["end"] = end_obj
+        start_obj, tasks_obj, gateways_obj, end_obj = self._run_concurrently(
+            [
+                (lambda spec=spec: run_step_with_fallback(*spec))
+                for spec in independent_steps
+            ],
+            max_concurrency=self._few_shot_max_concurrency(),
+        )
+        partials = {
+            "start": start_obj,
+            "tasks": tasks_obj,
+            "gateways": gateways_obj,
+            "end": end_obj,
+        }
 
         known_elements = self._merge_known_elements(
             [start_obj, tasks_obj, gateways_obj, end_obj]
@@ -275,9 +499,7 @@ class LLMService:
         try:
             flows_obj = run_json_step(
                 "flows",
-                compose_prompt(
-                    pack["04_flows_prompt.txt"], known_elements=known_elements
-                ),
+                compose_prompt("04_flows_prompt.txt", known_elements=known_elements),
             )
         except ValueError as flows_error:
             logger.warning(
@@ -298,7 +520,7 @@ class LLMService:
             merged_obj = run_json_step(
                 "merge_and_validate",
                 compose_prompt(
-                    pack["06_merge_and_validate_prompt.txt"],
+                    "06_merge_and_validate_prompt.txt",
                     partial_outputs=merge_input,
                 ),
             )
@@ -317,12 +539,23 @@ class LLMService:
         sanitized = self.model_validator.sanitize_model(merged_obj)
         issues = self.model_validator.validate_model(sanitized, user_text)
 
+        if issues:
+            sanitized, issues = self._repair_locally(sanitized, issues, user_text)
+            if not issues:
+                LLM_REPAIRS_AVOIDED.inc()
+                logger.info("few-shot validation issues fixed by local repair")
+
         if issues:
             logger.warning(
                 "few-shot validation found %d issue(s), running repair pass",
                 len(issues),
             )
-            repair_prompt = self._build_repair_prompt(user_text, sanitized, issues)
+            repair_prompt = self._build_repair_prompt(
+                user_text,
+                sanitized,
+                issues,
+                loops=self.model_validator.find_loops(sanitized),
+            )
             try:
                 repaired_obj = run_json_step("repair", repair_prompt)
                 sanitized = self.model_validator.sanitize_model(repaired_obj)
@@ -343,7 +576,15 @@ class LLMService:
         return json.dumps(sanitized, ensure_ascii=False)
 
     @staticmethod
-    def _openai_generate_once(client, system_prompt, model, prompt):
+    def _openai_request_kwargs(
+        system_prompt, model, prompt, json_mode=False, schema=None
+    ):
+        """Build chat.completions arguments shared by sync and async calls.
+
+        ``json_mode`` asks the API for a single JSON object (response_format
+        json_object) and ``schema`` for output matching a JSON schema; only
+        pass them for models whose registry capabilities allow it.
+        """
         model_name = (model or "").lower()
         request_kwargs = {
             "messages": [
@@ -351,28 +592,77 @@ class LLMService:
                 {"role": "user", "content": prompt},
             ],
             "model": model,
-            "max_completion_tokens": 4096,
+            "max_completion_tokens": model_registry.model_limits(
+                "openai", model
+            ).max_output_tokens,
         }
+        if schema is not None:
+            request_kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": "step_output", "schema": schema},
+            }
+        elif json_mode:
+            request_kwargs["response_format"] = {"type": "json_object"}
         # GPT-5 variants can reject explicit temperature values and only accept
         # provider defaults. Avoid first-attempt 400s by omitting it up front.
         if not model_name.startswith("gpt-5"):
             request_kwargs["temperature"] = 0
-        try:
-            chat_completion = client.chat.completions.create(**request_kwargs)
-        except Exception as e:
-            # Some OpenAI models (for example GPT-5 variants) only accept the
-            # default temperature and reject an explicit value.
-            error_text = str(e).lower()
-            if "temperature" in error_text and "unsupported" in error_text:
+        return request_kwargs
+
+    @staticmethod
+    def _is_unsupported_temperature_error(exc):
+        # Some OpenAI models (for example GPT-5 variants) only accept the
+        # default temperature and reject an explicit value.
+        error_text = str(exc).lower()
+        return "temperature" in error_text and "unsupported" in error_text
+
+    @staticmethod
+    def _retry_policy():
+        """Return the configured retry policy for provider calls."""
+        defaults = retry_policy.DEFAULT_POLICY
+        return retry_policy.RetryPolicy(
+            max_attempts=LLMService._config_value(
+                "PROVIDER_RETRY_MAX_ATTEMPTS", defaults.max_attempts
+            ),
+            base_delay=LLMService._config_value(
+                "PROVIDER_RETRY_BASE_DELAY_SECONDS", defaults.base_delay
+            ),
+            max_delay=LLMService._config_value(
+                "PROVIDER_RETRY_MAX_DELAY_SECONDS", defaults.max_delay
+            ),
+            deadline_seconds=LLMService._config_value(
+                "PROVIDER_RETRY_DEADLINE_SECONDS", defaults.deadline_seconds
+            ),
+        )
+
+    @staticmethod
+    def _openai_create(client, request_kwargs, model, limiter=None):
+        """Call chat.completions.create under the retry policy.
+
+        Models that reject an explicit temperature are retried once without it.
+        Each attempt holds a slot of ``limiter``.
+        """
+
+        def create():
+            try:
+                return client.chat.completions.create(**request_kwargs)
+            except Exception as e:
+                if not LLMService._is_unsupported_temperature_error(e):
+                    raise
                 logger.info(
                     "Retrying OpenAI call without explicit temperature (model=%s)",
                     model,
                 )
                 request_kwargs.pop("temperature", None)
-                chat_completion = client.chat.completions.create(**request_kwargs)
-            else:
-                raise
+                return client.chat.completions.create(**request_kwargs)
+
+        return retry_policy.call(
+            "openai", LLMService._limited(limiter, create), LLMService._retry_policy()
+        )
 
+    @staticmethod
+    def _openai_completion_text(chat_completion, model):
+        """Return the completion text or raise ``EmptyResponseError``."""
         first_choice = chat_completion.choices[0] if chat_completion.choices else None
         message = getattr(first_choice, "message", None)
         content = LLMService._extract_openai_message_text(message)
@@ -382,6 +672,7 @@ class LLMService:
         usage = getattr(chat_completion, "usage", None)
         prompt_tokens = getattr(usage, "prompt_tokens", None)
         completion_tokens = getattr(usage, "completion_tokens", None)
+        _record_openai_usage(usage)
 
         logger.debug(
             "OpenAI completion metadata (model=%s, finish_reason=%s, prompt_tokens=%s, completion_tokens=%s, content_len=%d)",
@@ -402,20 +693,330 @@ class LLMService:
         return content
 
     @staticmethod
-    def _gemini_generate_once(gen_model, prompt):
-        response = gen_model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.0, top_k=1, top_p=1.0, max_output_tokens=2048
-            ),
+    def _openai_generate_once(
+        client,
+        system_prompt,
+        model,
+        prompt,
+        json_mode=False,
+        schema=None,
+        limiter=None,
+    ):
+        request_kwargs = LLMService._openai_request_kwargs(
+            system_prompt, model, prompt, json_mode, schema
+        )
+        chat_completion = LLMService._openai_create(
+            client, request_kwargs, model, limiter
+        )
+        return LLMService._openai_completion_text(chat_completion, model)
+
+    @staticmethod
+    def _openai_stream_once(
+        client,
+        system_prompt,
+        model,
+        prompt,
+        json_mode=False,
+        schema=None,
+        limiter=None,
+    ):
+        """Yield text deltas of a streamed chat completion.
+
+        A slot of ``limiter`` is held until the stream is exhausted or closed.
+        """
+        request_kwargs = LLMService._openai_request_kwargs(
+            system_prompt, model, prompt, json_mode, schema
         )
+        request_kwargs["stream"] = True
+        # The final chunk then carries usage (with cached prompt tokens).
+        request_kwargs["stream_options"] = {"include_usage": True}
+        with LLMService._slot(limiter):
+            # Only opening the stream is retried; chunks may already be relayed.
+            stream = LLMService._openai_create(client, request_kwargs, model)
+            try:
+                for chunk in stream:
+                    delta = LLMService._openai_chunk_text(chunk)
+                    if delta:
+                        yield delta
+            finally:
+                # Closing the HTTP response stops generation when the consumer
+                # stops early (e.g. after the first complete JSON object).
+                close = getattr(stream, "close", None)
+                if callable(close):
+                    close()
+
+    @staticmethod
+    def _openai_chunk_text(chunk):
+        """Return the text delta of a stream chunk and record its usage, if any."""
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            _record_openai_usage(usage)
+        choice = chunk.choices[0] if chunk.choices else None
+        return getattr(getattr(choice, "delta", None), "content", None)
+
+    @staticmethod
+    def _gemini_generation_config(model=None, json_mode=False, schema=None):
+        config = {
+            "temperature": 0.0,
+            "top_k": 1,
+            "top_p": 1.0,
+            "max_output_tokens": model_registry.model_limits(
+                "gemini", model
+            ).max_output_tokens,
+        }
+        if json_mode or schema is not None:
+            config["response_mime_type"] = "application/json"
+        if schema is not None:
+            config["response_schema"] = schema
+        return genai.types.GenerationConfig(**config)
+
+    @staticmethod
+    def _gemini_response_text(response):
+        """Return the response text or raise ``EmptyResponseError``."""
+        _record_gemini_usage(getattr(response, "usage_metadata", None))
         text = ((response.text or "") if hasattr(response, "text") else "").strip()
         if not text:
             raise EmptyResponseError("Gemini returned empty response text.")
         return text
 
+    @staticmethod
+    def _gemini_chunk_text(chunk):
+        """Return the text of a stream chunk, or None if it has no text parts."""
+        try:
+            return chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. finish/safety metadata).
+            return None
+
+    @staticmethod
+    def _record_gemini_stream_usage(response):
+        _record_gemini_usage(getattr(response, "usage_metadata", None))
+
+    @staticmethod
+    def _gemini_generate_once(
+        gen_model, prompt, model=None, json_mode=False, schema=None, limiter=None
+    ):
+        response = retry_policy.call(
+            "gemini",
+            LLMService._limited(
+                limiter,
+                lambda: gen_model.generate_content(
+                    prompt,
+                    generation_config=LLMService._gemini_generation_config(
+                        model, json_mode, schema
+                    ),
+                ),
+            ),
+            LLMService._retry_policy(),
+        )
+        return LLMService._gemini_response_text(response)
+
+    @staticmethod
+    def _gemini_stream_once(
+        gen_model, prompt, model=None, json_mode=False, schema=None, limiter=None
+    ):
+        """Yield text chunks of a streamed Gemini response.
+
+        A slot of ``limiter`` is held until the stream is exhausted or closed.
+        """
+        with LLMService._slot(limiter):
+            # Only opening the stream is retried; chunks may already be relayed.
+            response = retry_policy.call(
+                "gemini",
+                lambda: gen_model.generate_content(
+                    prompt,
+                    generation_config=LLMService._gemini_generation_config(
+                        model, json_mode, schema
+                    ),
+                    stream=True,
+                ),
+                LLMService._retry_policy(),
+            )
+            try:
+                for chunk in response:
+                    text = LLMService._gemini_chunk_text(chunk)
+                    if text:
+                        yield text
+                LLMService._record_gemini_stream_usage(response)
+            finally:
+                gemini_sdk.cancel_stream(response)
+
+    @staticmethod
+    def _read_until_json_object(provider, chunks):
+        """Consume streamed ``chunks`` up to the end of the first JSON object.
+
+        The stream is closed as soon as the object is complete, so prose the
+        model adds afterwards is neither waited for nor generated. Returns the
+        text read (cut at the object when one was found) and whether the
+        stream was stopped at the object.
+        """
+        scanner = json_stream.JsonObjectScanner()
+        parts = []
+        try:
+            for chunk in chunks:
+                parts.append(chunk)
+                if scanner.feed(chunk) is not None:
+                    break
+        finally:
+            chunks.close()
+        return LLMService._json_object_text(provider, scanner, parts)
+
+    @staticmethod
+    def _json_object_text(provider, scanner, parts):
+        """Join streamed ``parts`` read by ``_read_until_json_object``."""
+        text = "".join(parts)
+        if scanner.done:
+            JSON_EARLY_ABORTS.labels(provider=provider).inc()
+            text = text[: scanner.end]
+        text = text.strip()
+        if not text:
+            raise EmptyResponseError(f"{provider} returned an empty streamed response.")
+        return text, scanner.done
+
+    @staticmethod
+    def _observe_trailing_output(provider, text):
+        scanner = json_stream.JsonObjectScanner()
+        scanner.feed(text)
+        if scanner.done:
+            JSON_TRAILING_OUTPUT_TOKENS.labels(provider=provider).observe(
+                estimate_tokens(text[scanner.end :].strip())
+            )
+
+    def _json_generator(self, provider, generate_once, stream_once):
+        """Wrap provider calls for prompts that must answer with one JSON object.
+
+        With ``JSON_EARLY_ABORT_ENABLED`` the completion is streamed and closed
+        once the first object is complete; otherwise it is read in full and
+        the output that followed the object is recorded.
+        """
+        early_abort = bool(self._config_value("JSON_EARLY_ABORT_ENABLED", False))
+
+        def generate(prompt, schema=None):
+            started = time.monotonic()
+            if early_abort:
+                text, aborted = self._read_until_json_object(
+                    provider, stream_once(prompt, schema)
+                )
+            else:
+                text, aborted = generate_once(prompt, schema), False
+                self._observe_trailing_output(provider, text)
+            JSON_GENERATION_SECONDS.labels(
+                provider=provider, early_abort=str(aborted).lower()
+            ).observe(time.monotonic() - started)
+            return text
+
+        return generate
+
+    @staticmethod
+    def _expects_json_object(prompting_strategy, model):
+        """GPT-5 zero-shot calls must answer with a JSON object."""
+        model_name = (model or "").lower()
+        return prompting_strategy == "zero_shot" and model_name.startswith("gpt-5")
+
+    @staticmethod
+    def _needs_json_retry(prompting_strategy, model, content):
+        """GPT-5 zero-shot output without a JSON object gets one strict retry."""
+        if not LLMService._expects_json_object(prompting_strategy, model):
+            return False
+        return not LLMService._has_json_object(content)
+
+    @staticmethod
+    def _json_retry_prompt(prompt):
+        return (
+            f"{prompt}\n\n"
+            f"{STRICT_JSON_REMINDER}\n"
+            "Return exactly one JSON object."
+        )
+
+    @staticmethod
+    def _prompt_token_budget(provider, model, system_prompt):
+        """Input tokens left for the prompt after the system prompt and output."""
+        limits = model_registry.model_limits(provider, model)
+        return (
+            limits.context_tokens
+            - limits.max_output_tokens
+            - estimate_tokens(system_prompt)
+        )
+
+    def _openai_client(self, api_key):
+        """Return a pooled OpenAI client for ``api_key`` and the configured host."""
+        return client_pool.openai_client(
+            OpenAI, api_key, self._config_value("OPENAI_BASE_URL")
+        )
+
+    def _gemini_client_manager(self, api_key):
+        """Return a pooled, per-key Gemini client manager."""
+        return gemini_sdk.client_manager(
+            api_key, self._config_value("GEMINI_API_ENDPOINT")
+        )
+
+    def _gemini_model(self, api_key, model, system_prompt):
+        gen_model = genai.GenerativeModel(
+            model_name=model, system_instruction=system_prompt
+        )
+        # Bind the pooled per-key client instead of calling genai.configure(),
+        # which mutates process-global state and races between concurrent
+        # requests that use different API keys.
+        return gemini_sdk.bind_model(gen_model, self._gemini_client_manager(api_key))
+
+    def _gemini_step_router(
+        self, api_key, model, system_prompt, gen_model, asynchronous=False
+    ):
+        """Return ``route(prompt) -> (gen_model, prompt)`` for few-shot steps.
+
+        With ``GEMINI_CONTEXT_CACHE_ENABLED``, the system prompt and shared
+        rules are held in Gemini cached content, and steps that start with the
+        shared rules send only the remainder to a model bound to that cache.
+        Otherwise (or if the cache cannot be created) prompts go unchanged to
+        ``gen_model``. With ``asynchronous``, the cached-content model is bound
+        for ``generate_content_async``.
+        """
+        shared = self.prompt_builder.few_shot_prompt_pack.get("00_shared_rules.txt")
+        if not shared or not self._config_value("GEMINI_CONTEXT_CACHE_ENABLED", False):
+            return lambda prompt: (gen_model, prompt)
+
+        manager = self._gemini_client_manager(api_key)
+
+        def create(ttl_seconds):
+            return gemini_sdk.create_cached_content(
+                manager, model, system_prompt, [shared], ttl_seconds
+            )
+
+        cached_content = gemini_context_cache.cached_content_name(
+            api_key,
+            model,
+            system_prompt,
+            shared,
+            self._config_value("GEMINI_CONTEXT_CACHE_TTL_SECONDS", 3600),
+            create,
+        )
+        if cached_content is None:
+            return lambda prompt: (gen_model, prompt)
+
+        cached_model = gemini_sdk.bind_model(
+            gemini_sdk.bind_cached_content(
+                genai.GenerativeModel(model_name=model), cached_content
+            ),
+            manager,
+            asynchronous=asynchronous,
+        )
+        prefix = f"{shared}\n\n"
+
+        def route(prompt):
+            if prompt.startswith(prefix):
+                return cached_model, prompt[len(prefix) :]
+            return gen_model, prompt
+
+        return route
+
     def call_openai(
-        self, api_key, system_prompt, user_text, prompting_strategy, model="gpt-4o"
+        self,
+        api_key,
+        system_prompt,
+        user_text,
+        prompting_strategy,
+        model="gpt-4o",
+        step_cache=None,
     ):
         """Call OpenAI GPT model.
 
@@ -426,7 +1027,13 @@ class LLMService:
         if not user_text:
             logger.warning("call_openai: empty user_text provided")
         start_time = time.time()
-        prompt = self.prompt_builder.build_prompt(prompting_strategy, user_text)
+        max_prompt_tokens = self._prompt_token_budget("openai", model, system_prompt)
+        prompt = None
+        if prompting_strategy != "few_shot":
+            # Few-shot step prompts are composed and budget-checked per step.
+            prompt = self.prompt_builder.build_prompt(
+                prompting_strategy, user_text, max_tokens=max_prompt_tokens
+            )
         logger.debug(
             "call_openai: strategy=%s, model=%s, user_text_len=%d, prompt_len=%d",
             prompting_strategy,
@@ -435,12 +1042,30 @@ class LLMService:
             len(prompt or ""),
         )
 
-        openai_base_url = self._config_value("OPENAI_BASE_URL")
-        client_kwargs = {"api_key": api_key}
-        if openai_base_url:
-            client_kwargs["base_url"] = openai_base_url
-            logger.info("Using configured OpenAI base URL")
-        client = OpenAI(**client_kwargs)
+        client = self._openai_client(api_key)
+        limiter = self._provider_limiter("openai", api_key, model)
+        capabilities = model_registry.model_capabilities("openai", model)
+        generate_json = self._json_generator(
+            "openai",
+            lambda step_prompt, schema: self._openai_generate_once(
+                client,
+                system_prompt,
+                model,
+                step_prompt,
+                capabilities.json_mode,
+                schema,
+                limiter,
+            ),
+            lambda step_prompt, schema: self._openai_stream_once(
+                client,
+                system_prompt,
+                model,
+                step_prompt,
+                capabilities.json_mode,
+                schema,
+                limiter,
+            ),
+        )
 
         try:
             if prompting_strategy == "few_shot":
@@ -448,9 +1073,11 @@ class LLMService:
                     logger.info("Running OpenAI few-shot multi-call orchestration")
                     return self._run_few_shot_orchestration(
                         user_text,
-                        lambda prompt: self._openai_generate_once(
-                            client, system_prompt, model, prompt
-                        ),
+                        generate_json,
+                        step_cache=step_cache,
+                        cache_scope=("openai", model, system_prompt),
+                        max_prompt_tokens=max_prompt_tokens,
+                        use_response_schemas=capabilities.json_schema,
                     )
                 except Exception as orchestration_error:
                     logger.warning(
@@ -466,36 +1093,27 @@ class LLMService:
                     len(prompt or ""),
                     prompt_preview,
                 )
-            content = self._openai_generate_once(client, system_prompt, model, prompt)
+            if self._expects_json_object(prompting_strategy, model):
+                content = generate_json(prompt)
+            else:
+                content = self._openai_generate_once(
+                    client, system_prompt, model, prompt, limiter=limiter
+                )
             duration = time.time() - start_time
             logger.info(
                 "OpenAI response received in %.3fs (len=%d)",
                 duration,
                 len(content),
             )
-            model_name = (model or "").lower()
-            if (
-                prompting_strategy == "zero_shot"
-                and model_name.startswith("gpt-5")
-                and not self._has_json_object(content)
-            ):
+            if self._needs_json_retry(prompting_strategy, model, content):
                 preview = (content or "")[:120].replace("\n", "\\n")
                 logger.warning(
                     "OpenAI zero-shot produced non-JSON output for GPT-5 (len=%d, preview=%r); retrying with strict JSON reminder",
                     len(content),
                     preview,
                 )
-                retry_prompt = (
-                    f"{prompt}\n\n"
-                    f"{STRICT_JSON_REMINDER}\n"
-                    "Return exactly one JSON object."
-                )
-                content = self._openai_generate_once(
-                    client,
-                    system_prompt,
-                    model,
-                    retry_prompt,
-                )
+                JSON_RETRIES.labels(provider="openai", step="zero_shot").inc()
+                content = generate_json(self._json_retry_prompt(prompt))
                 logger.info(
                     "OpenAI zero-shot retry received (len=%d, has_json=%s)",
                     len(content),
@@ -520,6 +1138,7 @@ class LLMService:
         user_text,
         prompting_strategy,
         model=None,
+        step_cache=None,
     ):
         """Call Google Gemini model.
 
@@ -531,7 +1150,13 @@ class LLMService:
         if not user_text:
             logger.warning("call_gemini: empty user_text provided")
         start_time = time.time()
-        prompt = self.prompt_builder.build_prompt(prompting_strategy, user_text)
+        max_prompt_tokens = self._prompt_token_budget("gemini", model, system_prompt)
+        prompt = None
+        if prompting_strategy != "few_shot":
+            # Few-shot step prompts are composed and budget-checked per step.
+            prompt = self.prompt_builder.build_prompt(
+                prompting_strategy, user_text, max_tokens=max_prompt_tokens
+            )
         logger.debug(
             "call_gemini: strategy=%s, model=%s, user_text_len=%d, prompt_len=%d",
             prompting_strategy,
@@ -540,26 +1165,40 @@ class LLMService:
             len(prompt or ""),
         )
 
-        gemini_api_endpoint = self._config_value("GEMINI_API_ENDPOINT")
-        genai_kwargs = {"api_key": api_key}
-        if gemini_api_endpoint:
-            genai_kwargs["client_options"] = {"api_endpoint": gemini_api_endpoint}
-            logger.info("Using configured Gemini API endpoint")
-        genai.configure(**genai_kwargs)
-
-        gen_model = genai.GenerativeModel(
-            model_name=model, system_instruction=system_prompt
-        )
+        gen_model = self._gemini_model(api_key, model, system_prompt)
+        limiter = self._provider_limiter("gemini", api_key, model)
 
         try:
             if prompting_strategy == "few_shot":
                 try:
                     logger.info("Running Gemini few-shot multi-call orchestration")
+                    route = self._gemini_step_router(
+                        api_key, model, system_prompt, gen_model
+                    )
+                    capabilities = model_registry.model_capabilities("gemini", model)
                     return self._run_few_shot_orchestration(
                         user_text,
-                        lambda step_prompt: self._gemini_generate_once(
-                            gen_model, step_prompt
+                        self._json_generator(
+                            "gemini",
+                            lambda step_prompt, schema: self._gemini_generate_once(
+                                *route(step_prompt),
+                                model,
+                                capabilities.json_mode,
+                                schema,
+                                limiter,
+                            ),
+                            lambda step_prompt, schema: self._gemini_stream_once(
+                                *route(step_prompt),
+                                model,
+                                capabilities.json_mode,
+                                schema,
+                                limiter,
+                            ),
                         ),
+                        step_cache=step_cache,
+                        cache_scope=("gemini", model, system_prompt),
+                        max_prompt_tokens=max_prompt_tokens,
+                        use_response_schemas=capabilities.json_schema,
                     )
                 except Exception as orchestration_error:
                     logger.warning(
@@ -568,7 +1207,9 @@ class LLMService:
                     raise
 
             logger.info("Calling Gemini generate_content (model=%s)", model)
-            text = self._gemini_generate_once(gen_model, prompt)
+            text = self._gemini_generate_once(
+                gen_model, prompt, model, limiter=limiter
+            )
             duration = time.time() - start_time
             logger.info(
                 "Gemini response received in %.3fs (len=%d)",
@@ -580,6 +1221,64 @@ class LLMService:
             logger.exception("Gemini call failed: %s", e)
             raise
 
+    def stream_openai(self, api_key, system_prompt, user_text, model="gpt-4o"):
+        """Stream a zero-shot OpenAI completion as text chunks."""
+        prompt = self.prompt_builder.build_prompt(
+            "zero_shot",
+            user_text,
+            max_tokens=self._prompt_token_budget("openai", model, system_prompt),
+        )
+        client = self._openai_client(api_key)
+        logger.info("Streaming OpenAI chat.completions (model=%s)", model)
+        yield from self._openai_stream_once(
+            client,
+            system_prompt,
+            model,
+            prompt,
+            limiter=self._provider_limiter("openai", api_key, model),
+        )
+
+    def stream_gemini(self, api_key, system_prompt, user_text, model=None):
+        """Stream a zero-shot Gemini response as text chunks."""
+        if not model:
+            raise ValueError("stream_gemini: model must be specified")
+        prompt = self.prompt_builder.build_prompt(
+            "zero_shot",
+            user_text,
+            max_tokens=self._prompt_token_budget("gemini", model, system_prompt),
+        )
+        gen_model = self._gemini_model(api_key, model, system_prompt)
+        logger.info("Streaming Gemini generate_content (model=%s)", model)
+        yield from self._gemini_stream_once(
+            gen_model,
+            prompt,
+            model,
+            limiter=self._provider_limiter("gemini", api_key, model),
+        )
+
+    def _response_cache_key(
+        self,
+        response_cache,
+        provider,
+        model,
+        user_text,
+        system_prompt,
+        prompting_strategy,
+        stream=False,
+    ):
+        parts = [
+            self.prompt_builder.build_prompt(prompting_strategy, user_text),
+            system_prompt,
+            provider,
+            model,
+            prompting_strategy,
+        ]
+        if stream:
+            # Streamed results skip the strict-JSON retry, so they are kept
+            # apart from the validated responses of ``generate``.
+            parts.append("stream")
+        return response_cache.make_key(*parts)
+
     def generate(
         self,
         api_key,
@@ -588,6 +1287,9 @@ class LLMService:
         user_text,
         system_prompt,
         prompting_strategy="zero_shot",
+        response_cache=None,
+        use_cached=True,
+        step_cache=None,
     ):
         """Provider-agnostic entry point used by the v2 ``/generate`` route.
 
@@ -595,15 +1297,126 @@ class LLMService:
         it with the registry-selected ``model``. Raises ``ValueError`` if the
         provider has no dispatch mapping (the route validates the pair against
         the registry first, so this is a defensive guard).
+
+        When a ``response_cache`` is given, a response for the same built
+        prompt, system prompt, provider, model and strategy is returned from
+        it. ``use_cached=False`` skips the lookup but still stores the fresh
+        response. ``step_cache`` memoizes individual few-shot steps.
+
+        With ``PROVIDER_LIMITER_ENABLED`` every provider request (each
+        few-shot step and each retry) waits for a slot of the key's adaptive
+        limiter and raises ``rate_limiter.ProviderBusyError`` if it is shed.
         """
         method_name = model_registry.dispatch_method(provider)
         if method_name is None:
             raise ValueError(f"Unsupported provider: {provider}")
         method = getattr(self, method_name)
-        return method(
+
+        cache_key = None
+        if response_cache is not None:
+            cache_key = self._response_cache_key(
+                response_cache,
+                provider,
+                model,
+                user_text,
+                system_prompt,
+                prompting_strategy,
+            )
+            if use_cached:
+                cached = response_cache.get(cache_key, provider=provider)
+                if cached is not None:
+                    logger.info(
+                        "Serving cached response (provider=%s, model=%s)",
+                        provider,
+                        model,
+                    )
+                    return cached
+
+        response = method(
             api_key=api_key,
             system_prompt=system_prompt,
             user_text=user_text,
             prompting_strategy=prompting_strategy,
             model=model,
+            step_cache=step_cache,
+        )
+        if cache_key is not None:
+            response_cache.set(cache_key, response)
+        return response
+
+    def generate_stream(
+        self,
+        api_key,
+        provider,
+        model,
+        user_text,
+        system_prompt,
+        response_cache=None,
+        use_cached=True,
+    ):
+        """Streaming counterpart of ``generate`` for the zero-shot strategy.
+
+        Yields text chunks as the provider produces them. Raises
+        ``EmptyResponseError`` once the stream ends without content. Unlike
+        ``generate`` there is no strict-JSON retry, since chunks have already
+        been relayed, so streamed results are cached under their own keys and
+        never served to ``generate``. A cache hit is yielded as a single chunk
+        and a completed stream is stored. A limiter slot is held until the
+        provider stream is exhausted or closed.
+        """
+        method_name = model_registry.stream_dispatch_method(provider)
+        if method_name is None:
+            raise ValueError(f"Unsupported provider: {provider}")
+
+        cache_key = None
+        if response_cache is not None:
+            cache_key = self._response_cache_key(
+                response_cache,
+                provider,
+                model,
+                user_text,
+                system_prompt,
+                "zero_shot",
+                stream=True,
+            )
+            if use_cached:
+                cached = response_cache.get(cache_key, provider=provider)
+                if cached is not None:
+                    logger.info(
+                        "Serving cached response as stream (provider=%s, model=%s)",
+                        provider,
+                        model,
+                    )
+                    yield cached
+                    return
+
+        start_time = time.time()
+        parts = []
+        started = False
+        for chunk in getattr(self, method_name)(
+            api_key=api_key,
+            system_prompt=system_prompt,
+            user_text=user_text,
+            model=model,
+        ):
+            parts.append(chunk)
+            if started:
+                yield chunk
+            elif chunk.strip():
+                # Leading whitespace is held back so an all-blank response is
+                # reported as empty before anything has been relayed.
+                started = True
+                yield "".join(parts)
+
+        content = "".join(parts).strip()
+        logger.info(
+            "%s stream finished in %.3fs (chunks=%d, len=%d)",
+            provider,
+            time.time() - start_time,
+            len(parts),
+            len(content),
         )
+        if not content:
+            raise EmptyResponseError(f"{provider} stream ended without content.")
+        if cache_key is not None:
+            response_cache.set(cache_key, content)
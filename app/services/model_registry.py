@@ -8,16 +8,28 @@ This is the single source of truth used by both:
 
 Keeping the registry here (instead of inline in the routes) means the advertised
 list and the accepted list can never drift apart.
+
+Discovered model lists are cached per ``(provider, api-key fingerprint)`` and
+kept warm by a background refresher thread started from ``create_app``, so
+request handlers read memory (see ``ModelListCache``). Only validating a
+model for a key seen for the first time waits for that key's discovery.
 """
 
 import logging
 import os
+import random
+import threading
+import time
 import urllib.error
 import urllib.request
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-import google.generativeai as genai
+import prometheus_client
 from openai import OpenAI
 
+from app.services import client_pool, gemini_sdk
+
 logger = logging.getLogger(__name__)
 
 # Fallback entries used only when provider discovery is unavailable.
@@ -32,10 +44,348 @@ _DISPATCH = {
     "gemini": "call_gemini",
 }
 
-_MODEL_CACHE = {
-    "openai": list(_FALLBACK_MODELS.get("openai", [])),
-    "gemini": list(_FALLBACK_MODELS.get("gemini", [])),
+# Maps a provider to the LLMService generator that streams zero-shot output.
+_STREAM_DISPATCH = {
+    "openai": "stream_openai",
+    "gemini": "stream_gemini",
+}
+
+ModelLimits = namedtuple("ModelLimits", ["context_tokens", "max_output_tokens"])
+
+# Token limits per model, matched by the longest model-name prefix; the ""
+# entry is the provider default. ``context_tokens`` is the input plus output
+# window we plan against and ``max_output_tokens`` the completion budget we
+# request. Reasoning models spend hidden thinking tokens from the completion
+# budget, so they get a larger one.
+_MODEL_LIMITS = {
+    "openai": {
+        "": ModelLimits(128_000, 4096),
+        "gpt-4.1": ModelLimits(1_047_576, 4096),
+        # GPT-5 accepts at most 272k input tokens.
+        "gpt-5": ModelLimits(272_000, 16_384),
+        "o3": ModelLimits(200_000, 16_384),
+        "o4-mini": ModelLimits(200_000, 16_384),
+    },
+    "gemini": {
+        "": ModelLimits(1_048_576, 2048),
+        "gemini-1.5-pro": ModelLimits(2_097_152, 2048),
+        "gemini-2.5": ModelLimits(1_048_576, 8192),
+    },
 }
+_DEFAULT_LIMITS = ModelLimits(128_000, 2048)
+
+# Structured-output support per model, matched like ``_MODEL_LIMITS``.
+# ``json_mode`` means the provider can be told to return a JSON object
+# (OpenAI response_format json_object, Gemini response_mime_type); ``json_schema``
+# means it also enforces a supplied response schema. Unlisted models (e.g. on
+# an OpenAI-compatible host) get neither and rely on the prompt alone.
+ModelCapabilities = namedtuple("ModelCapabilities", ["json_mode", "json_schema"])
+
+_MODEL_CAPABILITIES = {
+    "openai": {
+        "": ModelCapabilities(False, False),
+        "gpt-3.5-turbo": ModelCapabilities(True, False),
+        "gpt-4-turbo": ModelCapabilities(True, False),
+        "gpt-4o": ModelCapabilities(True, True),
+        "gpt-4.1": ModelCapabilities(True, True),
+        "gpt-5": ModelCapabilities(True, True),
+        "o3": ModelCapabilities(True, True),
+        "o4-mini": ModelCapabilities(True, True),
+    },
+    "gemini": {
+        "": ModelCapabilities(False, False),
+        "gemini-1.5": ModelCapabilities(True, True),
+        "gemini-2": ModelCapabilities(True, True),
+    },
+}
+_DEFAULT_CAPABILITIES = ModelCapabilities(False, False)
+
+
+class _Refresh:
+    """One in-flight discovery call that concurrent callers wait on."""
+
+    def __init__(self, fallback):
+        self.done = threading.Event()
+        self.models = fallback
+
+
+class _Entry:
+    """Discovered models for one provider/key and its refresh schedule."""
+
+    def __init__(self, api_key, pinned=False):
+        self.api_key = api_key
+        self.pinned = pinned
+        self.models = None
+        self.fetched_at = None
+        self.next_refresh = 0.0
+        self.failures = 0
+        self.last_used = time.monotonic()
+
+
+class ModelListCache:
+    """Thread-safe cache of discovered models per provider and API key.
+
+    Reads never call the provider: a missing or overdue entry is scheduled for
+    a background refresh and the caller gets whatever is in memory. Refreshes
+    run on a jittered interval with exponential backoff after failures, and
+    concurrent refreshes of the same key share a single upstream call. Keys
+    not read for ``idle_seconds`` stop being refreshed, except pinned
+    (environment) keys. At most ``max_entries`` unpinned keys are kept; the
+    least recently read one is dropped to make room for a new key.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds=300,
+        max_backoff_seconds=1800,
+        idle_seconds=3600,
+        jitter=0.1,
+        max_entries=1024,
+    ):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (provider, fingerprint) -> _Entry
+        self._refreshing = {}
+        self.configure(
+            refresh_seconds=refresh_seconds,
+            max_backoff_seconds=max_backoff_seconds,
+            idle_seconds=idle_seconds,
+            jitter=jitter,
+            max_entries=max_entries,
+        )
+
+    def configure(
+        self,
+        refresh_seconds=300,
+        max_backoff_seconds=1800,
+        idle_seconds=3600,
+        jitter=0.1,
+        max_entries=1024,
+    ):
+        """Apply new settings; cached lists are kept (up to ``max_entries``)."""
+        with self._lock:
+            self._interval = max(1.0, float(refresh_seconds))
+            self._max_backoff = max(self._interval, float(max_backoff_seconds))
+            self._idle = float(idle_seconds)
+            self._jitter = max(0.0, min(float(jitter), 0.5))
+            self._max_entries = max(1, int(max_entries))
+            self._evict(time.monotonic())
+
+    @staticmethod
+    def _key(provider, api_key):
+        return (provider, client_pool.api_key_fingerprint(api_key))
+
+    def _delay(self, failures):
+        base = min(self._interval * (2**failures), self._max_backoff)
+        return base * random.uniform(1 - self._jitter, 1 + self._jitter)
+
+    def _evict(self, now, reserve=0):
+        """Drop idle, then least recently read, unpinned entries (under the lock).
+
+        ``reserve`` leaves room for that many entries about to be added.
+        """
+        evictable = [
+            key
+            for key, entry in self._entries.items()
+            if not entry.pinned and key not in self._refreshing
+        ]
+        unpinned = sum(1 for entry in self._entries.values() if not entry.pinned)
+        for key in evictable:
+            if (
+                unpinned + reserve <= self._max_entries
+                and now - self._entries[key].last_used <= self._idle
+            ):
+                continue
+            del self._entries[key]
+            unpinned -= 1
+
+    def _entry(self, key, api_key, now, pin=False):
+        """Return the entry for ``key``, adding it if needed (under the lock)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self._evict(now, reserve=0 if pin else 1)
+            entry = self._entries[key] = _Entry(api_key, pinned=pin)
+        else:
+            self._entries.move_to_end(key)
+        return entry
+
+    def get(self, provider, api_key):
+        """Return the in-memory model list for ``api_key``, or None if unknown."""
+        key = self._key(provider, api_key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(key, api_key, now)
+            entry.last_used = now
+            models = entry.models
+            pending = None
+            if now >= entry.next_refresh and key not in self._refreshing:
+                # Claimed under the lock, so concurrent readers of an unknown
+                # key start one refresh thread, not one each.
+                pending = self._refreshing[key] = _Refresh(models)
+        if pending is not None:
+            threading.Thread(
+                target=self._complete,
+                args=(key, entry, provider, pending),
+                name=f"model-list-refresh-{provider}",
+                daemon=True,
+            ).start()
+        return models
+
+    def refresh(self, provider, api_key, pin=False):
+        """Rediscover the model list now; concurrent callers share one call."""
+        key = self._key(provider, api_key)
+        with self._lock:
+            entry = self._entry(key, api_key, time.monotonic(), pin=pin)
+            entry.pinned = entry.pinned or pin
+            pending = self._refreshing.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._refreshing[key] = _Refresh(entry.models)
+        if not leader:
+            pending.done.wait()
+            return pending.models
+        return self._complete(key, entry, provider, pending)
+
+    def _complete(self, key, entry, provider, pending):
+        """Run the refresh claimed as ``pending`` and wake its waiters."""
+        try:
+            pending.models = self._load(entry, provider)
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+            pending.done.set()
+        return pending.models
+
+    def _load(self, entry, provider):
+        if not entry.api_key:
+            models, failed = list(_FALLBACK_MODELS.get(provider, [])), False
+        else:
+            try:
+                models, failed = _discover_live(provider, entry.api_key), False
+            except Exception as exc:
+                logger.warning(
+                    "Model discovery failed for provider %s: %s", provider, exc
+                )
+                # Keep serving the last good list (or the fallback).
+                models, failed = entry.models, True
+                if models is None:
+                    models = list(_FALLBACK_MODELS.get(provider, []))
+        with self._lock:
+            if failed:
+                entry.failures += 1
+            else:
+                entry.failures = 0
+                entry.fetched_at = time.monotonic()
+            entry.models = models
+            entry.next_refresh = time.monotonic() + self._delay(entry.failures)
+        return models
+
+    def refresh_due(self):
+        """Refresh overdue entries and forget idle ones; returns the count."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if not entry.pinned and now - entry.last_used > self._idle:
+                    del self._entries[key]
+                elif now >= entry.next_refresh and key not in self._refreshing:
+                    due.append((key[0], entry.api_key))
+        for provider, api_key in due:
+            self.refresh(provider, api_key)
+        return len(due)
+
+    def seconds_until_due(self):
+        with self._lock:
+            next_refresh = min(
+                (
+                    entry.next_refresh
+                    for key, entry in self._entries.items()
+                    if key not in self._refreshing
+                ),
+                default=time.monotonic() + self._interval,
+            )
+        # Entries that just became due wait for the next tick, not a busy loop.
+        return max(1.0, next_refresh - time.monotonic())
+
+    def age_seconds(self, provider):
+        """Age of the oldest successfully discovered list for ``provider``."""
+        now = time.monotonic()
+        with self._lock:
+            ages = [
+                now - entry.fetched_at
+                for (entry_provider, _), entry in self._entries.items()
+                if entry_provider == provider and entry.fetched_at is not None
+            ]
+        return max(ages, default=0.0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_MODEL_LISTS = ModelListCache()
+
+
+def configure(config):
+    """Apply the ``MODEL_CACHE_*`` settings of an app config to the cache."""
+    _MODEL_LISTS.configure(
+        refresh_seconds=config.get("MODEL_CACHE_REFRESH_SECONDS", 300),
+        max_backoff_seconds=config.get("MODEL_CACHE_MAX_BACKOFF_SECONDS", 1800),
+        idle_seconds=config.get("MODEL_CACHE_IDLE_SECONDS", 3600),
+        max_entries=config.get("MODEL_CACHE_MAX_ENTRIES", 1024),
+    )
+
+
+MODEL_CACHE_AGE = prometheus_client.Gauge(
+    "llm_model_cache_age_seconds",
+    "Age of the oldest discovered model list held in memory",
+    ["provider"],
+)
+for _provider in _DISPATCH:
+    MODEL_CACHE_AGE.labels(provider=_provider).set_function(
+        lambda provider=_provider: _MODEL_LISTS.age_seconds(provider)
+    )
+
+PROVIDER_PROBE_SECONDS = prometheus_client.Histogram(
+    "llm_provider_probe_seconds",
+    "Duration of unauthenticated provider connectivity probes",
+    ["provider"],
+)
+
+_REFRESHER_LOCK = threading.Lock()
+_refresher = None
+
+
+def _refresh_loop(stop):
+    while not stop.wait(min(_MODEL_LISTS.seconds_until_due(), 60.0)):
+        try:
+            _MODEL_LISTS.refresh_due()
+        except Exception as exc:
+            logger.warning("Background model refresh failed: %s", exc)
+
+
+def start_background_refresh():
+    """Start this process's model refresher thread (idempotent)."""
+    global _refresher
+    with _REFRESHER_LOCK:
+        if _refresher is not None and _refresher[0].is_alive():
+            return False
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=_refresh_loop, args=(stop,), name="model-refresher", daemon=True
+        )
+        thread.start()
+        _refresher = (thread, stop)
+    logger.info("Background model refresher started")
+    return True
+
+
+def stop_background_refresh(timeout=5.0):
+    global _refresher
+    with _REFRESHER_LOCK:
+        refresher, _refresher = _refresher, None
+    if refresher is not None:
+        refresher[1].set()
+        refresher[0].join(timeout)
 
 
 def _supported_providers():
@@ -59,27 +409,22 @@ def _provider_env_host(provider):
 
 
 def _discover_openai_models(api_key, base_url=None):
-    kwargs = {"api_key": api_key}
-    if base_url:
-        kwargs["base_url"] = base_url
-    client = OpenAI(**kwargs)
+    client = client_pool.openai_client(OpenAI, api_key, base_url)
     models = client.models.list()
     return sorted({item.id for item in models.data if getattr(item, "id", None)})
 
 
 def _discover_gemini_models(api_key, api_endpoint=None):
-    kwargs = {"api_key": api_key}
-    if api_endpoint:
-        kwargs["client_options"] = {"api_endpoint": api_endpoint}
-    genai.configure(**kwargs)
-    discovered = []
-    for item in genai.list_models():
-        methods = getattr(item, "supported_generation_methods", []) or []
-        if "generateContent" not in methods:
-            continue
-        name = getattr(item, "name", "") or ""
-        discovered.append(name.removeprefix("models/"))
-    return sorted(set(filter(None, discovered)))
+    manager = gemini_sdk.client_manager(api_key, api_endpoint)
+    return sorted(set(filter(None, gemini_sdk.list_generative_models(manager))))
+
+
+def _discover_live(provider, api_key):
+    """Call the provider's model listing; raises on failure."""
+    host = _provider_env_host(provider)
+    if provider == "openai":
+        return _discover_openai_models(api_key, base_url=host)
+    return _discover_gemini_models(api_key, api_endpoint=host)
 
 
 def discover_models(provider, api_key=None):
@@ -88,43 +433,61 @@ def discover_models(provider, api_key=None):
         return []
 
     resolved_api_key = api_key or _provider_env_api_key(provider)
-    resolved_host = _provider_env_host(provider)
     if not resolved_api_key:
         return list(_FALLBACK_MODELS.get(provider, []))
 
     try:
-        if provider == "openai":
-            return _discover_openai_models(resolved_api_key, base_url=resolved_host)
-        if provider == "gemini":
-            return _discover_gemini_models(
-                resolved_api_key,
-                api_endpoint=resolved_host,
-            )
+        return _discover_live(provider, resolved_api_key)
     except Exception as exc:
         logger.warning("Model discovery failed for provider %s: %s", provider, exc)
 
     return list(_FALLBACK_MODELS.get(provider, []))
 
 
+def _provider_models(provider, api_key=None, discover=False):
+    """Return the in-memory list for *api_key*, else the environment key's.
+
+    An unknown key is discovered in the background. With ``discover=True`` an
+    unknown key's list is instead discovered now (sharing any refresh already
+    in flight), so the answer reflects what that key can access.
+    """
+    if api_key:
+        models = _MODEL_LISTS.get(provider, api_key)
+        if models is None and discover:
+            models = _MODEL_LISTS.refresh(provider, api_key)
+        if models is not None:
+            return models
+    models = _MODEL_LISTS.get(provider, _provider_env_api_key(provider))
+    if models is None:
+        return list(_FALLBACK_MODELS.get(provider, []))
+    return models
+
+
 def refresh_model_cache(provider=None, api_key=None):
     """Refresh cached models for one provider or all supported providers.
 
     When *api_key* is supplied the discovery call uses that key instead of
     the environment key, so the cache always reflects what the caller's key
-    can actually access.
+    can actually access. Environment keys stay refreshed in the background
+    for the life of the process.
     """
     providers = [provider] if provider else list(_supported_providers())
     for current_provider in providers:
         if current_provider not in _supported_providers():
             continue
-        _MODEL_CACHE[current_provider] = discover_models(
-            current_provider, api_key=api_key
+        _MODEL_LISTS.refresh(
+            current_provider,
+            api_key or _provider_env_api_key(current_provider),
+            pin=not api_key,
         )
-    return get_cached_models(provider=provider)
+    return get_cached_models(provider=provider, api_key=api_key)
 
 
-def get_cached_models(provider=None):
-    """Return cached models as a flat list of dicts.
+def get_cached_models(provider=None, api_key=None):
+    """Return the models visible to *api_key* as a flat list of dicts.
+
+    Reads memory only. Until *api_key*'s own list has been discovered (in the
+    background), the environment key's list is returned.
 
     Shape (matches the connector contract):
     ``[{"provider": str, "model": str}, ...]``
@@ -133,7 +496,8 @@ def get_cached_models(provider=None):
     return [
         {"provider": current_provider, "model": model}
         for current_provider in providers
-        for model in _MODEL_CACHE.get(current_provider, [])
+        if current_provider in _supported_providers()
+        for model in _provider_models(current_provider, api_key=api_key)
     ]
 
 
@@ -142,15 +506,21 @@ def list_models(provider=None):
     return get_cached_models(provider=provider)
 
 
-def is_valid(provider, model):
-    """Return True if provider is supported and model is in the current cache.
+def clear_model_cache():
+    """Drop all cached model lists (used by tests and on credential rotation)."""
+    _MODEL_LISTS.clear()
+
 
-    The cache is refreshed with the request API key before this is called
-    (see the /generate route), so it reflects the live model list.
+def is_valid(provider, model, api_key=None):
+    """Return True if provider is supported and model is available to *api_key*.
+
+    Known keys are checked against their in-memory list. The first request
+    with a new key waits for that key's discovery (one call however many
+    requests wait), rather than being checked against another key's models.
     """
     if provider not in _supported_providers() or not model:
         return False
-    cached = _MODEL_CACHE.get(provider, [])
+    cached = _provider_models(provider, api_key=api_key, discover=True)
     # If the cache is still only the static fallback sentinel, accept any
     # non-empty model name (discovery may have been skipped at startup).
     if cached == list(_FALLBACK_MODELS.get(provider, [])):
@@ -158,11 +528,37 @@ def is_valid(provider, model):
     return model in cached
 
 
+def _lookup_by_prefix(tables, provider, model, default):
+    table = tables.get(provider)
+    if not table:
+        return default
+    name = (model or "").lower().removeprefix("models/")
+    prefix = max((p for p in table if name.startswith(p)), key=len)
+    return table[prefix]
+
+
+def model_limits(provider, model):
+    """Return the ``ModelLimits`` used to budget prompts for ``model``."""
+    return _lookup_by_prefix(_MODEL_LIMITS, provider, model, _DEFAULT_LIMITS)
+
+
+def model_capabilities(provider, model):
+    """Return the ``ModelCapabilities`` (structured output support) of ``model``."""
+    return _lookup_by_prefix(
+        _MODEL_CAPABILITIES, provider, model, _DEFAULT_CAPABILITIES
+    )
+
+
 def dispatch_method(provider):
     """Return the LLMService method name for a provider, or None if unknown."""
     return _DISPATCH.get(provider)
 
 
+def stream_dispatch_method(provider):
+    """Return the LLMService streaming method name for a provider, or None."""
+    return _STREAM_DISPATCH.get(provider)
+
+
 def _normalize_openai_probe_url(configured_host):
     raw = (configured_host or "https://api.openai.com/v1").strip()
     if "://" not in raw:
@@ -210,11 +606,31 @@ def _probe_url(url, timeout_seconds):
         }
 
 
+def _probe_provider(provider, timeout_seconds):
+    host = _provider_env_host(provider)
+    if provider == "openai":
+        url = _normalize_openai_probe_url(host)
+    else:
+        url = _normalize_gemini_probe_url(host)
+
+    started = time.monotonic()
+    probe = _probe_url(url, timeout_seconds=timeout_seconds)
+    PROVIDER_PROBE_SECONDS.labels(provider=provider).observe(time.monotonic() - started)
+    return {
+        "provider": provider,
+        "url": url,
+        "reachable": probe["reachable"],
+        "http_status": probe["http_status"],
+        "error": probe["error"],
+    }
+
+
 def provider_connectivity(provider=None, timeout_seconds=5):
     """Probe provider hosts without secrets.
 
     A provider is considered reachable when a TCP/TLS/HTTP response is received,
-    including 401/403 responses from unauthenticated calls.
+    including 401/403 responses from unauthenticated calls. Providers are
+    probed concurrently, so the call takes about as long as the slowest probe.
     """
     providers = [provider] if provider else list(_supported_providers())
     for current_provider in providers:
@@ -223,23 +639,50 @@ def provider_connectivity(provider=None, timeout_seconds=5):
 
     timeout_seconds = max(1, min(int(timeout_seconds), 30))
 
-    diagnostics = []
-    for current_provider in providers:
-        host = _provider_env_host(current_provider)
-        if current_provider == "openai":
-            url = _normalize_openai_probe_url(host)
-        else:
-            url = _normalize_gemini_probe_url(host)
-
-        probe = _probe_url(url, timeout_seconds=timeout_seconds)
-        diagnostics.append(
-            {
-                "provider": current_provider,
-                "url": url,
-                "reachable": probe["reachable"],
-                "http_status": probe["http_status"],
-                "error": probe["error"],
-            }
+    if len(providers) == 1:
+        return [_probe_provider(providers[0], timeout_seconds)]
+    with ThreadPoolExecutor(
+        max_workers=len(providers), thread_name_prefix="provider-probe"
+    ) as executor:
+        return list(
+            executor.map(
+                lambda current_provider: _probe_provider(
+                    current_provider, timeout_seconds
+                ),
+                providers,
+            )
         )
 
-    return diagnostics
+
+_CONNECTIVITY_LOCK = threading.Lock()
+_connectivity_result = None  # (checked_at, timeout_seconds, diagnostics)
+
+
+def cached_provider_connectivity(max_age_seconds, timeout_seconds=5):
+    """Return all providers' diagnostics, probing at most once per window.
+
+    Results younger than *max_age_seconds* are reused. Concurrent callers that
+    find the result stale wait for a single probe instead of each starting
+    their own.
+    """
+    global _connectivity_result
+    with _CONNECTIVITY_LOCK:
+        cached = _connectivity_result
+        if (
+            cached is not None
+            and cached[1] == timeout_seconds
+            and time.monotonic() - cached[0] < max_age_seconds
+        ):
+            return cached[2]
+        diagnostics = provider_connectivity(
+            provider=None, timeout_seconds=timeout_seconds
+        )
+        _connectivity_result = (time.monotonic(), timeout_seconds, diagnostics)
+        return diagnostics
+
+
+def clear_connectivity_cache():
+    """Forget the last readiness probe result (used by tests)."""
+    global _connectivity_result
+    with _CONNECTIVITY_LOCK:
+        _connectivity_result = None
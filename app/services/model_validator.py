@@ -1,5 +1,17 @@
+import copy
+import functools
 import re
 
+# Source-text cues, compiled once instead of on every validation.
+_CONDITION_WORDS = re.compile(r"\b(if|otherwise|whether|either|or)\b")
+_STRONG_LOOP_WORDS = re.compile(
+    r"\b(until|again|retest(?:ed|s|ing)?|retry(?:ing)?|loop(?:ing)?|repeat(?:ed|s|ing)?)\b"
+)
+_REWORK_PHRASE = re.compile(
+    r"\b(return(?:s|ed|ing)?\s+(for|to)\s+(correction|rework|repair|retest))\b"
+)
+_LOOP_CUE = re.compile(r"\b(remains|retry|retest|again|return|repeat|fail)\b")
+
 
 class ModelValidator:
     """Validate and sanitize generated BPMN-like JSON structures."""
@@ -51,40 +63,87 @@ class ModelValidator:
             "flows": valid_flows,
         }
 
+    @staticmethod
+    def _index(model):
+        """Collect nodes, flow endpoints and per-node flow counts in one pass."""
+        events = ModelValidator._as_list(model.get("events"))
+        tasks = ModelValidator._as_list(model.get("tasks"))
+        gateways = ModelValidator._as_list(model.get("gateways"))
+        flows = ModelValidator._as_list(model.get("flows"))
+
+        # Node ID -> index of its last occurrence, keyed in first-seen order;
+        # ``position`` doubles as the membership set.
+        position = {}
+        for node_index, node in enumerate((*events, *tasks, *gateways)):
+            node_id = node.get("id")
+            if node_id:
+                position[node_id] = node_index
+
+        incoming = dict.fromkeys(position, 0)
+        outgoing = dict.fromkeys(position, 0)
+        edges = []
+        unknown_flows = []
+        for flow in flows:
+            source = flow.get("source")
+            target = flow.get("target")
+            if source not in position or target not in position:
+                unknown_flows.append((flow.get("id"), source, target))
+                continue
+            outgoing[source] += 1
+            incoming[target] += 1
+            edges.append((source, target))
+
+        return {
+            "events": events,
+            "gateways": gateways,
+            "position": position,
+            "incoming": incoming,
+            "outgoing": outgoing,
+            "edges": edges,
+            "unknown_flows": unknown_flows,
+        }
+
+    @staticmethod
+    @functools.lru_cache(maxsize=64)
+    def _text_cues(source_text):
+        """Return (has_condition_words, has_loop_words) for the source text.
+
+        Memoized because the repair pass re-validates against the same text.
+        """
+        text = (source_text or "").lower()
+        has_condition_words = _CONDITION_WORDS.search(text) is not None
+        has_loop_words = (
+            _STRONG_LOOP_WORDS.search(text) is not None
+            or _REWORK_PHRASE.search(text) is not None
+        )
+        return has_condition_words, has_loop_words
+
     def validate_model(self, model, source_text=""):
         """Return a list of validation issues found in the model."""
         issues = []
-
-        events = self._as_list(model.get("events"))
-        tasks = self._as_list(model.get("tasks"))
-        gateways = self._as_list(model.get("gateways"))
-        flows = self._as_list(model.get("flows"))
-
-        starts = [e for e in events if e.get("type") == "startEvent"]
-        ends = [e for e in events if e.get("type") == "endEvent"]
+        index = self._index(model)
+        incoming = index["incoming"]
+        outgoing = index["outgoing"]
+        node_id_set = index["position"]
+
+        starts = []
+        ends = []
+        for event in index["events"]:
+            event_type = event.get("type")
+            if event_type == "startEvent":
+                starts.append(event)
+            elif event_type == "endEvent":
+                ends.append(event)
 
         if len(starts) != 1:
             issues.append("Model must contain exactly one startEvent.")
         if len(ends) != 1:
             issues.append("Model must contain exactly one endEvent.")
 
-        nodes = events + tasks + gateways
-        node_ids = [n.get("id") for n in nodes if n.get("id")]
-        node_id_set = set(node_ids)
-
-        incoming = {node_id: 0 for node_id in node_id_set}
-        outgoing = {node_id: 0 for node_id in node_id_set}
-
-        for flow in flows:
-            source = flow.get("source")
-            target = flow.get("target")
-            if source not in node_id_set or target not in node_id_set:
-                issues.append(
-                    f"Flow {flow.get('id')} references unknown node(s): {source} -> {target}."
-                )
-                continue
-            outgoing[source] += 1
-            incoming[target] += 1
+        for flow_id, source, target in index["unknown_flows"]:
+            issues.append(
+                f"Flow {flow_id} references unknown node(s): {source} -> {target}."
+            )
 
         start_id = starts[0].get("id") if len(starts) == 1 else None
         end_id = ends[0].get("id") if len(ends) == 1 else None
@@ -95,39 +154,55 @@ class ModelValidator:
             if node_id != end_id and outgoing[node_id] == 0:
                 issues.append(f"Node {node_id} has no outgoing sequence flow.")
 
-        for gateway in gateways:
+        has_real_split = False
+        has_loop_split = False
+        for gateway in index["gateways"]:
             gateway_id = gateway.get("id")
+            role = gateway.get("role")
+            branch_cues = gateway.get("branch_cues")
+            if (
+                not has_loop_split
+                and role == "split"
+                and isinstance(branch_cues, list)
+                and any(
+                    isinstance(cue, str) and _LOOP_CUE.search(cue.lower())
+                    for cue in branch_cues
+                )
+            ):
+                has_loop_split = True
             if not gateway_id:
                 continue
-            role = gateway.get("role")
+
             branch_count = gateway.get("branch_count")
             paired_gateway_id = gateway.get("paired_gateway_id")
+            incoming_count = incoming.get(gateway_id, 0)
+            outgoing_count = outgoing.get(gateway_id, 0)
+            if outgoing_count >= 2:
+                has_real_split = True
 
-            if incoming.get(gateway_id, 0) == 0:
+            if incoming_count == 0:
                 issues.append(f"Gateway {gateway_id} has no incoming flow.")
-            if outgoing.get(gateway_id, 0) == 0:
+            if outgoing_count == 0:
                 issues.append(f"Gateway {gateway_id} has no outgoing flow.")
             if (
                 gateway.get("type") == "exclusiveGateway"
-                and incoming.get(gateway_id, 0) == 1
-                and outgoing.get(gateway_id, 0) == 1
+                and incoming_count == 1
+                and outgoing_count == 1
             ):
                 issues.append(
                     f"Exclusive gateway {gateway_id} has no effective branching (1 in, 1 out)."
                 )
 
-            if role == "split" and outgoing.get(gateway_id, 0) < 2:
+            if role == "split" and outgoing_count < 2:
                 issues.append(
                     f"Gateway {gateway_id} is marked as split but has fewer than 2 outgoing flows."
                 )
-            if role == "join" and incoming.get(gateway_id, 0) < 2:
+            if role == "join" and incoming_count < 2:
                 issues.append(
                     f"Gateway {gateway_id} is marked as join but has fewer than 2 incoming flows."
                 )
 
             if isinstance(branch_count, int) and branch_count >= 2:
-                outgoing_count = outgoing.get(gateway_id, 0)
-                incoming_count = incoming.get(gateway_id, 0)
                 if role == "split" and outgoing_count != branch_count:
                     issues.append(
                         f"Gateway {gateway_id} split branch_count={branch_count} "
@@ -144,76 +219,177 @@ class ModelValidator:
                     f"Gateway {gateway_id} references missing paired gateway {paired_gateway_id}."
                 )
 
-            branch_cues = gateway.get("branch_cues")
             if role == "split" and isinstance(branch_cues, list) and len(branch_cues) >= 2:
-                outgoing_count = outgoing.get(gateway_id, 0)
                 if outgoing_count < len(branch_cues):
                     issues.append(
                         f"Gateway {gateway_id} declares {len(branch_cues)} branch cues "
                         f"but has only {outgoing_count} outgoing flows."
                     )
 
-        text = (source_text or "").lower()
-        has_condition_words = bool(
-            re.search(r"\b(if|otherwise|whether|either|or)\b", text)
-        )
-        strong_loop_words = bool(
-            re.search(
-                r"\b(until|again|retest(?:ed|s|ing)?|retry(?:ing)?|loop(?:ing)?|repeat(?:ed|s|ing)?)\b",
-                text,
-            )
-        )
-        explicit_rework_phrase = bool(
-            re.search(r"\b(return(?:s|ed|ing)?\s+(for|to)\s+(correction|rework|repair|retest))\b", text)
-        )
-        has_loop_words = strong_loop_words or explicit_rework_phrase
-
-        gateway_outgoing_counts = [outgoing.get(g.get("id"), 0) for g in gateways]
-        has_real_split = any(count >= 2 for count in gateway_outgoing_counts)
+        has_condition_words, has_loop_words = self._text_cues(source_text or "")
         if has_condition_words and not has_real_split:
             issues.append(
                 "Conditional language found in text but no gateway with multiple outgoing branches."
             )
 
-        if has_loop_words and not self._has_back_edge(model):
+        if has_loop_words and not self._has_back_edge(model, index=index):
             issues.append(
                 "Loop/retest language found in text but no backward/loop flow detected."
             )
 
-        if has_loop_words:
-            split_gateways = [g for g in gateways if g.get("role") == "split"]
-            has_loop_split = any(
-                isinstance(g.get("branch_cues"), list)
-                and any(
-                    isinstance(cue, str)
-                    and re.search(r"\b(remains|retry|retest|again|return|repeat|fail)\b", cue.lower())
-                    for cue in g.get("branch_cues", [])
-                )
-                for g in split_gateways
+        if has_loop_words and not has_loop_split:
+            issues.append(
+                "Loop language found in text but no split gateway encodes loop branch cues."
             )
-            if not has_loop_split:
-                issues.append(
-                    "Loop language found in text but no split gateway encodes loop branch cues."
-                )
 
         return issues
 
-    def _has_back_edge(self, model):
+    @staticmethod
+    def _strongly_connected_loops(position, edges):
+        """Return the flow graph's cycles as strongly connected components.
+
+        Iterative Tarjan, linear in nodes + flows. Only components that contain
+        a cycle (several nodes, or one node with a self-loop) are returned,
+        each listed in model order.
+        """
+        successors = {node_id: [] for node_id in position}
+        self_loops = set()
+        for source, target in edges:
+            successors[source].append(target)
+            if source == target:
+                self_loops.add(source)
+
+        discovered = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        loops = []
+        for root in position:
+            if root in discovered:
+                continue
+            discovered[root] = lowlink[root] = len(discovered)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(successors[root]))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in discovered:
+                        discovered[child] = lowlink[child] = len(discovered)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(successors[child])))
+                        break
+                    if child in on_stack:
+                        lowlink[node] = min(lowlink[node], discovered[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    if lowlink[node] != discovered[node]:
+                        continue
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in self_loops:
+                        loops.append(sorted(component, key=position.__getitem__))
+        loops.sort(key=lambda loop: position[loop[0]])
+        return loops
+
+    def find_loops(self, model, index=None):
+        """Return the model's loops as lists of node IDs (see above)."""
+        if index is None:
+            index = self._index(model)
+        return self._strongly_connected_loops(index["position"], index["edges"])
+
+    def _has_back_edge(self, model, index=None):
+        return bool(self.find_loops(model, index=index))
+
+    def repair_model(self, model):
+        """Apply mechanical structural fixes to a sanitized model.
+
+        Returns ``(repaired_model, fixes)`` where ``fixes`` names each rule
+        applied (one entry per change). The input is not modified. Only
+        unambiguous fixes are made; anything else is left for the LLM repair:
+
+        * duplicate start/end events are merged into the first one, when the
+          merged start keeps a single successor (or the merged end a single
+          predecessor); otherwise the merge would add an implicit split/join,
+        * exclusive gateways with one incoming and one outgoing flow that do
+          not declare a split are bypassed.
+
+        Dangling nodes are not wired to the start or end event, since the new
+        flows would create implicit parallel branches.
+        """
+        model = copy.deepcopy(model)
         events = self._as_list(model.get("events"))
-        tasks = self._as_list(model.get("tasks"))
         gateways = self._as_list(model.get("gateways"))
         flows = self._as_list(model.get("flows"))
+        fixes = []
+
+        for event_type, endpoint, other, fix in (
+            ("startEvent", "source", "target", "merged_duplicate_start"),
+            ("endEvent", "target", "source", "merged_duplicate_end"),
+        ):
+            matching = [e for e in events if e.get("type") == event_type]
+            ids = {e.get("id") for e in matching}
+            neighbours = {f.get(other) for f in flows if f.get(endpoint) in ids}
+            if len(neighbours) > 1:
+                continue
+            for duplicate in matching[1:]:
+                for flow in flows:
+                    if flow.get(endpoint) == duplicate.get("id"):
+                        flow[endpoint] = matching[0].get("id")
+                events.remove(duplicate)
+                fixes.append(fix)
+        if fixes:
+            flows = self._dedupe_flows(flows)
+
+        index = self._index({**model, "events": events, "flows": flows})
+        for gateway in list(gateways):
+            gateway_id = gateway.get("id")
+            branch_count = gateway.get("branch_count")
+            branch_cues = gateway.get("branch_cues")
+            if (
+                gateway.get("type") != "exclusiveGateway"
+                or gateway.get("role") == "split"
+                or (isinstance(branch_count, int) and branch_count >= 2)
+                or (isinstance(branch_cues, list) and len(branch_cues) >= 2)
+                or index["incoming"].get(gateway_id) != 1
+                or index["outgoing"].get(gateway_id) != 1
+            ):
+                continue
+            inbound = next(f for f in flows if f.get("target") == gateway_id)
+            outbound = next(f for f in flows if f.get("source") == gateway_id)
+            if inbound is outbound:
+                continue  # self-loop
+            inbound["target"] = outbound.get("target")
+            flows.remove(outbound)
+            gateways.remove(gateway)
+            for other in gateways:
+                if other.get("paired_gateway_id") == gateway_id:
+                    other.pop("paired_gateway_id")
+            fixes.append("bypassed_pass_through_gateway")
+
+        model["events"] = events
+        model["gateways"] = gateways
+        model["flows"] = flows
+        return model, fixes
 
-        ordered_ids = [
-            item.get("id")
-            for item in events + tasks + gateways
-            if isinstance(item, dict) and item.get("id")
-        ]
-        position = {node_id: idx for idx, node_id in enumerate(ordered_ids)}
-
+    @staticmethod
+    def _dedupe_flows(flows):
+        """Drop flows that repeat an earlier flow's source and target."""
+        seen = set()
+        deduped = []
         for flow in flows:
-            source = flow.get("source")
-            target = flow.get("target")
-            if source in position and target in position and position[target] <= position[source]:
-                return True
-        return False
+            edge = (flow.get("source"), flow.get("target"))
+            if edge in seen:
+                continue
+            seen.add(edge)
+            deduped.append(flow)
+        return deduped
@@ -0,0 +1,361 @@
+"""Adaptive outbound limiter for provider calls.
+
+One ``AdaptiveLimiter`` exists per ``(provider, api-key fingerprint, model)``.
+A request must take a slot before it calls the provider. A slot is free when:
+
+* the limiter is not paused by a provider ``retry-after``;
+* fewer requests are in flight than the current concurrency window; and
+* the optional requests-per-minute token bucket has a token.
+
+The window follows AIMD: it grows by ``1/window`` per successful request, up
+to ``max_concurrency``, and halves on every rate-limit error. A rate-limit
+error also pauses the limiter for the delay the provider asked for, read from
+its rate-limit headers or error details.
+
+Waiting requests are not ordered; each waits for at most
+``max_wait_seconds``. They are shed with ``ProviderBusyError`` when
+``max_queue`` requests are already waiting, or when the wait runs out.
+Shedding early is cheaper than a cascade of provider 429s. Threads wait on a
+condition variable; asyncio tasks (``async_slot``) wait on the event loop and
+are woken by releases from any thread.
+
+Limiters are kept for the most recently used keys only (``configure``).
+"""
+
+import asyncio
+import contextlib
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import prometheus_client
+
+from app.services import client_pool
+
+logger = logging.getLogger(__name__)
+
+LIMITER_QUEUE_DEPTH = prometheus_client.Gauge(
+    "llm_limiter_queue_depth",
+    "Requests waiting for a provider slot",
+    ["provider"],
+)
+LIMITER_WAIT_SECONDS = prometheus_client.Histogram(
+    "llm_limiter_wait_seconds",
+    "Time requests waited for a provider slot",
+    ["provider"],
+)
+LIMITER_SHED = prometheus_client.Counter(
+    "llm_limiter_shed_total",
+    "Requests rejected before reaching the provider",
+    ["provider", "reason"],
+)
+LIMITER_BACKOFFS = prometheus_client.Counter(
+    "llm_limiter_backoff_total",
+    "Concurrency window reductions after provider rate-limit errors",
+    ["provider"],
+)
+
+# Pause used when a rate-limit error carries no usable retry delay.
+_DEFAULT_PAUSE_SECONDS = 1.0
+_MAX_PAUSE_SECONDS = 120.0
+
+_QUOTA_INDICATORS = (
+    "quota",
+    "resourceexhausted",
+    "too many requests",
+    "rate limit",
+    "perday",
+)
+# OpenAI reset headers look like "1s", "6m0s" or "250ms".
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+# Gemini reports the delay in the message ("Please retry in 23.4s") or in a
+# RetryInfo detail ("retry_delay { seconds: 23 }").
+_RETRY_IN = re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.IGNORECASE)
+_RETRY_DELAY = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)")
+
+
+class ProviderBusyError(RuntimeError):
+    """Raised when a request is shed instead of being sent to the provider."""
+
+    def __init__(self, provider, reason):
+        super().__init__(f"{provider} request shed by the outbound limiter ({reason}).")
+        self.provider = provider
+        self.reason = reason
+
+
+def is_rate_limit_error(exc):
+    """Return True for provider quota/rate-limit style exceptions."""
+    if getattr(exc, "status_code", None) == 429:
+        return True
+    text = f"{type(exc).__name__} {exc}".lower()
+    return any(token in text for token in _QUOTA_INDICATORS)
+
+
+def _parse_duration(value):
+    parts = _DURATION_PART.findall(str(value or ""))
+    if parts:
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_after_seconds(exc):
+    """Return the delay the provider asked for in a rate-limit error, or None."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    if headers.get("retry-after-ms"):
+        delay = _parse_duration(headers["retry-after-ms"])
+        if delay is not None:
+            return delay / 1000.0
+    for name in (
+        "retry-after",
+        "x-ratelimit-reset-requests",
+        "x-ratelimit-reset-tokens",
+    ):
+        delay = _parse_duration(headers.get(name))
+        if delay is not None:
+            return delay
+    text = str(exc)
+    match = _RETRY_IN.search(text) or _RETRY_DELAY.search(text)
+    return float(match.group(1)) if match else None
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window plus optional token bucket for one provider key."""
+
+    def __init__(
+        self,
+        provider,
+        max_concurrency=16,
+        requests_per_minute=None,
+        max_queue=64,
+        max_wait_seconds=30.0,
+    ):
+        self.provider = provider
+        self._max = max(1, int(max_concurrency))
+        self._window = float(self._max)
+        self._max_queue = max(0, int(max_queue))
+        self._max_wait = float(max_wait_seconds)
+        self._rate = requests_per_minute / 60.0 if requests_per_minute else None
+        self._capacity = (
+            float(max(1, min(self._max, requests_per_minute)))
+            if requests_per_minute
+            else 0.0
+        )
+        self._tokens = self._capacity
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._async_waiters = set()  # (loop, future) of waiting tasks
+
+    @property
+    def window(self):
+        with self._cond:
+            return self._window
+
+    def _refill(self, now):
+        if self._rate is not None:
+            elapsed = now - self._refilled_at
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+        self._refilled_at = now
+
+    def _admission_delay(self, now):
+        """Seconds until a slot may free up; 0 if one is free now."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= int(self._window):
+            return math.inf  # until a release notifies
+        if self._rate is not None and self._tokens < 1:
+            return (1 - self._tokens) / self._rate
+        return 0.0
+
+    def _shed(self, reason):
+        LIMITER_SHED.labels(provider=self.provider, reason=reason).inc()
+        raise ProviderBusyError(self.provider, reason)
+
+    def _admit(self, now):
+        """Take a slot if one is free and return 0, else the admission delay."""
+        self._refill(now)
+        delay = self._admission_delay(now)
+        if delay <= 0:
+            self._in_flight += 1
+            if self._rate is not None:
+                self._tokens -= 1
+        return delay
+
+    def _start_waiting(self):
+        if self._waiting >= self._max_queue:
+            self._shed("queue_full")
+        self._waiting += 1
+        LIMITER_QUEUE_DEPTH.labels(provider=self.provider).inc()
+
+    def _stop_waiting(self):
+        self._waiting -= 1
+        LIMITER_QUEUE_DEPTH.labels(provider=self.provider).dec()
+
+    def _observe_wait(self, started):
+        LIMITER_WAIT_SECONDS.labels(provider=self.provider).observe(
+            time.monotonic() - started
+        )
+
+    def acquire(self):
+        """Block until a slot is free; raise ProviderBusyError when shed."""
+        started = time.monotonic()
+        deadline = started + self._max_wait
+        with self._cond:
+            if self._admit(started) > 0:
+                self._start_waiting()
+                try:
+                    while True:
+                        now = time.monotonic()
+                        delay = self._admit(now)
+                        if delay <= 0:
+                            break
+                        if now >= deadline:
+                            self._shed("timeout")
+                        self._cond.wait(min(delay, deadline - now))
+                finally:
+                    self._stop_waiting()
+        self._observe_wait(started)
+
+    async def acquire_async(self):
+        """``acquire`` for asyncio tasks; waits without blocking a thread."""
+        started = time.monotonic()
+        deadline = started + self._max_wait
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._admit(started) <= 0:
+                self._observe_wait(started)
+                return
+            self._start_waiting()
+        waiter = None
+        try:
+            while True:
+                with self._cond:
+                    self._async_waiters.discard((loop, waiter))
+                    now = time.monotonic()
+                    delay = self._admit(now)
+                    if delay <= 0:
+                        break
+                    if now >= deadline:
+                        self._shed("timeout")
+                    waiter = loop.create_future()
+                    self._async_waiters.add((loop, waiter))
+                await asyncio.wait([waiter], timeout=min(delay, deadline - now))
+        finally:
+            with self._cond:
+                self._async_waiters.discard((loop, waiter))
+                self._stop_waiting()
+        self._observe_wait(started)
+
+    def _wake_async_waiters(self):
+        for loop, waiter in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                pass  # the waiter's loop is closed
+
+    def release(self, error=None):
+        """Free the slot and adapt the window to the request's outcome."""
+        with self._cond:
+            self._in_flight -= 1
+            if error is None:
+                self._window = min(self._max, self._window + 1 / self._window)
+            elif is_rate_limit_error(error):
+                self._window = max(1.0, self._window / 2)
+                delay = retry_after_seconds(error)
+                if delay is None:
+                    delay = _DEFAULT_PAUSE_SECONDS
+                delay = min(max(delay, 0.0), _MAX_PAUSE_SECONDS)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                LIMITER_BACKOFFS.labels(provider=self.provider).inc()
+                logger.warning(
+                    "%s rate limited; window=%.1f, pausing %.2fs",
+                    self.provider,
+                    self._window,
+                    delay,
+                )
+            self._cond.notify_all()
+            self._wake_async_waiters()
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Hold a slot for the duration of the block."""
+        self.acquire()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(error)
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self):
+        """Hold a slot for the duration of an ``async with`` block."""
+        await self.acquire_async()
+        error = None
+        try:
+            yield
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.release(error)
+
+
+def _resolve(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_LOCK = threading.Lock()
+_LIMITERS = OrderedDict()
+# Limiters of keys not used recently are dropped (least recently used first),
+# so arbitrary caller keys cannot grow the registry without bound. A dropped
+# key starts again from a full window.
+_max_limiters = 1024
+
+
+def configure(config):
+    """Apply ``PROVIDER_LIMITER_MAX_KEYS`` from an app config."""
+    global _max_limiters
+    with _LOCK:
+        _max_limiters = max(1, int(config.get("PROVIDER_LIMITER_MAX_KEYS", 1024)))
+        _evict()
+
+
+def _evict():
+    while len(_LIMITERS) > _max_limiters:
+        _LIMITERS.popitem(last=False)
+
+
+def limiter_for(provider, api_key, model, **settings):
+    """Return the process-wide limiter for a provider key and model.
+
+    ``settings`` are ``AdaptiveLimiter`` arguments and only apply when the
+    limiter is first created.
+    """
+    key = (provider, client_pool.api_key_fingerprint(api_key), model or "")
+    with _LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = _LIMITERS[key] = AdaptiveLimiter(provider, **settings)
+            _evict()
+        else:
+            _LIMITERS.move_to_end(key)
+        return limiter
+
+
+def clear():
+    """Drop all limiters (used by tests and on credential rotation)."""
+    with _LOCK:
+        _LIMITERS.clear()
@@ -0,0 +1,176 @@
+"""Opt-in, content-addressed caches for provider responses.
+
+Generation runs at temperature 0, so an identical prompt sent to the same
+provider/model with the same strategy is served from here instead of paying
+another provider round-trip. Two caches are built from the app config:
+
+* the response cache (``RESPONSE_CACHE_*``) keyed by a SHA-256 over the built
+  prompt, system prompt, provider, model and prompting strategy, and
+* the few-shot step cache (``FEW_SHOT_STEP_CACHE_*``) holding each step's
+  parsed JSON keyed by step name and composed step prompt.
+
+Two backends are available: an in-process LRU (per worker) and Redis (shared
+across workers, using the same connection settings as ``AsyncJobStore``).
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import prometheus_client
+
+from app.services.async_jobs import AsyncJobStore
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_HITS = prometheus_client.Counter(
+    "llm_response_cache_hits_total",
+    "Lookups served from a response cache",
+    ["cache", "backend", "provider"],
+)
+RESPONSE_CACHE_MISSES = prometheus_client.Counter(
+    "llm_response_cache_misses_total",
+    "Lookups not found in a response cache",
+    ["cache", "backend", "provider"],
+)
+
+
+class _LRUBackend:
+    """In-process LRU with per-entry expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_entries):
+        self._max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if now >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl_seconds):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+class _RedisBackend:
+    """Redis-backed entries with native TTL expiry."""
+
+    name = "redis"
+
+    def __init__(self, client):
+        self._redis = client
+
+    def get(self, key):
+        return self._redis.get(key)
+
+    def set(self, key, value, ttl_seconds):
+        self._redis.setex(key, int(ttl_seconds), value)
+
+
+class ResponseCache:
+    """Content-addressed cache of raw provider responses."""
+
+    def __init__(
+        self,
+        backend,
+        ttl_seconds=3600,
+        max_value_bytes=262144,
+        key_prefix="llm_response_cache",
+        name="response",
+    ):
+        self.name = name
+        self._backend = backend
+        self._ttl = max(1, int(ttl_seconds))
+        self._max_value_bytes = int(max_value_bytes)
+        self._prefix = key_prefix
+
+    @property
+    def backend_name(self):
+        return self._backend.name
+
+    def make_key(self, *parts):
+        """Return the cache key for the given key material (order matters)."""
+        material = json.dumps(list(parts), ensure_ascii=False)
+        digest = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        return f"{self._prefix}:{digest}"
+
+    def get(self, key, provider=None):
+        """Return the cached response or None; backend errors count as misses."""
+        try:
+            value = self._backend.get(key)
+        except Exception as exc:
+            logger.warning("Response cache lookup failed: %s", exc)
+            value = None
+        counter = RESPONSE_CACHE_HITS if value is not None else RESPONSE_CACHE_MISSES
+        counter.labels(
+            cache=self.name, backend=self.backend_name, provider=provider or ""
+        ).inc()
+        return value
+
+    def set(self, key, value):
+        """Store a response unless it is empty or exceeds the size limit."""
+        if not value:
+            return False
+        if len(value.encode("utf-8")) > self._max_value_bytes:
+            logger.debug("Response too large for cache (len=%d)", len(value))
+            return False
+        try:
+            self._backend.set(key, value, self._ttl)
+        except Exception as exc:
+            logger.warning("Response cache store failed: %s", exc)
+            return False
+        return True
+
+
+def _build_backend(config, setting_prefix):
+    """Build the backend selected by ``<setting_prefix>_BACKEND``."""
+    backend = (config.get(f"{setting_prefix}_BACKEND") or "memory").strip().lower()
+    if backend == "redis":
+        return _RedisBackend(
+            AsyncJobStore._build_client(
+                redis_url=config["REDIS_URL"],
+                use_mock=config.get("REDIS_USE_MOCK", False),
+            )
+        )
+    if backend != "memory":
+        logger.warning("Unknown response cache backend %r; using memory", backend)
+    return _LRUBackend(config.get(f"{setting_prefix}_MAX_ENTRIES", 1024))
+
+
+def _from_settings(config, setting_prefix, key_prefix, name):
+    if not config.get(f"{setting_prefix}_ENABLED", False):
+        return None
+    return ResponseCache(
+        _build_backend(config, setting_prefix),
+        ttl_seconds=config.get(f"{setting_prefix}_TTL_SECONDS", 3600),
+        max_value_bytes=config.get(f"{setting_prefix}_MAX_VALUE_BYTES", 262144),
+        key_prefix=key_prefix,
+        name=name,
+    )
+
+
+def from_config(config):
+    """Return the /generate response cache, or None when disabled."""
+    return _from_settings(config, "RESPONSE_CACHE", "llm_response_cache", "response")
+
+
+def step_cache_from_config(config):
+    """Return the few-shot step cache, or None when disabled."""
+    return _from_settings(config, "FEW_SHOT_STEP_CACHE", "llm_step_cache", "step")
@@ -0,0 +1,178 @@
+"""Retries with jittered exponential backoff for transient provider errors.
+
+Completion calls have no side effects, so the same request can safely be
+sent again after:
+
+* a timeout (HTTP 408/504, the SDK's timeout errors, ``TimeoutError``);
+* a dropped or refused connection (``APIConnectionError``,
+  ``ConnectionError``);
+* a provider-side failure (HTTP 500/502/503); or
+* a short-term rate limit (HTTP 429) where the provider said when to retry.
+
+Quota exhaustion (``insufficient_quota``, per-day limits) and all other errors
+are raised at once.
+
+Attempt ``n`` sleeps a uniformly random time between 0 and
+``min(max_delay, base_delay * 2 ** (n - 1))``. It sleeps longer when the
+provider asked for a longer retry-after. No retry starts if its sleep would
+end after ``deadline_seconds`` from the first attempt. The service owns
+retries: OpenAI clients are built with ``max_retries=0``, so SDK and service
+retries do not multiply.
+"""
+
+import asyncio
+import logging
+import random
+import time
+from collections import namedtuple
+
+import prometheus_client
+
+from app.services import rate_limiter
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_CALL_ATTEMPTS = prometheus_client.Histogram(
+    "llm_provider_call_attempts",
+    "Attempts per provider call (1 means no retry was needed)",
+    ["provider", "outcome"],
+    buckets=(1, 2, 3, 4, 5, 8),
+)
+PROVIDER_RETRIES = prometheus_client.Counter(
+    "llm_provider_retries_total",
+    "Provider calls repeated after a transient error",
+    ["provider", "reason"],
+)
+
+RetryPolicy = namedtuple(
+    "RetryPolicy", ["max_attempts", "base_delay", "max_delay", "deadline_seconds"]
+)
+
+DEFAULT_POLICY = RetryPolicy(
+    max_attempts=3, base_delay=0.5, max_delay=8.0, deadline_seconds=60.0
+)
+
+_STATUS_REASONS = {
+    408: "timeout",
+    429: "rate_limited",
+    500: "server_error",
+    502: "server_error",
+    503: "server_error",
+    504: "timeout",
+}
+# OpenAI and google-api-core exception classes, matched by name so the check
+# does not depend on which SDK raised.
+_TYPE_REASONS = {
+    "APITimeoutError": "timeout",
+    "DeadlineExceeded": "timeout",
+    "APIConnectionError": "connection",
+    "ServiceUnavailable": "server_error",
+    "InternalServerError": "server_error",
+}
+_QUOTA_EXHAUSTED = ("insufficient_quota", "perday", "per day")
+
+
+def _status_code(exc):
+    for attribute in ("status_code", "code"):
+        value = getattr(exc, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def transient_reason(exc):
+    """Return why ``exc`` is worth retrying, or None if it is not."""
+    reason = _STATUS_REASONS.get(_status_code(exc))
+    if reason is None:
+        for cls in type(exc).__mro__:
+            reason = _TYPE_REASONS.get(cls.__name__)
+            if reason is not None:
+                break
+    if reason is None:
+        if isinstance(exc, TimeoutError):
+            reason = "timeout"
+        elif isinstance(exc, ConnectionError):
+            reason = "connection"
+    if reason == "rate_limited":
+        text = str(exc).lower()
+        if any(token in text for token in _QUOTA_EXHAUSTED):
+            return None
+        if rate_limiter.retry_after_seconds(exc) is None:
+            return None
+    return reason
+
+
+def _backoff(policy, attempt, reason, exc):
+    ceiling = min(policy.max_delay, policy.base_delay * 2 ** (attempt - 1))
+    delay = random.uniform(0, ceiling)
+    if reason == "rate_limited":
+        # OpenAI sends reset headers on every response; only a 429 means them.
+        delay = max(delay, rate_limiter.retry_after_seconds(exc))
+    return delay
+
+
+def _next_delay(provider, policy, attempt, started, exc):
+    """Return the sleep before the next attempt, or None to give up."""
+    reason = transient_reason(exc)
+    if reason is None or attempt >= policy.max_attempts:
+        return None
+    delay = _backoff(policy, attempt, reason, exc)
+    if time.monotonic() - started + delay > policy.deadline_seconds:
+        return None
+    PROVIDER_RETRIES.labels(provider=provider, reason=reason).inc()
+    logger.warning(
+        "%s call failed (%s, attempt %d/%d); retrying in %.2fs: %s",
+        provider,
+        reason,
+        attempt,
+        policy.max_attempts,
+        delay,
+        exc,
+    )
+    return delay
+
+
+def call(provider, fn, policy=DEFAULT_POLICY):
+    """Return ``fn()``, retrying transient errors according to ``policy``."""
+    started = time.monotonic()
+    attempt = 1
+    while True:
+        try:
+            result = fn()
+        except Exception as e:
+            delay = _next_delay(provider, policy, attempt, started, e)
+            if delay is None:
+                PROVIDER_CALL_ATTEMPTS.labels(
+                    provider=provider, outcome="failure"
+                ).observe(attempt)
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        PROVIDER_CALL_ATTEMPTS.labels(provider=provider, outcome="success").observe(
+            attempt
+        )
+        return result
+
+
+async def call_async(provider, fn, policy=DEFAULT_POLICY):
+    """Async counterpart of ``call``; ``fn`` returns an awaitable."""
+    started = time.monotonic()
+    attempt = 1
+    while True:
+        try:
+            result = await fn()
+        except Exception as e:
+            delay = _next_delay(provider, policy, attempt, started, e)
+            if delay is None:
+                PROVIDER_CALL_ATTEMPTS.labels(
+                    provider=provider, outcome="failure"
+                ).observe(attempt)
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        PROVIDER_CALL_ATTEMPTS.labels(provider=provider, outcome="success").observe(
+            attempt
+        )
+        return result
@@ -0,0 +1,133 @@
+"""JSON Schemas for few-shot step outputs and the merged BPMN model.
+
+Each few-shot step answers with one JSON object whose shape is fixed by its
+prompt file. The schemas here make those contracts explicit and serve two
+purposes:
+
+* ``validate_step`` checks a parsed step output with a validator compiled at
+  import, so a malformed step fails (and is retried or falls back) before it
+  reaches the merge; and
+* ``response_schema`` hands the same schema to providers that enforce
+  structured output (OpenAI ``json_schema``, Gemini ``response_schema``).
+
+Schemas only use keywords both providers accept (``type``, ``properties``,
+``required``, ``items``, ``enum``). Gemini drops fields a schema does not
+list, so every field the prompts ask for is declared even when optional.
+"""
+
+import jsonschema
+import prometheus_client
+
+STEP_SCHEMA_FAILURES = prometheus_client.Counter(
+    "llm_step_schema_failures_total",
+    "Few-shot step outputs rejected by their JSON schema",
+    ["step"],
+)
+
+_STRING = {"type": "string"}
+
+
+def _object(properties, required):
+    return {"type": "object", "properties": properties, "required": required}
+
+
+def _array(items):
+    return {"type": "array", "items": items}
+
+
+def _events(*event_types):
+    event = _object(
+        {
+            "id": _STRING,
+            "type": {"type": "string", "enum": list(event_types)},
+            "name": _STRING,
+        },
+        ["id", "type"],
+    )
+    return _array(event)
+
+
+_TASKS = _array(
+    _object({"id": _STRING, "type": _STRING, "name": _STRING}, ["id", "name"])
+)
+
+_GATEWAYS = _array(
+    _object(
+        {
+            "id": _STRING,
+            "type": {
+                "type": "string",
+                "enum": ["exclusiveGateway", "parallelGateway", "inclusiveGateway"],
+            },
+            "name": _STRING,
+            "role": _STRING,
+            "branch_count": {"type": "integer"},
+            "evidence": _STRING,
+            "branch_cues": _array(_STRING),
+            "paired_gateway_id": _STRING,
+        },
+        ["id", "type"],
+    )
+)
+
+_FLOWS = _array(
+    _object(
+        {"id": _STRING, "type": _STRING, "source": _STRING, "target": _STRING},
+        ["id", "source", "target"],
+    )
+)
+
+MODEL_SCHEMA = _object(
+    {
+        "events": _events("startEvent", "endEvent"),
+        "tasks": _TASKS,
+        "gateways": _GATEWAYS,
+        "flows": _FLOWS,
+    },
+    ["events", "tasks", "gateways", "flows"],
+)
+
+STEP_SCHEMAS = {
+    "context_summary": _object({"process_context": _STRING}, ["process_context"]),
+    "start_event": _object({"events": _events("startEvent")}, ["events"]),
+    "tasks": _object({"tasks": _TASKS}, ["tasks"]),
+    "gateways": _object({"gateways": _GATEWAYS}, ["gateways"]),
+    "end_event": _object({"events": _events("endEvent")}, ["events"]),
+    "flows": _object({"flows": _FLOWS}, ["flows"]),
+    "merge_and_validate": MODEL_SCHEMA,
+    "repair": MODEL_SCHEMA,
+}
+
+
+def _compile(schema):
+    jsonschema.Draft202012Validator.check_schema(schema)
+    return jsonschema.Draft202012Validator(schema)
+
+
+_VALIDATORS = {step: _compile(schema) for step, schema in STEP_SCHEMAS.items()}
+
+
+class StepSchemaError(ValueError):
+    """Raised when a step output does not match its schema."""
+
+
+def response_schema(step_name):
+    """Return the structured-output schema for ``step_name``, or None."""
+    return STEP_SCHEMAS.get(step_name)
+
+
+def validate_step(step_name, output):
+    """Raise StepSchemaError if ``output`` violates the schema of ``step_name``.
+
+    Steps without a schema are accepted as-is.
+    """
+    validator = _VALIDATORS.get(step_name)
+    if validator is None:
+        return
+    error = jsonschema.exceptions.best_match(validator.iter_errors(output))
+    if error is not None:
+        STEP_SCHEMA_FAILURES.labels(step=step_name).inc()
+        location = "/".join(str(part) for part in error.absolute_path) or "<root>"
+        raise StepSchemaError(
+            f"Step '{step_name}' output is invalid at {location}: {error.message}"
+        )
@@ -0,0 +1,106 @@
+"""Incremental extraction of the first JSON object from model output.
+
+Model output often wraps the JSON object in code fences or prose, and may
+contain further braces after it. ``JsonObjectScanner`` consumes text chunk by
+chunk, tracks brace depth outside of JSON strings, and parses a candidate as
+soon as its top-level ``}`` arrives, so a caller can react (e.g. stop a
+stream) the moment the first object is complete. A balanced candidate that is
+not valid JSON (such as ``{placeholder}`` in prose) is skipped and scanning
+resumes right after its opening brace.
+"""
+
+import json
+import re
+
+# Characters that can change depth or string state; everything else is skipped.
+_SIGNIFICANT = re.compile(r'[{}"\\]')
+
+
+class JsonObjectScanner:
+    """Find the first complete top-level JSON object in streamed text."""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._end = None
+        self.result = None
+
+    @property
+    def done(self):
+        return self._end is not None
+
+    @property
+    def end(self):
+        """Offset just past the object's closing brace, or None."""
+        return self._end
+
+    def feed(self, chunk):
+        """Consume ``chunk``; return the parsed object once complete, else None."""
+        if self._end is None and chunk:
+            self._text += chunk
+            self._scan()
+        return self.result
+
+    def _scan(self):
+        text = self._text
+        while True:
+            if self._start == -1:
+                start = text.find("{", self._pos)
+                if start == -1:
+                    self._pos = len(text)
+                    return
+                self._start = start
+                self._depth = 0
+                self._in_string = False
+                self._pos = start
+
+            match = _SIGNIFICANT.search(text, self._pos)
+            if match is None:
+                self._pos = len(text)
+                return
+            char = match.group()
+            index = match.start()
+
+            if char == "\\":
+                if not self._in_string:
+                    self._pos = index + 1
+                elif index + 1 < len(text):
+                    self._pos = index + 2  # skip the escaped character
+                else:
+                    self._pos = index  # wait for the escaped character
+                    return
+                continue
+
+            self._pos = index + 1
+            if char == '"':
+                self._in_string = not self._in_string
+            elif self._in_string:
+                continue
+            elif char == "{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.result = json.loads(text[self._start : index + 1])
+                    except ValueError:
+                        self._pos = self._start + 1
+                        self._start = -1
+                        continue
+                    self._end = index + 1
+                    return
+
+
+def extract_first_object(text):
+    """Parse the first complete JSON object in ``text``.
+
+    Raises ``ValueError`` if ``text`` contains no complete, valid object.
+    """
+    scanner = JsonObjectScanner()
+    scanner.feed(text or "")
+    if not scanner.done:
+        raise ValueError("Model output does not contain a JSON object.")
+    return scanner.result
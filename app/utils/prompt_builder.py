@@ -1,4 +1,5 @@
 import logging
+import re
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
@@ -8,6 +9,72 @@ STRICT_JSON_REMINDER = (
     "Do not use markdown fences, code blocks, explanations, or extra text."
 )
 
+_PLACEHOLDER = re.compile(r"\{\{([A-Z_]+)\}\}")
+
+
+def estimate_tokens(text):
+    """Estimate the token count of ``text`` without a tokenizer.
+
+    BPE tokenizers average about four characters per token on ASCII prose,
+    while accented and CJK characters often cost a token each, so those are
+    counted one-to-one. The estimate errs high for non-English text.
+    """
+    if not text:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (len(text) - ascii_chars)
+
+
+class PromptTooLargeError(ValueError):
+    """Raised when a prompt does not fit the model's input token budget."""
+
+    def __init__(self, estimated_tokens, max_tokens):
+        super().__init__(
+            f"Prompt is about {estimated_tokens} tokens; the model allows "
+            f"{max_tokens} input tokens."
+        )
+        self.estimated_tokens = estimated_tokens
+        self.max_tokens = max_tokens
+
+
+class PromptTemplate:
+    """Prompt text parsed once into static segments and ``{{NAME}}`` slots.
+
+    ``render`` fills every slot in a single join, so a long process text is
+    copied once per prompt instead of once per ``str.replace`` call.
+    """
+
+    __slots__ = ("name", "placeholders", "_parts")
+
+    def __init__(self, text, name="prompt"):
+        self.name = name
+        # split() alternates static text and placeholder names:
+        # [text, NAME, text, NAME, ..., text]
+        self._parts = tuple(_PLACEHOLDER.split(text))
+        self.placeholders = frozenset(self._parts[1::2])
+
+    def validate(self, expected):
+        """Raise ValueError unless the slots are exactly ``expected``."""
+        missing = sorted(set(expected) - self.placeholders)
+        if missing:
+            raise ValueError(
+                f"Prompt template {self.name} is missing placeholders: "
+                + ", ".join("{{%s}}" % name for name in missing)
+            )
+        unknown = sorted(self.placeholders - set(expected))
+        if unknown:
+            raise ValueError(
+                f"Prompt template {self.name} has unknown placeholders: "
+                + ", ".join("{{%s}}" % name for name in unknown)
+            )
+
+    def render(self, values):
+        """Return the template with each placeholder replaced from ``values``."""
+        parts = list(self._parts)
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return "".join(parts)
+
 
 class PromptBuilder:
     """Class for building prompts with different strategies"""
@@ -22,10 +89,31 @@ class PromptBuilder:
         "06_merge_and_validate_prompt.txt",
     ]
     _ZERO_SHOT_PROMPT_FILE = "00_zero_shot_prompt.txt"
+    # Placeholders each prompt file must contain, and the only ones it may use.
+    _PLACEHOLDERS = {
+        "00_shared_rules.txt": (),
+        "01_start_event_prompt.txt": ("PROCESS_TEXT",),
+        "02_tasks_prompt.txt": ("PROCESS_TEXT",),
+        "03_gateways_prompt.txt": ("PROCESS_TEXT",),
+        "04_flows_prompt.txt": ("PROCESS_TEXT", "KNOWN_ELEMENTS_JSON"),
+        "05_end_event_prompt.txt": ("PROCESS_TEXT",),
+        "06_merge_and_validate_prompt.txt": ("PARTIAL_OUTPUTS_JSON",),
+        _ZERO_SHOT_PROMPT_FILE: ("PROCESS_TEXT",),
+    }
 
     def __init__(self):
         self.few_shot_prompt_pack = self._load_few_shot_prompt_pack()
         self.zero_shot_prompt_template = self._load_zero_shot_prompt_template()
+        self._zero_shot_template = self._compile(
+            self._ZERO_SHOT_PROMPT_FILE, self.zero_shot_prompt_template
+        )
+        for file_name, text in self.few_shot_prompt_pack.items():
+            self._compile(file_name, text)
+        self.few_shot_step_templates = {
+            file_name: self._compile_step(file_name)
+            for file_name in self._FEW_SHOT_PACK_FILES[1:]
+        }
+        self._stepwise_few_shot_template = self._compile_stepwise_few_shot()
 
     def _load_few_shot_prompt_pack(self):
         """Load the stepwise few-shot prompt pack from text files."""
@@ -53,74 +141,62 @@ class PromptBuilder:
             logger.warning("Error loading zero-shot prompt template %s: %s", file_path, e)
             return ""
 
-    def _build_zero_shot_prompt(self, user_input):
-        """Build zero-shot prompt using external template with fallback."""
-        if self.zero_shot_prompt_template:
-            return self.zero_shot_prompt_template.replace("{{PROCESS_TEXT}}", user_input)
-        return (
-            "Please generate a BPMN model for the following description:\n\n"
-            f"{user_input}\n\n"
-            f"{STRICT_JSON_REMINDER}\n\n"
-            "Return only a JSON object with the following structure:\n"
-            '{"events": [], "tasks": [], "gateways": [], "flows": []}\n\n'
-            "BPMN JSON:"
-        )
+    def _compile(self, file_name, text):
+        """Parse a loaded prompt file and check its placeholders.
 
-    def _build_stepwise_few_shot_prompt(self, user_input):
-        """Compose one prompt that applies the stepwise extraction method internally."""
-        shared_rules = self.few_shot_prompt_pack.get("00_shared_rules.txt", "")
-        start_prompt = self.few_shot_prompt_pack.get("01_start_event_prompt.txt", "")
-        tasks_prompt = self.few_shot_prompt_pack.get("02_tasks_prompt.txt", "")
-        gateways_prompt = self.few_shot_prompt_pack.get("03_gateways_prompt.txt", "")
-        flows_prompt = self.few_shot_prompt_pack.get("04_flows_prompt.txt", "")
-        end_prompt = self.few_shot_prompt_pack.get("05_end_event_prompt.txt", "")
-        merge_prompt = self.few_shot_prompt_pack.get(
-            "06_merge_and_validate_prompt.txt", ""
+        Files that failed to load are empty and are not validated; callers
+        fall back as before.
+        """
+        template = PromptTemplate(text, name=file_name)
+        if text:
+            template.validate(self._PLACEHOLDERS[file_name])
+        return template
+
+    def _compile_step(self, file_name):
+        """Compile one few-shot step as sent by the multi-call orchestration."""
+        shared = self.few_shot_prompt_pack["00_shared_rules.txt"]
+        return PromptTemplate(
+            (
+                f"{shared}\n\n{self.few_shot_prompt_pack[file_name]}\n\n"
+                f"{STRICT_JSON_REMINDER}\n"
+                "Return only JSON matching the step schema."
+            ).strip(),
+            name=file_name,
         )
 
-        if not any(
-            [
-                shared_rules,
-                start_prompt,
-                tasks_prompt,
-                gateways_prompt,
-                flows_prompt,
-                end_prompt,
-                merge_prompt,
-            ]
-        ):
-            logger.warning(
-                "Few-shot prompt pack is unavailable; falling back to zero-shot prompt."
-            )
-            return self._build_zero_shot_prompt(user_input)
+    def _compile_stepwise_few_shot(self):
+        """Compile the single-call stepwise prompt; None if the pack is empty."""
+        pack = self.few_shot_prompt_pack
+        if not any(pack.values()):
+            return None
 
         sections = [
             "Use the following stepwise few-shot method internally. "
             "Do not return intermediate steps. Return only the final merged JSON object.",
             "",
             "=== SHARED RULES ===",
-            shared_rules,
+            pack["00_shared_rules.txt"],
             "",
             "=== STEP 1: START EVENT ===",
-            start_prompt.replace("{{PROCESS_TEXT}}", user_input),
+            pack["01_start_event_prompt.txt"],
             "",
             "=== STEP 2: TASKS ===",
-            tasks_prompt.replace("{{PROCESS_TEXT}}", user_input),
+            pack["02_tasks_prompt.txt"],
             "",
             "=== STEP 3: GATEWAYS ===",
-            gateways_prompt.replace("{{PROCESS_TEXT}}", user_input),
+            pack["03_gateways_prompt.txt"],
             "",
             "=== STEP 4: END EVENT ===",
-            end_prompt.replace("{{PROCESS_TEXT}}", user_input),
+            pack["05_end_event_prompt.txt"],
             "",
             "=== STEP 5: FLOWS ===",
-            flows_prompt.replace("{{PROCESS_TEXT}}", user_input).replace(
+            pack["04_flows_prompt.txt"].replace(
                 "{{KNOWN_ELEMENTS_JSON}}",
                 "Use elements extracted in steps 1-4 as known elements.",
             ),
             "",
             "=== STEP 6: MERGE + VALIDATE ===",
-            merge_prompt.replace(
+            pack["06_merge_and_validate_prompt.txt"].replace(
                 "{{PARTIAL_OUTPUTS_JSON}}",
                 "Use your outputs from steps 1-5 as partial outputs.",
             ),
@@ -128,19 +204,74 @@ class PromptBuilder:
             STRICT_JSON_REMINDER,
             "",
             "PROCESS TEXT:",
-            user_input,
+            "{{PROCESS_TEXT}}",
             "",
             "Return only the final JSON object.",
         ]
-        return "\n".join([s for s in sections if s is not None])
+        return PromptTemplate("\n".join(sections), name="stepwise_few_shot")
+
+    @staticmethod
+    def check_budget(prompt, max_tokens=None):
+        """Return ``prompt``, or raise PromptTooLargeError if it exceeds the budget."""
+        if max_tokens is not None:
+            estimated = estimate_tokens(prompt)
+            if estimated > max_tokens:
+                raise PromptTooLargeError(estimated, max_tokens)
+        return prompt
+
+    def render_step(
+        self,
+        file_name,
+        process_text,
+        known_elements_json="",
+        partial_outputs_json="",
+        max_tokens=None,
+    ):
+        """Render one few-shot step prompt for the multi-call orchestration."""
+        prompt = self.few_shot_step_templates[file_name].render(
+            {
+                "PROCESS_TEXT": process_text,
+                "KNOWN_ELEMENTS_JSON": known_elements_json,
+                "PARTIAL_OUTPUTS_JSON": partial_outputs_json,
+            }
+        )
+        return self.check_budget(prompt, max_tokens)
+
+    def _build_zero_shot_prompt(self, user_input):
+        """Build zero-shot prompt using external template with fallback."""
+        if self.zero_shot_prompt_template:
+            return self._zero_shot_template.render({"PROCESS_TEXT": user_input})
+        return (
+            "Please generate a BPMN model for the following description:\n\n"
+            f"{user_input}\n\n"
+            f"{STRICT_JSON_REMINDER}\n\n"
+            "Return only a JSON object with the following structure:\n"
+            '{"events": [], "tasks": [], "gateways": [], "flows": []}\n\n'
+            "BPMN JSON:"
+        )
 
-    def build_prompt(self, strategy, user_input):
-        """Build prompt based on strategy"""
+    def _build_stepwise_few_shot_prompt(self, user_input):
+        """Compose one prompt that applies the stepwise extraction method internally."""
+        if self._stepwise_few_shot_template is None:
+            logger.warning(
+                "Few-shot prompt pack is unavailable; falling back to zero-shot prompt."
+            )
+            return self._build_zero_shot_prompt(user_input)
+        return self._stepwise_few_shot_template.render({"PROCESS_TEXT": user_input})
+
+    def build_prompt(self, strategy, user_input, max_tokens=None):
+        """Build prompt based on strategy.
+
+        With ``max_tokens``, raise ``PromptTooLargeError`` instead of returning
+        a prompt whose estimated size exceeds it.
+        """
         if strategy == "few_shot":
-            return self._build_stepwise_few_shot_prompt(user_input)
+            prompt = self._build_stepwise_few_shot_prompt(user_input)
 
         elif strategy == "zero_shot":
-            return self._build_zero_shot_prompt(user_input)
+            prompt = self._build_zero_shot_prompt(user_input)
 
         else:
             raise ValueError(f"Unsupported prompting strategy: {strategy}")
+
+        return self.check_budget(prompt, max_tokens)
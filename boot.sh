@@ -42,14 +42,24 @@ done
 #     sleep 5
 # done
 
-venv/bin/gunicorn \
-	-b :5000 \
-	--workers "$GUNICORN_WORKERS" \
-	--threads "$GUNICORN_THREADS" \
-	--access-logfile - \
-	--error-logfile - \
-	--timeout "${GUNICORN_TIMEOUT:-600}" \
-	llm-api-connector:app &
+# SERVER_MODE=asgi serves /generate on asyncio via uvicorn (see app/asgi.py).
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+	venv/bin/uvicorn \
+		--host 0.0.0.0 \
+		--port 5000 \
+		--workers "$GUNICORN_WORKERS" \
+		--timeout-keep-alive "${UVICORN_KEEPALIVE:-5}" \
+		llm-api-connector-asgi:app &
+else
+	venv/bin/gunicorn \
+		-b :5000 \
+		--workers "$GUNICORN_WORKERS" \
+		--threads "$GUNICORN_THREADS" \
+		--access-logfile - \
+		--error-logfile - \
+		--timeout "${GUNICORN_TIMEOUT:-600}" \
+		llm-api-connector:app &
+fi
 
 GUNICORN_PID=$!
 wait "$GUNICORN_PID"
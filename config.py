@@ -25,6 +25,19 @@ def _env_bool(name, default=False):
     return value.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _env_int_map(name, default=None):
+    """Parse ``key=int`` pairs separated by commas (e.g. ``openai=4,gemini=2``)."""
+    value = os.environ.get(name)
+    if not value:
+        return dict(default or {})
+    parsed = {}
+    for pair in value.split(","):
+        key, _, number = pair.partition("=")
+        if key.strip() and number.strip():
+            parsed[key.strip()] = int(number)
+    return parsed
+
+
 # === Base Configuration ===
 class BaseConfig:
     SYSTEM_PROMPT = _load_system_prompt_from_txt()
@@ -45,6 +58,147 @@ class BaseConfig:
     REDIS_USE_MOCK = _env_bool("REDIS_USE_MOCK", default=False)
     INTERNAL_ASYNC_ENABLED = _env_bool("INTERNAL_ASYNC_ENABLED", default=True)
     ASYNC_JOB_TTL_SECONDS = int(os.environ.get("ASYNC_JOB_TTL_SECONDS") or 3600)
+    # Internal async jobs are queued in Redis and run by a fixed pool of
+    # worker threads per app process. Submissions beyond the queue depth are
+    # rejected with 503; jobs of a process whose heartbeat expires are
+    # requeued until they have been lost ASYNC_JOB_MAX_ATTEMPTS times.
+    ASYNC_JOB_WORKER_THREADS = int(os.environ.get("ASYNC_JOB_WORKER_THREADS") or 4)
+    ASYNC_JOB_QUEUE_MAX_DEPTH = int(os.environ.get("ASYNC_JOB_QUEUE_MAX_DEPTH") or 1000)
+    # Per-process limit of concurrently running jobs per provider, e.g.
+    # "openai=4,gemini=2"; unlisted providers are bounded by the thread count.
+    ASYNC_JOB_PROVIDER_CONCURRENCY = _env_int_map("ASYNC_JOB_PROVIDER_CONCURRENCY")
+    # Limits for POST /internal/jobs/generate:batch and its status pages.
+    ASYNC_BATCH_MAX_ITEMS = int(os.environ.get("ASYNC_BATCH_MAX_ITEMS") or 500)
+    ASYNC_BATCH_PAGE_MAX = int(os.environ.get("ASYNC_BATCH_PAGE_MAX") or 200)
+    ASYNC_JOB_HEARTBEAT_SECONDS = int(
+        os.environ.get("ASYNC_JOB_HEARTBEAT_SECONDS") or 30
+    )
+    ASYNC_JOB_MAX_ATTEMPTS = int(os.environ.get("ASYNC_JOB_MAX_ATTEMPTS") or 2)
+    ASYNC_JOB_POLL_SECONDS = float(os.environ.get("ASYNC_JOB_POLL_SECONDS") or 1.0)
+    # Start the worker pool when the app is created, so jobs already queued in
+    # Redis run after a restart; otherwise it starts on the first submit.
+    ASYNC_JOB_WORKERS_AUTOSTART = _env_bool("ASYNC_JOB_WORKERS_AUTOSTART", default=True)
+    # Upper bound for GET /internal/jobs/<id>?wait=N long-polls, and lifetime
+    # and keep-alive interval of the /internal/jobs/<id>/events SSE stream.
+    # Each waiting client holds a server thread, so keep these modest.
+    ASYNC_JOB_MAX_WAIT_SECONDS = int(os.environ.get("ASYNC_JOB_MAX_WAIT_SECONDS") or 30)
+    ASYNC_JOB_EVENTS_MAX_SECONDS = int(
+        os.environ.get("ASYNC_JOB_EVENTS_MAX_SECONDS") or 600
+    )
+    ASYNC_JOB_EVENTS_KEEPALIVE_SECONDS = int(
+        os.environ.get("ASYNC_JOB_EVENTS_KEEPALIVE_SECONDS") or 15
+    )
+    # Threads that run few-shot orchestrations under the ASGI entry point; each
+    # few-shot request holds one for its whole run (its provider calls are
+    # awaited on the event loop). Concurrent steps of a run use up to
+    # FEW_SHOT_MAX_CONCURRENCY further threads, so a service can use up to
+    # ASYNC_FEW_SHOT_THREADS * (1 + FEW_SHOT_MAX_CONCURRENCY) threads.
+    ASYNC_FEW_SHOT_THREADS = int(os.environ.get("ASYNC_FEW_SHOT_THREADS") or 64)
+    # Upper bound for few-shot extraction steps that run concurrently within a
+    # single /generate request (1 restores strictly sequential calls).
+    FEW_SHOT_MAX_CONCURRENCY = int(os.environ.get("FEW_SHOT_MAX_CONCURRENCY") or 4)
+    # /health/ready reuses the last provider probe result for this long.
+    READINESS_CACHE_SECONDS = int(os.environ.get("READINESS_CACHE_SECONDS") or 10)
+    # Keep discovered provider model lists fresh from a background thread
+    # (interval: MODEL_CACHE_REFRESH_SECONDS) so requests never wait on it.
+    MODEL_REFRESH_ENABLED = _env_bool("MODEL_REFRESH_ENABLED", default=True)
+    # Discovered lists are refreshed every MODEL_CACHE_REFRESH_SECONDS (backing
+    # off up to MODEL_CACHE_MAX_BACKOFF_SECONDS after failures). Caller keys not
+    # seen for MODEL_CACHE_IDLE_SECONDS are dropped, and at most
+    # MODEL_CACHE_MAX_ENTRIES caller keys are kept (least recently used first
+    # out); environment keys are always kept.
+    MODEL_CACHE_REFRESH_SECONDS = int(
+        os.environ.get("MODEL_CACHE_REFRESH_SECONDS") or 300
+    )
+    MODEL_CACHE_MAX_BACKOFF_SECONDS = int(
+        os.environ.get("MODEL_CACHE_MAX_BACKOFF_SECONDS") or 1800
+    )
+    MODEL_CACHE_IDLE_SECONDS = int(os.environ.get("MODEL_CACHE_IDLE_SECONDS") or 3600)
+    MODEL_CACHE_MAX_ENTRIES = int(os.environ.get("MODEL_CACHE_MAX_ENTRIES") or 1024)
+    # Provider SDK clients are pooled per key and host: at most
+    # PROVIDER_CLIENT_POOL_SIZE clients, each rebuilt after
+    # PROVIDER_CLIENT_TTL_SECONDS.
+    PROVIDER_CLIENT_POOL_SIZE = int(os.environ.get("PROVIDER_CLIENT_POOL_SIZE") or 32)
+    PROVIDER_CLIENT_TTL_SECONDS = int(
+        os.environ.get("PROVIDER_CLIENT_TTL_SECONDS") or 900
+    )
+    # Stream few-shot steps and GPT-5 zero-shot calls internally and close the
+    # provider stream once the first JSON object is complete, skipping any
+    # trailing prose the model would otherwise generate.
+    JSON_EARLY_ABORT_ENABLED = _env_bool("JSON_EARLY_ABORT_ENABLED", default=False)
+    # Upload the system prompt and shared few-shot rules once as Gemini cached
+    # content (per key/model, for GEMINI_CONTEXT_CACHE_TTL_SECONDS) and send
+    # only the step-specific remainder. The prefix must reach the model's
+    # minimum cacheable size, otherwise calls fall back to full prompts.
+    GEMINI_CONTEXT_CACHE_ENABLED = _env_bool(
+        "GEMINI_CONTEXT_CACHE_ENABLED", default=False
+    )
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS = int(
+        os.environ.get("GEMINI_CONTEXT_CACHE_TTL_SECONDS") or 3600
+    )
+    # Handles are kept for this many recently used key/model/prefix triples.
+    GEMINI_CONTEXT_CACHE_MAX_ENTRIES = int(
+        os.environ.get("GEMINI_CONTEXT_CACHE_MAX_ENTRIES") or 1024
+    )
+    # Gate each provider request through an adaptive limiter per provider key
+    # and model: at most PROVIDER_LIMITER_MAX_CONCURRENCY in flight (halved on
+    # each 429 and regrown on success), optionally paced to PROVIDER_LIMITER_RPM
+    # (e.g. "openai=500,gemini=60"). Requests that would wait longer than
+    # PROVIDER_LIMITER_MAX_WAIT_SECONDS, or find PROVIDER_LIMITER_MAX_QUEUE
+    # requests already waiting, are rejected with 429 without calling out.
+    PROVIDER_LIMITER_ENABLED = _env_bool("PROVIDER_LIMITER_ENABLED", default=False)
+    PROVIDER_LIMITER_MAX_CONCURRENCY = _env_int_map("PROVIDER_LIMITER_MAX_CONCURRENCY")
+    PROVIDER_LIMITER_RPM = _env_int_map("PROVIDER_LIMITER_RPM")
+    PROVIDER_LIMITER_MAX_QUEUE = int(os.environ.get("PROVIDER_LIMITER_MAX_QUEUE") or 64)
+    PROVIDER_LIMITER_MAX_WAIT_SECONDS = float(
+        os.environ.get("PROVIDER_LIMITER_MAX_WAIT_SECONDS") or 30
+    )
+    # Limiters are kept for this many recently used keys and models.
+    PROVIDER_LIMITER_MAX_KEYS = int(os.environ.get("PROVIDER_LIMITER_MAX_KEYS") or 1024)
+    # Transient provider failures (timeouts, dropped connections, 5xx, and
+    # 429s that carry a retry-after) are retried with jittered exponential
+    # backoff: at most PROVIDER_RETRY_MAX_ATTEMPTS attempts per call, and no
+    # retry that would start after PROVIDER_RETRY_DEADLINE_SECONDS.
+    # Set the attempts to 1 to disable retries.
+    PROVIDER_RETRY_MAX_ATTEMPTS = int(
+        os.environ.get("PROVIDER_RETRY_MAX_ATTEMPTS") or 3
+    )
+    PROVIDER_RETRY_BASE_DELAY_SECONDS = float(
+        os.environ.get("PROVIDER_RETRY_BASE_DELAY_SECONDS") or 0.5
+    )
+    PROVIDER_RETRY_MAX_DELAY_SECONDS = float(
+        os.environ.get("PROVIDER_RETRY_MAX_DELAY_SECONDS") or 8
+    )
+    PROVIDER_RETRY_DEADLINE_SECONDS = float(
+        os.environ.get("PROVIDER_RETRY_DEADLINE_SECONDS") or 60
+    )
+    # Opt-in cache of /generate responses keyed on prompt/provider/model/
+    # strategy. Backend is "memory" (per worker LRU) or "redis" (REDIS_URL).
+    RESPONSE_CACHE_ENABLED = _env_bool("RESPONSE_CACHE_ENABLED", default=False)
+    RESPONSE_CACHE_BACKEND = os.environ.get("RESPONSE_CACHE_BACKEND") or "memory"
+    RESPONSE_CACHE_TTL_SECONDS = int(
+        os.environ.get("RESPONSE_CACHE_TTL_SECONDS") or 3600
+    )
+    RESPONSE_CACHE_MAX_ENTRIES = int(
+        os.environ.get("RESPONSE_CACHE_MAX_ENTRIES") or 1024
+    )
+    RESPONSE_CACHE_MAX_VALUE_BYTES = int(
+        os.environ.get("RESPONSE_CACHE_MAX_VALUE_BYTES") or 262144
+    )
+    # Opt-in memoization of parsed few-shot step outputs, keyed by step name
+    # and composed prompt, so retried/re-submitted jobs resume where they left.
+    FEW_SHOT_STEP_CACHE_ENABLED = _env_bool(
+        "FEW_SHOT_STEP_CACHE_ENABLED", default=False
+    )
+    FEW_SHOT_STEP_CACHE_BACKEND = (
+        os.environ.get("FEW_SHOT_STEP_CACHE_BACKEND") or RESPONSE_CACHE_BACKEND
+    )
+    FEW_SHOT_STEP_CACHE_TTL_SECONDS = int(
+        os.environ.get("FEW_SHOT_STEP_CACHE_TTL_SECONDS") or 3600
+    )
+    FEW_SHOT_STEP_CACHE_MAX_ENTRIES = int(
+        os.environ.get("FEW_SHOT_STEP_CACHE_MAX_ENTRIES") or 4096
+    )
     SECRET_KEY = (
         os.environ.get("SECRET_KEY")
         or "fj92348759t182htpoihf9sd8gu98341hrpasdhuq8gpsiodfh9823r"
@@ -74,6 +228,8 @@ class TestingConfig(BaseConfig):
         or "test-gemini-key"
     )
     REDIS_USE_MOCK = True
+    MODEL_REFRESH_ENABLED = False
+    ASYNC_JOB_WORKERS_AUTOSTART = False
 
 
 # === Select Configuration Class Based on Environment ===
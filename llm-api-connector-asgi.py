@@ -0,0 +1,14 @@
+"""ASGI entry point, e.g. ``uvicorn llm-api-connector-asgi:app``.
+
+``POST /generate`` runs natively on asyncio (AsyncLLMService); every other
+route is served by the same Flask app as the WSGI entry point.
+"""
+
+import importlib
+
+from app.asgi import create_asgi_app
+
+# Reuse the WSGI entry point's logging setup and Flask app instance.
+_wsgi_entry = importlib.import_module("llm-api-connector")
+
+app = create_asgi_app(_wsgi_entry.app)
@@ -0,0 +1,319 @@
+import asyncio
+import contextvars
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from flask import current_app
+
+from app import create_app
+from app.asgi import create_asgi_app
+from app.services import client_pool, model_registry
+from app.services.async_llm_service import AsyncLLMService
+from config import TestingConfig
+
+_REQUEST_ID = contextvars.ContextVar("request_id", default=None)
+
+
+class _AsyncStream:
+    """Stand-in for an ``AsyncOpenAI`` chat completion stream."""
+
+    def __init__(self, texts):
+        self.chunks = [
+            SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=text))],
+                usage=None,
+            )
+            for text in texts
+        ]
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.chunks:
+            raise StopAsyncIteration
+        return self.chunks.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def _call(asgi_app, method, path, headers=None, body=b"", raw=False):
+    """Drive one HTTP request through ``asgi_app``; return (status, json).
+
+    With ``raw=True`` the undecoded response body is returned instead.
+    """
+    headers = dict(headers or {})
+    if body:
+        headers["Content-Length"] = str(len(body))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("ascii"),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [
+            (name.lower().encode("latin-1"), value.encode("latin-1"))
+            for name, value in headers.items()
+        ],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+    request_messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        if request_messages:
+            return request_messages.pop(0)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    payload = b"".join(
+        m.get("body", b"") for m in sent if m["type"] == "http.response.body"
+    )
+    return status, payload if raw else json.loads(payload)
+
+
+class TestAsgiApp(unittest.TestCase):
+    def setUp(self):
+        client_pool.clear()
+        # Keep request tests hermetic: live model discovery would reach the
+        # network and pool real provider clients under the test API key.
+        # Without it the registry serves its fallback lists (any model name).
+        model_registry.clear_model_cache()
+        discovery_patcher = patch(
+            "app.services.model_registry._discover_live",
+            side_effect=ConnectionError("model discovery disabled in tests"),
+        )
+        discovery_patcher.start()
+        self.addCleanup(discovery_patcher.stop)
+        self.flask_app = create_app(TestingConfig)
+        self.asgi_app = create_asgi_app(self.flask_app)
+
+    def _generate(self, headers=None):
+        return _call(
+            self.asgi_app,
+            "POST",
+            "/generate",
+            headers={"Content-Type": "application/json", **(headers or {})},
+            body=json.dumps(
+                {
+                    "user_text": "describe a process",
+                    "provider": "openai",
+                    "model": "gpt-4o",
+                }
+            ).encode("utf-8"),
+        )
+
+    @patch("app.services.async_llm_service.AsyncOpenAI")
+    def test_generate_openai_success(self, mock_async_openai):
+        mock_choice = MagicMock()
+        mock_choice.message.content = "RAW BPMN JSON"
+        mock_completion = MagicMock()
+        mock_completion.choices = [mock_choice]
+        create = AsyncMock(return_value=mock_completion)
+        mock_async_openai.return_value.chat.completions.create = create
+
+        status, data = self._generate({"Authorization": "Bearer secret-token"})
+
+        self.assertEqual(status, 200)
+        self.assertEqual(data, {"raw_response": "RAW BPMN JSON"})
+        mock_async_openai.assert_called_once_with(api_key="secret-token", max_retries=0)
+        create.assert_awaited_once()
+
+    @patch("app.services.async_llm_service.AsyncOpenAI")
+    def test_generate_without_bearer_is_401(self, mock_async_openai):
+        status, data = self._generate()
+        self.assertEqual(status, 401)
+        self.assertIn("error", data)
+        mock_async_openai.assert_not_called()
+
+    @patch("app.services.async_llm_service.AsyncOpenAI")
+    def test_generate_empty_response_is_400(self, mock_async_openai):
+        mock_choice = MagicMock()
+        mock_choice.message.content = ""
+        mock_completion = MagicMock()
+        mock_completion.choices = [mock_choice]
+        mock_async_openai.return_value.chat.completions.create = AsyncMock(
+            return_value=mock_completion
+        )
+
+        status, data = self._generate({"Authorization": "Bearer secret-token"})
+
+        self.assertEqual(status, 400)
+        self.assertEqual(data["error"]["code"], "invalid_request")
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_streamed_generate_is_relayed_by_flask(self, mock_openai):
+        chunk = MagicMock()
+        chunk.choices = [MagicMock()]
+        chunk.choices[0].delta.content = "RAW BPMN JSON"
+        mock_openai.return_value.chat.completions.create.return_value = iter([chunk])
+
+        status, body = _call(
+            self.asgi_app,
+            "POST",
+            "/generate",
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": "Bearer secret-token",
+            },
+            body=json.dumps(
+                {
+                    "user_text": "describe a process",
+                    "provider": "openai",
+                    "model": "gpt-4o",
+                    "stream": True,
+                }
+            ).encode("utf-8"),
+            raw=True,
+        )
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'event: done\ndata: {"raw_response": "RAW BPMN JSON"}', body)
+
+    @patch("app.services.llm_service.OpenAI")
+    @patch("app.services.async_llm_service.AsyncOpenAI")
+    def test_non_boolean_stream_is_rejected_like_flask(self, mock_async, mock_sync):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer secret-token",
+        }
+        flask_client = self.flask_app.test_client()
+        for stream in ("yes", 1, "true"):
+            with self.subTest(stream=stream):
+                body = {
+                    "user_text": "describe a process",
+                    "provider": "openai",
+                    "model": "gpt-4o",
+                    "stream": stream,
+                }
+
+                status, data = _call(
+                    self.asgi_app,
+                    "POST",
+                    "/generate",
+                    headers=headers,
+                    body=json.dumps(body).encode("utf-8"),
+                )
+                expected = flask_client.post("/generate", headers=headers, json=body)
+
+                self.assertEqual(status, 400)
+                self.assertEqual(status, expected.status_code)
+                self.assertEqual(data, expected.get_json())
+        mock_async.assert_not_called()
+        mock_sync.assert_not_called()
+
+    def test_other_routes_fall_through_to_flask(self):
+        status, data = _call(self.asgi_app, "GET", "/_/_/echo")
+        self.assertEqual(status, 200)
+        self.assertEqual(data, {"success": True})
+
+
+class TestAsyncFewShotOrchestration(unittest.TestCase):
+    @patch("app.model_registry.refresh_model_cache")
+    def setUp(self, mock_refresh_model_cache):
+        self.flask_app = create_app(TestingConfig)
+        self.flask_app.config["ASYNC_FEW_SHOT_THREADS"] = 2
+        self.service = AsyncLLMService()
+
+    def test_steps_run_off_the_default_executor_with_caller_context(self):
+        seen = {}
+
+        async def generate_step(prompt, schema=None):
+            seen["config"] = current_app.config["ASYNC_FEW_SHOT_THREADS"]
+            seen["request_id"] = _REQUEST_ID.get()
+            return "{}"
+
+        def orchestrate(user_text, generate_once, **kwargs):
+            seen["thread"] = threading.current_thread().name
+            return generate_once("prompt")
+
+        async def run():
+            with self.flask_app.app_context():
+                _REQUEST_ID.set("req-1")
+                return await self.service._run_few_shot_orchestration_async(
+                    "text", generate_step
+                )
+
+        with patch.object(
+            self.service, "_run_few_shot_orchestration", side_effect=orchestrate
+        ):
+            result = asyncio.run(run())
+
+        self.assertEqual(result, "{}")
+        self.assertTrue(seen["thread"].startswith("few-shot"))
+        self.assertEqual(seen["config"], 2)
+        self.assertEqual(seen["request_id"], "req-1")
+        self.assertEqual(self.service._orchestration_executor()._max_workers, 2)
+
+    @patch("app.services.async_llm_service.AsyncOpenAI")
+    def test_gpt5_zero_shot_stream_is_closed_after_first_object(
+        self, mock_async_openai
+    ):
+        client_pool.clear()
+        self.addCleanup(client_pool.clear)
+        self.flask_app.config["JSON_EARLY_ABORT_ENABLED"] = True
+        stream = _AsyncStream(['{"events": []', "}\n\nLet me explain", " more..."])
+        create = AsyncMock(return_value=stream)
+        mock_async_openai.return_value.chat.completions.create = create
+
+        async def run():
+            with self.flask_app.app_context():
+                return await self.service.call_openai(
+                    "key", "system", "text", "zero_shot", model="gpt-5-mini"
+                )
+
+        self.assertEqual(asyncio.run(run()), '{"events": []}')
+        self.assertTrue(create.call_args.kwargs["stream"])
+        self.assertTrue(stream.closed)
+        self.assertEqual(len(stream.chunks), 1)
+
+    @patch.object(AsyncLLMService, "_run_few_shot_orchestration")
+    @patch.object(AsyncLLMService, "_gemini_generate_once_async")
+    @patch.object(AsyncLLMService, "_gemini_step_router")
+    @patch.object(AsyncLLMService, "_gemini_client_manager")
+    @patch("app.services.async_llm_service.gemini_sdk")
+    @patch("app.services.async_llm_service.genai")
+    def test_gemini_steps_use_the_cache_aware_router(
+        self, _genai, _sdk, _manager, router, generate_once_async, orchestration
+    ):
+        cached_model = MagicMock()
+        router.return_value = lambda prompt: (cached_model, prompt[8:])
+        sent = []
+
+        async def generate_step(gen_model, prompt, *args):
+            sent.append((gen_model, prompt))
+            return "{}"
+
+        generate_once_async.side_effect = generate_step
+        orchestration.side_effect = lambda user_text, generate_once, **kwargs: (
+            generate_once("shared\n\nstep")
+        )
+
+        async def run():
+            with self.flask_app.app_context():
+                return await self.service.call_gemini(
+                    "key", "system", "text", "few_shot", model="gemini-2.5-pro"
+                )
+
+        asyncio.run(run())
+
+        self.assertEqual(sent, [(cached_model, "step")])
+        self.assertTrue(router.call_args.kwargs["asynchronous"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
+import threading
 import unittest
+from unittest.mock import MagicMock, patch
 
-from app.services.async_jobs import AsyncJobStore
+from app.services.async_jobs import AsyncJobStore, _InMemoryRedis
 
 
 class TestAsyncJobStore(unittest.TestCase):
@@ -50,6 +52,131 @@ class TestAsyncJobStore(unittest.TestCase):
         ok = store.update_status("does-not-exist", "failed", error={"code": "x"})
         self.assertFalse(ok)
 
+    def test_update_status_with_expected_status_is_compare_and_set(self):
+        store = AsyncJobStore(
+            redis_url="redis://127.0.0.1:6379/0",
+            ttl_seconds=60,
+            use_mock=True,
+        )
+
+        job_id = store.create()
+        self.assertFalse(
+            store.update_status(job_id, "succeeded", expected_status="running")
+        )
+        self.assertEqual(store.get(job_id)["status"], "queued")
+
+        self.assertTrue(
+            store.update_status(job_id, "running", expected_status="queued")
+        )
+        self.assertFalse(
+            store.update_status(job_id, "running", expected_status="queued")
+        )
+        self.assertTrue(
+            store.update_status(
+                job_id,
+                "failed",
+                error={"code": "x"},
+                expected_status=("queued", "running"),
+            )
+        )
+        payload = store.get(job_id)
+        self.assertEqual(payload["status"], "failed")
+        self.assertEqual(payload["error"], {"code": "x"})
+        self.assertIsNone(payload["result"])
+
+    def test_in_memory_fallback_supports_job_hashes(self):
+        with patch.object(
+            AsyncJobStore, "_build_client", return_value=_InMemoryRedis()
+        ):
+            store = AsyncJobStore(redis_url="redis://unused", use_mock=True)
+
+        job_id = store.create()
+        self.assertTrue(
+            store.update_status(job_id, "running", expected_status="queued")
+        )
+        self.assertEqual(store.get(job_id)["status"], "running")
+
+    def test_real_redis_update_is_single_script_call(self):
+        client = MagicMock()
+        script = client.register_script.return_value
+        script.return_value = 1
+        with patch.object(AsyncJobStore, "_build_client", return_value=client):
+            store = AsyncJobStore(redis_url="redis://unused", ttl_seconds=60)
+
+        with patch("app.services.async_jobs.time.time", return_value=5.0):
+            ok = store.update_status(
+                "job-1",
+                "succeeded",
+                result={"raw_response": "RAW"},
+                expected_status="running",
+            )
+
+        self.assertTrue(ok)
+        script.assert_called_once_with(
+            keys=["llm_async_job:job-1", "llm_async_job:events:job-1"],
+            args=[
+                60,
+                1,
+                "running",
+                "status",
+                "succeeded",
+                "updated_at",
+                "5.0",
+                "result",
+                '{"raw_response": "RAW"}',
+            ],
+        )
+        client.get.assert_not_called()
+        client.hgetall.assert_not_called()
+
+    def test_wait_for_change_returns_when_status_changes(self):
+        store = AsyncJobStore(
+            redis_url="redis://127.0.0.1:6379/0",
+            ttl_seconds=60,
+            use_mock=True,
+        )
+        job_id = store.create()
+        timer = threading.Timer(0.1, store.update_status, args=(job_id, "running"))
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        payload = store.wait_for_change(job_id, "queued", timeout=5)
+
+        self.assertEqual(payload["status"], "running")
+
+    def test_wait_for_change_times_out_with_unchanged_payload(self):
+        with patch.object(
+            AsyncJobStore, "_build_client", return_value=_InMemoryRedis()
+        ):
+            store = AsyncJobStore(redis_url="redis://unused", use_mock=True)
+        job_id = store.create()
+
+        payload = store.wait_for_change(
+            job_id, "queued", timeout=0.1, poll_interval=0.02
+        )
+
+        self.assertEqual(payload["status"], "queued")
+        self.assertIsNone(store.wait_for_change("does-not-exist", "queued", timeout=1))
+
+    def test_create_batch_groups_jobs_in_item_order(self):
+        store = AsyncJobStore(
+            redis_url="redis://127.0.0.1:6379/0",
+            ttl_seconds=60,
+            use_mock=True,
+        )
+
+        batch_id, job_ids = store.create_batch(3)
+        store.update_status(job_ids[1], "running")
+
+        batch = store.get_batch(batch_id)
+        self.assertEqual(batch["total"], 3)
+        self.assertEqual(batch["job_ids"], job_ids)
+        self.assertEqual(store.get_statuses(job_ids), ["queued", "running", "queued"])
+        self.assertEqual(
+            [payload["job_id"] for payload in store.get_many(job_ids)], job_ids
+        )
+        self.assertIsNone(store.get_batch("does-not-exist"))
+
     def test_mock_backend_is_shared_across_instances(self):
         first = AsyncJobStore(
             redis_url="redis://127.0.0.1:6379/9",
@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services.client_pool import ProviderClientPool, api_key_fingerprint
+
+
+class TestProviderClientPool(unittest.TestCase):
+    def test_reuses_client_for_same_provider_key_and_host(self):
+        pool = ProviderClientPool(max_size=4, ttl_seconds=60)
+        factory = MagicMock(side_effect=lambda: object())
+
+        first = pool.get("openai", "key-a", None, factory)
+        second = pool.get("openai", "key-a", None, factory)
+
+        self.assertIs(first, second)
+        self.assertEqual(factory.call_count, 1)
+
+    def test_separates_clients_by_key_and_host(self):
+        pool = ProviderClientPool(max_size=4, ttl_seconds=60)
+        factory = MagicMock(side_effect=lambda: object())
+
+        base = pool.get("openai", "key-a", None, factory)
+        other_key = pool.get("openai", "key-b", None, factory)
+        other_host = pool.get("openai", "key-a", "https://proxy.local/v1", factory)
+
+        self.assertIsNot(base, other_key)
+        self.assertIsNot(base, other_host)
+        self.assertEqual(factory.call_count, 3)
+
+    def test_evicts_least_recently_used_client(self):
+        pool = ProviderClientPool(max_size=2, ttl_seconds=60)
+        factory = MagicMock(side_effect=lambda: object())
+
+        first = pool.get("openai", "key-a", None, factory)
+        pool.get("openai", "key-b", None, factory)
+        pool.get("openai", "key-a", None, factory)  # key-a is now most recent
+        pool.get("openai", "key-c", None, factory)  # evicts key-b
+
+        self.assertEqual(len(pool), 2)
+        self.assertIs(pool.get("openai", "key-a", None, factory), first)
+        pool.get("openai", "key-b", None, factory)
+        self.assertEqual(factory.call_count, 4)
+
+    def test_resize_retires_clients_beyond_new_size(self):
+        pool = ProviderClientPool(max_size=4, ttl_seconds=60)
+        factory = MagicMock(side_effect=lambda: object())
+        for key in ("key-a", "key-b", "key-c"):
+            pool.get("openai", key, None, factory)
+
+        pool.resize(max_size=1, ttl_seconds=60)
+
+        self.assertEqual(len(pool), 1)
+        pool.get("openai", "key-c", None, factory)
+        self.assertEqual(factory.call_count, 3)
+
+    @patch("app.services.client_pool.time.monotonic")
+    def test_expired_client_is_rebuilt(self, mock_monotonic):
+        pool = ProviderClientPool(max_size=4, ttl_seconds=10)
+        factory = MagicMock(side_effect=lambda: object())
+
+        mock_monotonic.return_value = 100.0
+        first = pool.get("gemini", "key-a", None, factory)
+        mock_monotonic.return_value = 111.0
+        second = pool.get("gemini", "key-a", None, factory)
+
+        self.assertIsNot(first, second)
+        self.assertEqual(factory.call_count, 2)
+
+    @patch("app.services.client_pool.time.monotonic")
+    def test_evicted_clients_are_closed_after_grace_period(self, mock_monotonic):
+        pool = ProviderClientPool(max_size=1, ttl_seconds=60, close_grace_seconds=5)
+        close = MagicMock()
+        factory = MagicMock(side_effect=lambda: MagicMock())
+
+        mock_monotonic.return_value = 100.0
+        first = pool.get("openai", "key-a", None, factory, close)
+        pool.get("openai", "key-b", None, factory, close)  # evicts key-a
+        close.assert_not_called()
+
+        mock_monotonic.return_value = 106.0
+        pool.get("openai", "key-b", None, factory, close)
+
+        close.assert_called_once_with(first)
+
+    def test_clear_closes_pooled_clients(self):
+        pool = ProviderClientPool(max_size=4, ttl_seconds=60)
+        client = pool.get("openai", "key-a", None, MagicMock)
+
+        pool.clear()
+
+        client.close.assert_called_once_with()
+        self.assertEqual(len(pool), 0)
+
+    def test_fingerprint_does_not_expose_key(self):
+        fingerprint = api_key_fingerprint("sk-very-secret")
+        self.assertNotIn("secret", fingerprint)
+        self.assertEqual(fingerprint, api_key_fingerprint("sk-very-secret"))
+
+
+if __name__ == "__main__":
+    unittest.main()
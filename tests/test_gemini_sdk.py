@@ -0,0 +1,58 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services import client_pool, gemini_sdk
+
+
+class TestGeminiSdkAdapter(unittest.TestCase):
+    def setUp(self):
+        client_pool.clear()
+        self.addCleanup(client_pool.clear)
+
+    @patch("app.services.gemini_sdk.genai_client")
+    @patch("app.services.gemini_sdk.genai")
+    def test_client_manager_is_pooled_per_key(self, mock_genai, mock_client):
+        mock_genai.__version__ = "0.8.5"
+        mock_client._ClientManager.side_effect = lambda: MagicMock()
+
+        first = gemini_sdk.client_manager("key-a", "https://gemini.local")
+        again = gemini_sdk.client_manager("key-a", "https://gemini.local")
+
+        self.assertIs(first, again)
+        first.configure.assert_called_once_with(
+            api_key="key-a", client_options={"api_endpoint": "https://gemini.local"}
+        )
+
+    @patch("app.services.gemini_sdk.genai_client")
+    @patch("app.services.gemini_sdk.genai")
+    def test_unsupported_sdk_version_is_rejected(self, mock_genai, mock_client):
+        mock_genai.__version__ = "0.9.0"
+
+        with self.assertRaises(gemini_sdk.UnsupportedSdkError):
+            gemini_sdk.client_manager("key-a")
+        mock_client._ClientManager.assert_not_called()
+
+    def test_installed_sdk_builds_a_real_client_manager(self):
+        manager = gemini_sdk.client_manager("key-a")
+
+        self.assertIsNotNone(manager.get_default_client("generative"))
+
+    def test_close_closes_every_client_transport(self):
+        manager = MagicMock()
+        manager.clients = {"generative": MagicMock(), "model": MagicMock()}
+
+        gemini_sdk.close_client_manager(manager)
+
+        for client in manager.clients.values():
+            client.transport.close.assert_called_once_with()
+
+    def test_cancel_stream_cancels_the_transport_call(self):
+        response = MagicMock()
+
+        gemini_sdk.cancel_stream(response)
+
+        response._iterator.cancel.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,278 @@
+import json
+import threading
+import unittest
+import uuid
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.services.async_jobs import AsyncJobStore
+from app.services.job_queue import JobQueue, JobWorkerPool
+from config import TestingConfig
+
+
+class TestJobWorkerPool(unittest.TestCase):
+    def setUp(self):
+        self.store = AsyncJobStore(
+            redis_url="redis://127.0.0.1:6379/0",
+            ttl_seconds=60,
+            use_mock=True,
+        )
+        # Unique key prefix: mock backends are shared per redis_url.
+        self.queue = JobQueue(
+            self.store.client,
+            key_prefix=f"test_jobs:{uuid.uuid4().hex}",
+            max_depth=2,
+            use_mock=True,
+        )
+        self.calls = []
+        self.done = threading.Event()
+
+    def _handler(self, app, job_id, api_key, data, use_cached):
+        self.calls.append((job_id, api_key, data, use_cached))
+        self.store.update_status(job_id, "succeeded", result={"raw_response": "RAW"})
+        self.done.set()
+
+    def _pool(self, **kwargs):
+        kwargs.setdefault("poll_seconds", 0.05)
+        return JobWorkerPool(None, self.store, self.queue, self._handler, **kwargs)
+
+    def test_submitted_job_runs_on_pool_and_is_acked(self):
+        pool = self._pool(threads=2)
+        pool.start()
+        self.addCleanup(pool.stop)
+        job_id = self.store.create()
+
+        data = {"user_text": "x", "provider": "openai"}
+        pool.submit(job_id, "secret-token", data, use_cached=False)
+
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.calls, [(job_id, "secret-token", data, False)])
+        self.assertEqual(self.store.get(job_id)["status"], "succeeded")
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertEqual(self.queue.orphaned_entries(pool.worker_id), [])
+        self.assertIsNone(self.queue.credential(job_id))
+
+    def test_queue_entries_do_not_contain_the_api_key(self):
+        pool = self._pool()  # not started: the entry stays queued
+        pool.submit("job-1", "secret-token", {"provider": "openai"})
+
+        raw_entry = self.store.client.lrange(self.queue.pending_key("openai"), 0, -1)
+        self.assertNotIn("secret-token", raw_entry[0])
+        self.assertEqual(self.queue.credential("job-1"), "secret-token")
+
+    def test_job_whose_credential_expired_fails_without_running(self):
+        pool = self._pool()
+        job_id = self.store.create()
+        pool.submit(job_id, "secret-token", {"provider": "openai"})
+        self.queue.forget_credential(job_id)
+        raw_entry = self.queue.claim(pool.worker_id, "openai")
+
+        pool._run(raw_entry)
+
+        self.assertEqual(self.calls, [])
+        payload = self.store.get(job_id)
+        self.assertEqual(payload["status"], "failed")
+        self.assertEqual(payload["error"]["code"], "credential_expired")
+        self.assertEqual(self.queue.orphaned_entries(pool.worker_id), [])
+
+    def test_stop_unregisters_the_worker(self):
+        pool = self._pool()
+        pool.start()
+        pool.stop()
+
+        client = self.store.client
+        self.assertNotIn(pool.worker_id, client.smembers(self.queue.workers_key))
+        self.assertIsNone(client.get(self.queue.heartbeat_key(pool.worker_id)))
+
+    def test_queue_reports_full_at_max_depth(self):
+        pool = self._pool()  # not started: nothing consumes the queue
+        pool.submit("job-1", "key", {"provider": "openai"})
+        self.assertFalse(pool.is_full())
+        self.assertFalse(pool.has_capacity(2))
+        pool.submit("job-2", "key", {"provider": "gemini"})
+        self.assertTrue(pool.is_full())
+
+    def test_submit_beyond_max_depth_queues_nothing(self):
+        pool = self._pool()
+        pool.submit("job-1", "key", {"provider": "openai"})
+
+        queued = pool.submit_many(
+            [
+                ("job-2", "key", {"provider": "openai"}, True),
+                ("job-3", "key", {"provider": "gemini"}, True),
+            ]
+        )
+
+        self.assertFalse(queued)
+        self.assertEqual(self.queue.depth(), 1)
+        self.assertIsNone(self.queue.credential("job-2"))
+
+    def test_concurrent_submitters_do_not_overshoot_max_depth(self):
+        pool = self._pool()
+        results = []
+        start = threading.Barrier(8)
+
+        def submit(index):
+            start.wait()
+            results.append(pool.submit(f"job-{index}", "key", {"provider": "openai"}))
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        self.assertEqual(results.count(True), 2)
+        self.assertEqual(self.queue.depth(), 2)
+
+    def test_redis_enqueue_is_single_script_call(self):
+        client = MagicMock()
+        script = client.register_script.return_value
+        script.return_value = 0
+        queue = JobQueue(
+            client, key_prefix="jobs", max_depth=5, credential_ttl_seconds=60
+        )
+        entry = {"job_id": "job-1", "data": {"provider": "openai"}}
+
+        self.assertFalse(queue.try_enqueue_many([entry], {"job-1": "key"}))
+
+        script.assert_called_once_with(
+            keys=["jobs:queues"],
+            args=[
+                5,
+                60,
+                "jobs:queue:",
+                "jobs:credential:",
+                1,
+                "job-1",
+                "key",
+                "openai",
+                json.dumps(entry),
+            ],
+        )
+        client.pipeline.assert_not_called()
+
+    def test_provider_limit_caps_concurrent_jobs_per_provider(self):
+        lock = threading.Lock()
+        running = {"openai": 0, "gemini": 0}
+        peak = {"openai": 0, "gemini": 0}
+        finished = []
+        all_done = threading.Event()
+
+        def handler(app, job_id, api_key, data, use_cached):
+            provider = data["provider"]
+            with lock:
+                running[provider] += 1
+                peak[provider] = max(peak[provider], running[provider])
+            threading.Event().wait(0.05)
+            with lock:
+                running[provider] -= 1
+                finished.append(job_id)
+                if len(finished) == 6:
+                    all_done.set()
+
+        pool = JobWorkerPool(
+            None,
+            self.store,
+            JobQueue(
+                self.store.client,
+                key_prefix=f"test_jobs:{uuid.uuid4().hex}",
+                use_mock=True,
+            ),
+            handler,
+            threads=4,
+            poll_seconds=0.02,
+            provider_limits={"openai": 1},
+        )
+        pool.submit_many(
+            [(f"openai-{i}", "key", {"provider": "openai"}, True) for i in range(3)]
+            + [(f"gemini-{i}", "key", {"provider": "gemini"}, True) for i in range(3)]
+        )
+        pool.start()
+        self.addCleanup(pool.stop)
+
+        self.assertTrue(all_done.wait(5))
+        self.assertEqual(peak["openai"], 1)
+        self.assertGreater(peak["gemini"], 1)
+
+    def _orphan(self, job_id, attempts=0):
+        dead_worker = "dead-host:1:deadbeef"
+        self.queue.register(dead_worker, ttl_seconds=60)
+        self.store.client.delete(self.queue.heartbeat_key(dead_worker))
+        self.store.update_status(job_id, "running")
+        entry = {
+            "job_id": job_id,
+            "data": {"provider": "openai"},
+            "use_cached": True,
+            "attempts": attempts,
+        }
+        self.store.client.setex(self.queue.credential_key(job_id), 60, "key")
+        self.store.client.lpush(
+            self.queue.processing_key(dead_worker), json.dumps(entry)
+        )
+        return dead_worker
+
+    def test_recover_orphans_requeues_jobs_of_dead_worker(self):
+        job_id = self.store.create()
+        dead_worker = self._orphan(job_id)
+        pool = self._pool(max_attempts=2)
+
+        self.assertEqual(pool.recover_orphans(), 1)
+
+        self.assertEqual(self.store.get(job_id)["status"], "queued")
+        self.assertEqual(self.queue.depth(), 1)
+        self.assertEqual(self.queue.orphaned_entries(dead_worker), [])
+        self.assertNotIn(dead_worker, self.queue.dead_workers())
+        requeued = json.loads(self.queue.claim(pool.worker_id, "openai"))
+        self.assertEqual(requeued["attempts"], 1)
+
+    def test_recover_orphans_fails_job_after_max_attempts(self):
+        job_id = self.store.create()
+        self._orphan(job_id, attempts=1)
+        pool = self._pool(max_attempts=2)
+
+        pool.recover_orphans()
+
+        payload = self.store.get(job_id)
+        self.assertEqual(payload["status"], "failed")
+        self.assertEqual(payload["error"]["code"], "worker_lost")
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertIsNone(self.queue.credential(job_id))
+
+    def test_inline_api_key_in_entry_is_not_used(self):
+        pool = self._pool()
+        job_id = self.store.create()
+        entry = {"job_id": job_id, "api_key": "key", "data": {"provider": "openai"}}
+
+        pool._run(json.dumps(entry))
+
+        self.assertEqual(self.calls, [])
+        self.assertEqual(self.store.get(job_id)["error"]["code"], "credential_expired")
+
+
+class TestJobWorkerStartup(unittest.TestCase):
+    @patch("app.model_registry.refresh_model_cache")
+    def test_create_app_starts_and_stops_the_worker_pool(self, mock_refresh):
+        class AutostartConfig(TestingConfig):
+            ASYNC_JOB_WORKERS_AUTOSTART = True
+
+        with patch("app.atexit.register") as register:
+            app = create_app(AutostartConfig)
+        pool = app.extensions["async_job_workers"]
+        self.assertTrue(pool._workers)
+
+        stop, stopped_app = register.call_args.args
+        stop(stopped_app)
+
+        self.assertNotIn("async_job_workers", app.extensions)
+        self.assertEqual(pool._workers, [])
+
+    @patch("app.model_registry.refresh_model_cache")
+    def test_testing_config_does_not_start_workers(self, mock_refresh):
+        app = create_app(TestingConfig)
+
+        self.assertNotIn("async_job_workers", app.extensions)
+
+
+if __name__ == "__main__":
+    unittest.main()
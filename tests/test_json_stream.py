@@ -0,0 +1,56 @@
+import json
+import unittest
+
+from app.utils.json_stream import JsonObjectScanner, extract_first_object
+
+_MODEL = {
+    "events": [{"id": "startEvent1", "type": "startEvent", "name": "start {x}"}],
+    "tasks": [{"id": "task1", "type": "userTask", "name": 'say "hi" \\ bye'}],
+    "flows": [],
+}
+
+
+class TestJsonStream(unittest.TestCase):
+    def test_extracts_object_from_fenced_output(self):
+        text = f"```json\n{json.dumps(_MODEL)}\n```"
+        self.assertEqual(extract_first_object(text), _MODEL)
+
+    def test_ignores_trailing_braces_in_prose(self):
+        text = f"Here you go: {json.dumps(_MODEL)} Let me know if {{anything}} changes."
+        self.assertEqual(extract_first_object(text), _MODEL)
+
+    def test_skips_balanced_non_json_candidates(self):
+        text = f"Use {{placeholder}} as a name. {json.dumps(_MODEL)}"
+        self.assertEqual(extract_first_object(text), _MODEL)
+
+    def test_braces_and_escapes_inside_strings_do_not_change_depth(self):
+        payload = {"name": 'a } b { c \\" d', "nested": {"k": "}"}}
+        self.assertEqual(extract_first_object(json.dumps(payload)), payload)
+
+    def test_missing_or_incomplete_object_raises(self):
+        for text in ("", None, "no json here", '{"events": ['):
+            with self.assertRaises(ValueError):
+                extract_first_object(text)
+
+    def test_scanner_completes_as_soon_as_object_closes(self):
+        encoded = json.dumps(_MODEL)
+        text = "prefix " + encoded + " trailing prose {"
+        scanner = JsonObjectScanner()
+        completed_at = None
+        for index, char in enumerate(text):
+            if scanner.feed(char) is not None and completed_at is None:
+                completed_at = index
+        self.assertTrue(scanner.done)
+        self.assertEqual(scanner.result, _MODEL)
+        self.assertEqual(completed_at, len("prefix ") + len(encoded) - 1)
+        self.assertEqual(scanner.end, completed_at + 1)
+
+    def test_escape_split_across_chunks(self):
+        scanner = JsonObjectScanner()
+        self.assertIsNone(scanner.feed('{"a": "x\\'))
+        self.assertIsNone(scanner.feed('"}'))
+        self.assertEqual(scanner.feed('"}'), {"a": 'x"}'})
+
+
+if __name__ == "__main__":
+    unittest.main()
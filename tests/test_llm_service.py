@@ -0,0 +1,516 @@
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import prometheus_client
+
+from app import create_app
+from app.services import (
+    client_pool,
+    gemini_context_cache,
+    response_cache,
+    step_schemas,
+)
+from app.services.llm_service import LLMService
+from config import TestingConfig
+
+_LINEAR_MODEL = {
+    "events": [
+        {"id": "startEvent1", "type": "startEvent", "name": "start"},
+        {"id": "endEvent1", "type": "endEvent", "name": "end"},
+    ],
+    "tasks": [{"id": "task1", "type": "userTask", "name": "inspect bike"}],
+    "gateways": [],
+    "flows": [
+        {
+            "id": "flow1",
+            "type": "sequenceFlow",
+            "source": "startEvent1",
+            "target": "task1",
+        },
+        {
+            "id": "flow2",
+            "type": "sequenceFlow",
+            "source": "task1",
+            "target": "endEvent1",
+        },
+    ],
+}
+
+# Few-shot step responses keyed by a marker from each step prompt, so answers
+# do not depend on the order in which concurrent steps reach the provider.
+_STEP_RESPONSES = {
+    "preparing context": {"process_context": "A mechanic inspects a bike."},
+    "Detect the single start event": {"events": [_LINEAR_MODEL["events"][0]]},
+    "Detect tasks": {"tasks": _LINEAR_MODEL["tasks"]},
+    "Detect gateways": {"gateways": []},
+    "Detect the single end event": {"events": [_LINEAR_MODEL["events"][1]]},
+    "Detect sequence flows": {"flows": _LINEAR_MODEL["flows"]},
+    "Merge partial outputs": _LINEAR_MODEL,
+}
+
+
+def _step_of(prompt):
+    for marker in _STEP_RESPONSES:
+        if marker in prompt:
+            return marker
+    raise AssertionError(f"Unexpected few-shot prompt: {prompt[:80]!r}")
+
+
+class TestFewShotOrchestration(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.service = LLMService()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_independent_steps_run_concurrently(self):
+        # All four independent steps must be in flight at the same time for
+        # the barrier to release; a sequential run would time out here.
+        barrier = threading.Barrier(4, timeout=5)
+        independent = {
+            "Detect the single start event",
+            "Detect tasks",
+            "Detect gateways",
+            "Detect the single end event",
+        }
+
+        def generate_once(prompt):
+            step = _step_of(prompt)
+            if step in independent:
+                barrier.wait()
+            return json.dumps(_STEP_RESPONSES[step])
+
+        result = json.loads(
+            self.service._run_few_shot_orchestration("inspect bike", generate_once)
+        )
+
+        self.assertEqual(result["flows"], _LINEAR_MODEL["flows"])
+        self.assertEqual(
+            {event["id"] for event in result["events"]},
+            {"startEvent1", "endEvent1"},
+        )
+
+    def test_concurrency_cap_of_one_runs_steps_sequentially(self):
+        self.app.config["FEW_SHOT_MAX_CONCURRENCY"] = 1
+        callers = set()
+
+        def generate_once(prompt):
+            callers.add(threading.get_ident())
+            return json.dumps(_STEP_RESPONSES[_step_of(prompt)])
+
+        self.service._run_few_shot_orchestration("inspect bike", generate_once)
+        self.assertEqual(callers, {threading.get_ident()})
+
+    def test_concurrent_step_retries_then_falls_back(self):
+        retries_before = (
+            prometheus_client.REGISTRY.get_sample_value(
+                "llm_json_retry_total",
+                {"provider": "openai", "step": "end_event"},
+            )
+            or 0.0
+        )
+        prompts = []
+        lock = threading.Lock()
+
+        def generate_once(prompt):
+            step = _step_of(prompt)
+            with lock:
+                prompts.append((step, prompt))
+            if step == "Detect the single end event":
+                return "I cannot comply with that format."
+            return json.dumps(_STEP_RESPONSES[step])
+
+        result = json.loads(
+            self.service._run_few_shot_orchestration(
+                "inspect bike", generate_once, cache_scope=("openai", "gpt-4o", "")
+            )
+        )
+
+        end_prompts = [
+            p for step, p in prompts if step == "Detect the single end event"
+        ]
+        self.assertEqual(len(end_prompts), 2)
+        self.assertIn("Respond again with exactly one JSON object", end_prompts[1])
+        self.assertIn(
+            {"id": "endEvent1", "type": "endEvent", "name": "end"}, result["events"]
+        )
+        self.assertEqual(
+            prometheus_client.REGISTRY.get_sample_value(
+                "llm_json_retry_total",
+                {"provider": "openai", "step": "end_event"},
+            )
+            - retries_before,
+            1,
+        )
+
+    def test_off_schema_step_is_retried_before_merge(self):
+        calls = []
+        lock = threading.Lock()
+
+        def generate_once(prompt):
+            step = _step_of(prompt)
+            with lock:
+                calls.append(step)
+            if step == "Detect tasks" and calls.count(step) == 1:
+                return json.dumps({"tasks": [{"id": "task1"}]})
+            return json.dumps(_STEP_RESPONSES[step])
+
+        result = json.loads(
+            self.service._run_few_shot_orchestration("inspect bike", generate_once)
+        )
+
+        self.assertEqual(calls.count("Detect tasks"), 2)
+        self.assertEqual(result["tasks"], _LINEAR_MODEL["tasks"])
+
+    def test_step_cache_resumes_from_first_uncached_step(self):
+        step_cache = response_cache.step_cache_from_config(
+            {"FEW_SHOT_STEP_CACHE_ENABLED": True}
+        )
+        calls = []
+        lock = threading.Lock()
+        fail_flows = [True]
+
+        def generate_once(prompt):
+            step = _step_of(prompt)
+            with lock:
+                calls.append(step)
+            if step == "Detect sequence flows" and fail_flows[0]:
+                raise RuntimeError("upstream connection reset")
+            return json.dumps(_STEP_RESPONSES[step])
+
+        scope = ("openai", "gpt-4o", "system")
+        with self.assertRaises(RuntimeError):
+            self.service._run_few_shot_orchestration(
+                "inspect bike", generate_once, step_cache=step_cache, cache_scope=scope
+            )
+        self.assertEqual(len(calls), 6)
+
+        calls.clear()
+        fail_flows[0] = False
+        result = json.loads(
+            self.service._run_few_shot_orchestration(
+                "inspect bike", generate_once, step_cache=step_cache, cache_scope=scope
+            )
+        )
+
+        self.assertEqual(calls, ["Detect sequence flows", "Merge partial outputs"])
+        self.assertEqual(result["flows"], _LINEAR_MODEL["flows"])
+
+    def test_local_repair_skips_llm_repair_call(self):
+        duplicate_end = dict(
+            _LINEAR_MODEL,
+            events=_LINEAR_MODEL["events"]
+            + [{"id": "endEvent2", "type": "endEvent", "name": "done"}],
+            flows=[
+                _LINEAR_MODEL["flows"][0],
+                dict(_LINEAR_MODEL["flows"][1], target="endEvent2"),
+            ],
+        )
+        responses = dict(_STEP_RESPONSES, **{"Merge partial outputs": duplicate_end})
+        prompts = []
+
+        def generate_once(prompt):
+            prompts.append(prompt)
+            if "You are repairing a BPMN JSON model" in prompt:
+                raise AssertionError("LLM repair should not be needed")
+            return json.dumps(responses[_step_of(prompt)])
+
+        result = json.loads(
+            self.service._run_few_shot_orchestration("inspect bike", generate_once)
+        )
+
+        self.assertEqual(len(prompts), 7)
+        self.assertEqual(
+            [(f["source"], f["target"]) for f in result["flows"]],
+            [("startEvent1", "task1"), ("task1", "endEvent1")],
+        )
+
+    def test_repair_prompt_names_detected_loops(self):
+        prompt = self.service._build_repair_prompt(
+            "inspect bike",
+            _LINEAR_MODEL,
+            ["Loop language found in text but no split gateway encodes loop cues."],
+            loops=[["task1", "gateway1", "task2"]],
+        )
+
+        self.assertIn(
+            "Loops in the current model (node IDs per loop):\n- task1, gateway1, task2",
+            prompt,
+        )
+
+
+def _openai_chunk(text):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=text))]
+    )
+
+
+class TestJsonEarlyAbort(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.app.config["JSON_EARLY_ABORT_ENABLED"] = True
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.service = LLMService()
+        client_pool.clear()
+
+    def tearDown(self):
+        client_pool.clear()
+        self.app_context.pop()
+
+    def test_stream_is_closed_once_first_object_is_complete(self):
+        pulled = []
+
+        def chunks():
+            for text in ['Here: {"a": {"b', '": 1}}', " That is all", " folks."]:
+                pulled.append(text)
+                yield text
+
+        text, aborted = self.service._read_until_json_object("openai", chunks())
+
+        self.assertTrue(aborted)
+        self.assertEqual(text, 'Here: {"a": {"b": 1}}')
+        self.assertEqual(len(pulled), 2)
+
+    def test_stream_without_object_is_read_to_the_end(self):
+        text, aborted = self.service._read_until_json_object(
+            "gemini", (text for text in ["no ", "json {here}"])
+        )
+
+        self.assertFalse(aborted)
+        self.assertEqual(text, "no json {here}")
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_gpt5_zero_shot_closes_upstream_stream(self, mock_openai):
+        stream = MagicMock()
+        stream.__iter__.return_value = iter(
+            [
+                _openai_chunk('{"events": []'),
+                _openai_chunk("}\n\nLet me explain the model"),
+                _openai_chunk(" in detail..."),
+            ]
+        )
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value = stream
+
+        content = self.service.call_openai(
+            "key", "system", "inspect bike", "zero_shot", model="gpt-5-mini"
+        )
+
+        self.assertEqual(content, '{"events": []}')
+        self.assertTrue(create.call_args.kwargs["stream"])
+        stream.close.assert_called_once()
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_disabled_flag_keeps_non_streamed_call(self, mock_openai):
+        self.app.config["JSON_EARLY_ABORT_ENABLED"] = False
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value = SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content='{"events": []} trailing'),
+                    finish_reason="stop",
+                )
+            ]
+        )
+
+        content = self.service.call_openai(
+            "key", "system", "inspect bike", "zero_shot", model="gpt-5-mini"
+        )
+
+        self.assertEqual(content, '{"events": []} trailing')
+        self.assertNotIn("stream", create.call_args.kwargs)
+
+
+class TestJsonMode(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.service = LLMService()
+        client_pool.clear()
+
+    def tearDown(self):
+        client_pool.clear()
+        self.app_context.pop()
+
+    @staticmethod
+    def _answer_steps(create):
+        def answer(**kwargs):
+            prompt = kwargs["messages"][1]["content"]
+            return SimpleNamespace(
+                choices=[
+                    SimpleNamespace(
+                        message=SimpleNamespace(
+                            content=json.dumps(_STEP_RESPONSES[_step_of(prompt)])
+                        ),
+                        finish_reason="stop",
+                    )
+                ]
+            )
+
+        create.side_effect = answer
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_few_shot_steps_request_json_object_when_supported(self, mock_openai):
+        create = mock_openai.return_value.chat.completions.create
+        self._answer_steps(create)
+
+        self.service.call_openai(
+            "key", "system", "inspect bike", "few_shot", model="gpt-4-turbo"
+        )
+
+        self.assertGreaterEqual(create.call_count, 7)
+        for call in create.call_args_list:
+            self.assertEqual(call.kwargs["response_format"], {"type": "json_object"})
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_few_shot_steps_send_their_schema_when_supported(self, mock_openai):
+        create = mock_openai.return_value.chat.completions.create
+        self._answer_steps(create)
+
+        self.service.call_openai("key", "system", "inspect bike", "few_shot")
+
+        schemas = {
+            _step_of(call.kwargs["messages"][1]["content"]): call.kwargs[
+                "response_format"
+            ]["json_schema"]["schema"]
+            for call in create.call_args_list
+        }
+        self.assertEqual(schemas["Detect tasks"], step_schemas.response_schema("tasks"))
+        self.assertEqual(schemas["Merge partial outputs"], step_schemas.MODEL_SCHEMA)
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_few_shot_does_not_build_the_unused_whole_prompt(self, mock_openai):
+        self._answer_steps(mock_openai.return_value.chat.completions.create)
+
+        with patch.object(self.service.prompt_builder, "build_prompt") as build:
+            self.service.call_openai("key", "system", "inspect bike", "few_shot")
+
+        build.assert_not_called()
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_unlisted_model_relies_on_prompt_only(self, mock_openai):
+        create = mock_openai.return_value.chat.completions.create
+        self._answer_steps(create)
+
+        self.service.call_openai(
+            "key", "system", "inspect bike", "few_shot", model="local-llama"
+        )
+
+        for call in create.call_args_list:
+            self.assertNotIn("response_format", call.kwargs)
+
+    @patch("app.services.llm_service.genai")
+    def test_gemini_json_mode_sets_response_mime_type(self, mock_genai):
+        LLMService._gemini_generation_config("gemini-2.5-pro", json_mode=True)
+        LLMService._gemini_generation_config("gemini-2.5-pro")
+
+        json_call, plain_call = mock_genai.types.GenerationConfig.call_args_list
+        self.assertEqual(json_call.kwargs["response_mime_type"], "application/json")
+        self.assertNotIn("response_mime_type", plain_call.kwargs)
+
+
+class TestPromptCaching(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestingConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.service = LLMService()
+        client_pool.clear()
+        gemini_context_cache.clear()
+
+    def tearDown(self):
+        gemini_context_cache.clear()
+        client_pool.clear()
+        self.app_context.pop()
+
+    @staticmethod
+    def _cached_tokens(provider):
+        return (
+            prometheus_client.REGISTRY.get_sample_value(
+                "llm_cached_prompt_tokens_total", {"provider": provider}
+            )
+            or 0.0
+        )
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_openai_cached_prompt_tokens_are_exported(self, mock_openai):
+        before = self._cached_tokens("openai")
+        mock_openai.return_value.chat.completions.create.return_value = SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content='{"events": []}'),
+                    finish_reason="stop",
+                )
+            ],
+            usage=SimpleNamespace(
+                prompt_tokens=2048,
+                completion_tokens=10,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=1536),
+            ),
+        )
+
+        self.service.call_openai("key", "system", "inspect bike", "zero_shot")
+
+        self.assertEqual(self._cached_tokens("openai") - before, 1536)
+
+    @patch("app.services.gemini_sdk.client_manager")
+    @patch("app.services.gemini_sdk.create_cached_content", return_value="cc/1")
+    @patch("app.services.llm_service.genai")
+    def test_gemini_steps_send_only_text_after_cached_prefix(
+        self, mock_genai, create, _mock_client_manager
+    ):
+        self.app.config["GEMINI_CONTEXT_CACHE_ENABLED"] = True
+        shared = self.service.prompt_builder.few_shot_prompt_pack["00_shared_rules.txt"]
+        models = {}
+
+        def build_model(model_name, system_instruction=None):
+            gen_model = MagicMock()
+            sent = models.setdefault("full" if system_instruction else "cached", [])
+
+            def generate_content(prompt, generation_config=None):
+                sent.append(prompt)
+                return SimpleNamespace(
+                    text=json.dumps(_STEP_RESPONSES[_step_of(prompt)]),
+                    usage_metadata=SimpleNamespace(
+                        prompt_token_count=400, cached_content_token_count=300
+                    ),
+                )
+
+            gen_model.generate_content.side_effect = generate_content
+            return gen_model
+
+        mock_genai.GenerativeModel.side_effect = build_model
+        before = self._cached_tokens("gemini")
+
+        for _ in range(2):
+            self.service.call_gemini(
+                "key", "system", "inspect bike", "few_shot", model="gemini-2.5-pro"
+            )
+
+        create.assert_called_once()
+        self.assertEqual(models["full"], [])
+        self.assertEqual(len(models["cached"]), 14)
+        self.assertTrue(all(not p.startswith(shared) for p in models["cached"]))
+        self.assertEqual(self._cached_tokens("gemini") - before, 14 * 300)
+
+    def test_context_cache_keeps_recently_used_handles_only(self):
+        cache = gemini_context_cache.ContextCache(max_entries=2)
+        create = MagicMock(side_effect=["cc/a", "cc/b", "cc/c", "cc/b2"])
+
+        for prefix in ("a", "b", "a", "c", "a", "b"):
+            cache.get_name("key", "gemini-2.5-pro", "system", prefix, 3600, create)
+
+        self.assertEqual(create.call_count, 4)
+        self.assertEqual(len(cache._entries), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,6 +8,7 @@ from unittest.mock import MagicMock, patch
 # directly with unittest module paths.
 from app import create_app  # noqa: F401
 from config import get_config
+from app.services import client_pool
 from app.services.llm_service import LLMService
 
 
@@ -33,6 +34,7 @@ class TestMockedProcesses(unittest.TestCase):
         cls.process_files = sorted(Path("tests/process_texts").glob("*.txt"))
 
     def setUp(self):
+        client_pool.clear()
         self.service = LLMService()
 
     def _few_shot_step_payloads(self):
@@ -108,7 +110,7 @@ class TestMockedProcesses(unittest.TestCase):
             self.assertIn("tasks", parsed)
             self.assertIn("flows", parsed)
 
-        mock_openai.assert_called_with(api_key=self.openai_api_key)
+        mock_openai.assert_called_with(api_key=self.openai_api_key, max_retries=0)
 
     @patch("app.services.llm_service.OpenAI")
     def test_openai_zero_shot_with_mocked_api(self, mock_openai):
@@ -126,11 +128,14 @@ class TestMockedProcesses(unittest.TestCase):
             )
             self.assertTrue(result)
 
-        mock_openai.assert_called_with(api_key=self.openai_api_key)
+        mock_openai.assert_called_with(api_key=self.openai_api_key, max_retries=0)
 
     @patch("app.services.llm_service.ModelValidator.validate_model", return_value=[])
+    @patch("app.services.gemini_sdk.client_manager")
     @patch("app.services.llm_service.genai")
-    def test_gemini_few_shot_with_mocked_api(self, mock_genai, _mock_validate):
+    def test_gemini_few_shot_with_mocked_api(
+        self, mock_genai, mock_client_manager, _mock_validate
+    ):
         mock_model = MagicMock()
         mock_genai.GenerativeModel.return_value = mock_model
 
@@ -152,10 +157,11 @@ class TestMockedProcesses(unittest.TestCase):
             self.assertIn("tasks", parsed)
             self.assertIn("flows", parsed)
 
-        mock_genai.configure.assert_called_with(api_key=self.gemini_api_key)
+        mock_client_manager.assert_called_with(self.gemini_api_key, None)
 
+    @patch("app.services.gemini_sdk.client_manager")
     @patch("app.services.llm_service.genai")
-    def test_gemini_zero_shot_with_mocked_api(self, mock_genai):
+    def test_gemini_zero_shot_with_mocked_api(self, mock_genai, mock_client_manager):
         mock_model = MagicMock()
         mock_model.generate_content.return_value = MagicMock(text='{"result": "ok"}')
         mock_genai.GenerativeModel.return_value = mock_model
@@ -170,7 +176,7 @@ class TestMockedProcesses(unittest.TestCase):
             )
             self.assertTrue(result)
 
-        mock_genai.configure.assert_called_with(api_key=self.gemini_api_key)
+        mock_client_manager.assert_called_with(self.gemini_api_key, None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,254 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from app.services import client_pool, model_registry
+from app.services.model_registry import ModelListCache
+
+
+class TestModelListCache(unittest.TestCase):
+    def setUp(self):
+        patcher = patch("app.services.model_registry._discover_live")
+        self.discover = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.discover.return_value = ["gpt-4o", "gpt-5-mini"]
+
+    def _clock(self, now):
+        patcher = patch("app.services.model_registry.time")
+        clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        clock.monotonic.return_value = now
+        return clock
+
+    def _wait_for(self, predicate):
+        deadline = time.monotonic() + 5
+        while not predicate():
+            if time.monotonic() > deadline:
+                self.fail("condition not reached")
+            time.sleep(0.01)
+
+    def test_unknown_key_is_discovered_in_background(self):
+        cache = ModelListCache()
+
+        self.assertIsNone(cache.get("openai", "key-a"))
+        self._wait_for(lambda: cache.get("openai", "key-a") is not None)
+
+        self.assertEqual(cache.get("openai", "key-a"), ["gpt-4o", "gpt-5-mini"])
+        self.discover.assert_called_once_with("openai", "key-a")
+
+    def test_repeated_reads_of_unknown_key_start_one_refresh(self):
+        cache = ModelListCache()
+
+        # The refresh thread never runs, so the key stays unknown and in flight.
+        with patch("app.services.model_registry.threading.Thread") as thread:
+            for _ in range(5):
+                self.assertIsNone(cache.get("openai", "key-a"))
+
+        thread.assert_called_once()
+
+    def test_lists_are_scoped_per_api_key(self):
+        self.discover.side_effect = lambda provider, api_key: [f"model-{api_key}"]
+        cache = ModelListCache()
+
+        cache.refresh("openai", "key-a")
+        cache.refresh("openai", "key-b")
+
+        self.assertEqual(cache.get("openai", "key-a"), ["model-key-a"])
+        self.assertEqual(cache.get("openai", "key-b"), ["model-key-b"])
+        self.assertEqual(self.discover.call_count, 2)
+
+    def test_concurrent_refreshes_share_one_discovery_call(self):
+        cache = ModelListCache()
+        release = threading.Event()
+        entered = threading.Event()
+
+        def slow_discover(provider, api_key):
+            entered.set()
+            release.wait(5)
+            return ["gemini-2.5-pro"]
+
+        self.discover.side_effect = slow_discover
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cache.refresh("gemini", "key-a"))
+            )
+            for _ in range(5)
+        ]
+        threads[0].start()
+        self.assertTrue(entered.wait(5))
+        for thread in threads[1:]:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, [["gemini-2.5-pro"]] * 5)
+        self.discover.assert_called_once()
+
+    def test_refresh_due_backs_off_after_failure_and_keeps_last_list(self):
+        clock = self._clock(1000.0)
+        cache = ModelListCache(refresh_seconds=300, jitter=0)
+        cache.refresh("openai", "key-a", pin=True)
+        self.discover.side_effect = ConnectionError("provider down")
+
+        clock.monotonic.return_value = 1300.0
+        self.assertEqual(cache.refresh_due(), 1)
+        self.assertEqual(cache.get("openai", "key-a"), ["gpt-4o", "gpt-5-mini"])
+
+        clock.monotonic.return_value = 1800.0
+        self.assertEqual(cache.refresh_due(), 0)
+        clock.monotonic.return_value = 1900.0
+        self.assertEqual(cache.refresh_due(), 1)
+        self.assertEqual(self.discover.call_count, 3)
+
+    def test_idle_keys_are_dropped_but_pinned_keys_are_kept(self):
+        clock = self._clock(1000.0)
+        cache = ModelListCache(refresh_seconds=300, idle_seconds=600, jitter=0)
+        cache.refresh("openai", "env-key", pin=True)
+        cache.refresh("openai", "caller-key")
+
+        clock.monotonic.return_value = 2000.0
+        self.assertEqual(cache.refresh_due(), 1)
+
+        self.assertEqual(cache.get("openai", "env-key"), ["gpt-4o", "gpt-5-mini"])
+        self.assertEqual(self.discover.call_count, 3)
+
+    def test_caller_keys_are_capped_least_recently_read_first(self):
+        cache = ModelListCache(max_entries=2)
+        cache.refresh("openai", "env-key", pin=True)
+        cache.refresh("openai", "key-a")
+        cache.refresh("openai", "key-b")
+        cache.get("openai", "key-a")  # key-b is now least recently read
+
+        cache.refresh("openai", "key-c")
+
+        self.assertIsNotNone(cache.get("openai", "env-key"))
+        self.assertIsNotNone(cache.get("openai", "key-a"))
+        self.assertIsNotNone(cache.get("openai", "key-c"))
+        self.assertEqual(self.discover.call_count, 4)
+        self.assertNotIn(cache._key("openai", "key-b"), cache._entries)
+
+    def test_age_reports_oldest_discovered_list(self):
+        clock = self._clock(1000.0)
+        cache = ModelListCache()
+        cache.refresh("openai", "key-a")
+        clock.monotonic.return_value = 1030.0
+        cache.refresh("openai", "key-b")
+
+        clock.monotonic.return_value = 1100.0
+        self.assertEqual(cache.age_seconds("openai"), 100.0)
+        self.assertEqual(cache.age_seconds("gemini"), 0.0)
+
+    def test_is_valid_reads_memory_only(self):
+        model_registry.clear_model_cache()
+        self.addCleanup(model_registry.clear_model_cache)
+        self.discover.side_effect = lambda provider, api_key: (
+            ["gpt-4o"] if api_key == "key-a" else ["gpt-4.1", "gpt-4o-mini"]
+        )
+        model_registry.refresh_model_cache("openai", api_key="key-a")
+
+        self.assertTrue(model_registry.is_valid("openai", "gpt-4o", api_key="key-a"))
+        self.assertFalse(model_registry.is_valid("openai", "gpt-4.1", api_key="key-a"))
+        self.assertFalse(model_registry.is_valid("mistral", "large", api_key="key-a"))
+        self.assertEqual(self.discover.call_count, 1)
+
+    def test_is_valid_discovers_an_unknown_key_first(self):
+        model_registry.clear_model_cache()
+        self.addCleanup(model_registry.clear_model_cache)
+        self.discover.side_effect = lambda provider, api_key: (
+            ["gpt-4.1"] if api_key == "new-key" else ["gpt-4o"]
+        )
+        model_registry.refresh_model_cache("openai")  # environment key
+
+        self.assertTrue(model_registry.is_valid("openai", "gpt-4.1", api_key="new-key"))
+        self.assertFalse(model_registry.is_valid("openai", "gpt-4o", api_key="new-key"))
+        self.discover.assert_any_call("openai", "new-key")
+
+
+class TestModelLimits(unittest.TestCase):
+    def test_longest_prefix_wins(self):
+        self.assertEqual(
+            model_registry.model_limits("openai", "gpt-5-mini").max_output_tokens,
+            16_384,
+        )
+        self.assertEqual(
+            model_registry.model_limits("openai", "gpt-4.1-mini").context_tokens,
+            1_047_576,
+        )
+        self.assertEqual(
+            model_registry.model_limits("gemini", "models/gemini-2.5-flash"),
+            model_registry.model_limits("gemini", "gemini-2.5-pro"),
+        )
+
+    def test_unknown_models_use_provider_default(self):
+        self.assertEqual(
+            model_registry.model_limits("openai", "gpt-4o").max_output_tokens, 4096
+        )
+        self.assertEqual(
+            model_registry.model_limits("gemini", None).max_output_tokens, 2048
+        )
+
+    def test_capabilities_default_to_prompt_only(self):
+        capabilities = model_registry.model_capabilities
+
+        self.assertTrue(capabilities("openai", "gpt-4o-mini").json_schema)
+        self.assertEqual(
+            capabilities("openai", "gpt-4-turbo"),
+            model_registry.ModelCapabilities(json_mode=True, json_schema=False),
+        )
+        self.assertFalse(capabilities("openai", "llama-3").json_mode)
+        self.assertFalse(capabilities("mistral", "large").json_mode)
+
+
+class TestBackgroundRefresh(unittest.TestCase):
+    def test_start_is_idempotent_and_stop_joins_thread(self):
+        self.addCleanup(model_registry.stop_background_refresh)
+
+        self.assertTrue(model_registry.start_background_refresh())
+        self.assertFalse(model_registry.start_background_refresh())
+        model_registry.stop_background_refresh()
+        self.assertTrue(model_registry.start_background_refresh())
+
+
+class TestProviderConnectivity(unittest.TestCase):
+    @patch("app.services.model_registry._probe_url")
+    def test_providers_are_probed_concurrently(self, mock_probe_url):
+        # Both probes must be in flight at once for the barrier to release.
+        barrier = threading.Barrier(2, timeout=5)
+
+        def probe(url, timeout_seconds):
+            barrier.wait()
+            return {"reachable": True, "http_status": 401, "error": None}
+
+        mock_probe_url.side_effect = probe
+
+        diagnostics = model_registry.provider_connectivity(timeout_seconds=3)
+
+        self.assertEqual(
+            [item["provider"] for item in diagnostics], ["openai", "gemini"]
+        )
+        self.assertTrue(all(item["reachable"] for item in diagnostics))
+
+
+class TestOpenAIDiscovery(unittest.TestCase):
+    def setUp(self):
+        client_pool.clear()
+        self.addCleanup(client_pool.clear)
+
+    @patch("app.services.model_registry.OpenAI")
+    def test_discovery_client_is_shared_without_sdk_retries(self, mock_openai):
+        mock_openai.return_value.models.list.return_value.data = [
+            MagicMock(id="gpt-4o")
+        ]
+
+        self.assertEqual(model_registry._discover_openai_models("key"), ["gpt-4o"])
+        client = client_pool.openai_client(MagicMock(), "key")
+
+        mock_openai.assert_called_once_with(api_key="key", max_retries=0)
+        self.assertIs(client, mock_openai.return_value)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+import unittest
+
+from app.services.model_validator import ModelValidator
+
+
+def _flow(flow_id, source, target):
+    return {"id": flow_id, "type": "sequenceFlow", "source": source, "target": target}
+
+
+class TestLoopDetection(unittest.TestCase):
+    def setUp(self):
+        self.validator = ModelValidator()
+
+    def test_reports_loop_as_strongly_connected_nodes_in_model_order(self):
+        model = {
+            "events": [
+                {"id": "startEvent1", "type": "startEvent"},
+                {"id": "endEvent1", "type": "endEvent"},
+            ],
+            "tasks": [{"id": "inspect"}, {"id": "repair"}],
+            "gateways": [{"id": "passed", "type": "exclusiveGateway"}],
+            "flows": [
+                _flow("f1", "startEvent1", "inspect"),
+                _flow("f2", "inspect", "passed"),
+                _flow("f3", "passed", "repair"),
+                _flow("f4", "repair", "inspect"),
+                _flow("f5", "passed", "endEvent1"),
+            ],
+        }
+
+        self.assertEqual(
+            self.validator.find_loops(model), [["inspect", "repair", "passed"]]
+        )
+
+    def test_node_order_alone_is_not_a_loop(self):
+        # The end event is listed first, so the old position heuristic treated
+        # the final flow as a backward edge.
+        model = {
+            "events": [
+                {"id": "endEvent1", "type": "endEvent"},
+                {"id": "startEvent1", "type": "startEvent"},
+            ],
+            "tasks": [{"id": "task1"}],
+            "gateways": [],
+            "flows": [
+                _flow("f1", "startEvent1", "task1"),
+                _flow("f2", "task1", "endEvent1"),
+            ],
+        }
+
+        self.assertEqual(self.validator.find_loops(model), [])
+        issues = self.validator.validate_model(model, "Retest until it passes.")
+        self.assertIn(
+            "Loop/retest language found in text but no backward/loop flow detected.",
+            issues,
+        )
+
+    def test_self_loop_is_a_loop(self):
+        model = {
+            "events": [],
+            "tasks": [{"id": "poll"}, {"id": "done"}],
+            "flows": [_flow("f1", "poll", "poll"), _flow("f2", "poll", "done")],
+        }
+
+        self.assertEqual(self.validator.find_loops(model), [["poll"]])
+
+    def test_long_chain_does_not_hit_recursion_limit(self):
+        count = 5000
+        model = {
+            "tasks": [{"id": f"t{i}"} for i in range(count)],
+            "flows": [_flow(f"f{i}", f"t{i}", f"t{i + 1}") for i in range(count - 1)]
+            + [_flow("back", f"t{count - 1}", "t0")],
+        }
+
+        loops = self.validator.find_loops(model)
+
+        self.assertEqual(len(loops), 1)
+        self.assertEqual(len(loops[0]), count)
+
+
+class TestLocalRepair(unittest.TestCase):
+    def setUp(self):
+        self.validator = ModelValidator()
+
+    def test_dangling_tasks_are_left_for_llm_repair(self):
+        model = {
+            "events": [
+                {"id": "startEvent1", "type": "startEvent"},
+                {"id": "endEvent1", "type": "endEvent"},
+            ],
+            "tasks": [{"id": "task1"}, {"id": "task2"}],
+            "gateways": [],
+            "flows": [_flow("f1", "startEvent1", "task1")],
+        }
+
+        repaired, fixes = self.validator.repair_model(model)
+
+        self.assertEqual(fixes, [])
+        self.assertEqual(repaired["flows"], [_flow("f1", "startEvent1", "task1")])
+        self.assertNotEqual(self.validator.validate_model(repaired), [])
+
+    def test_duplicate_start_and_end_events_are_merged(self):
+        model = {
+            "events": [
+                {"id": "start1", "type": "startEvent"},
+                {"id": "start2", "type": "startEvent"},
+                {"id": "end1", "type": "endEvent"},
+                {"id": "end2", "type": "endEvent"},
+            ],
+            "tasks": [{"id": "task1"}],
+            "gateways": [],
+            "flows": [
+                _flow("f1", "start1", "task1"),
+                _flow("f2", "start2", "task1"),
+                _flow("f3", "task1", "end2"),
+            ],
+        }
+
+        repaired, fixes = self.validator.repair_model(model)
+
+        self.assertEqual(fixes, ["merged_duplicate_start", "merged_duplicate_end"])
+        self.assertEqual([e["id"] for e in repaired["events"]], ["start1", "end1"])
+        self.assertEqual(
+            [(f["source"], f["target"]) for f in repaired["flows"]],
+            [("start1", "task1"), ("task1", "end1")],
+        )
+        self.assertEqual(self.validator.validate_model(repaired), [])
+
+    def test_duplicate_starts_with_different_successors_are_kept(self):
+        model = {
+            "events": [
+                {"id": "start1", "type": "startEvent"},
+                {"id": "start2", "type": "startEvent"},
+                {"id": "end1", "type": "endEvent"},
+            ],
+            "tasks": [{"id": "task1"}, {"id": "task2"}],
+            "gateways": [],
+            "flows": [
+                _flow("f1", "start1", "task1"),
+                _flow("f2", "start2", "task2"),
+                _flow("f3", "task1", "end1"),
+                _flow("f4", "task2", "end1"),
+            ],
+        }
+
+        repaired, fixes = self.validator.repair_model(model)
+
+        self.assertEqual(fixes, [])
+        self.assertEqual(repaired, model)
+
+    def test_pass_through_gateway_is_bypassed_but_declared_split_is_kept(self):
+        model = {
+            "events": [
+                {"id": "startEvent1", "type": "startEvent"},
+                {"id": "endEvent1", "type": "endEvent"},
+            ],
+            "tasks": [{"id": "task1"}],
+            "gateways": [
+                {"id": "gw1", "type": "exclusiveGateway"},
+                {"id": "gw2", "type": "exclusiveGateway", "role": "split"},
+            ],
+            "flows": [
+                _flow("f1", "startEvent1", "gw1"),
+                _flow("f2", "gw1", "task1"),
+                _flow("f3", "task1", "gw2"),
+                _flow("f4", "gw2", "endEvent1"),
+            ],
+        }
+
+        repaired, fixes = self.validator.repair_model(model)
+
+        self.assertEqual(fixes, ["bypassed_pass_through_gateway"])
+        self.assertEqual([g["id"] for g in repaired["gateways"]], ["gw2"])
+        self.assertIn(_flow("f1", "startEvent1", "task1"), repaired["flows"])
+
+
+if __name__ == "__main__":
+    unittest.main()
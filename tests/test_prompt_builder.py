@@ -1,7 +1,14 @@
 import unittest
+from pathlib import Path
 from unittest.mock import patch
 
-from app.utils.prompt_builder import PromptBuilder, STRICT_JSON_REMINDER
+from app.utils.prompt_builder import (
+    PromptBuilder,
+    PromptTemplate,
+    PromptTooLargeError,
+    STRICT_JSON_REMINDER,
+    estimate_tokens,
+)
 
 
 class TestPromptBuilder(unittest.TestCase):
@@ -46,6 +53,66 @@ class TestPromptBuilder(unittest.TestCase):
         self.assertIn("ship the order", prompt)
         self.assertIn("Please generate a BPMN model", prompt)
 
+    def test_template_missing_placeholder_fails_at_load(self):
+        original_read_text = Path.read_text
+
+        def read_text(path, *args, **kwargs):
+            if path.name == "04_flows_prompt.txt":
+                return "Flows for {{PROCESS_TEXT}} only."
+            return original_read_text(path, *args, **kwargs)
+
+        with patch("pathlib.Path.read_text", autospec=True, side_effect=read_text):
+            with self.assertRaisesRegex(ValueError, "KNOWN_ELEMENTS_JSON"):
+                PromptBuilder()
+
+    def test_step_render_does_not_rescan_inserted_text(self):
+        builder = PromptBuilder()
+
+        prompt = builder.render_step(
+            "04_flows_prompt.txt",
+            "user wrote {{KNOWN_ELEMENTS_JSON}}",
+            known_elements_json='{"tasks": []}',
+        )
+
+        self.assertIn("user wrote {{KNOWN_ELEMENTS_JSON}}", prompt)
+        self.assertIn('{"tasks": []}', prompt)
+        self.assertTrue(prompt.endswith("Return only JSON matching the step schema."))
+
+    def test_prompt_over_budget_is_rejected_before_dispatch(self):
+        builder = PromptBuilder()
+        prompt = builder.build_prompt("zero_shot", "ship the order")
+
+        self.assertEqual(
+            builder.build_prompt(
+                "zero_shot", "ship the order", max_tokens=estimate_tokens(prompt)
+            ),
+            prompt,
+        )
+        with self.assertRaises(PromptTooLargeError) as ctx:
+            builder.build_prompt("zero_shot", "ship the order " * 1000, max_tokens=500)
+        self.assertEqual(ctx.exception.max_tokens, 500)
+        self.assertGreater(ctx.exception.estimated_tokens, 500)
+
+    def test_estimate_counts_non_ascii_characters_individually(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("abcdefgh"), 2)
+        self.assertEqual(estimate_tokens("Prüfung"), 3)
+        self.assertEqual(estimate_tokens("審査"), 2)
+
+
+class TestPromptTemplate(unittest.TestCase):
+    def test_render_fills_every_slot(self):
+        template = PromptTemplate("a {{X}} b {{Y}} c {{X}}")
+
+        self.assertEqual(template.placeholders, frozenset({"X", "Y"}))
+        self.assertEqual(template.render({"X": "1", "Y": "2"}), "a 1 b 2 c 1")
+
+    def test_validate_rejects_unknown_placeholder(self):
+        with self.assertRaisesRegex(ValueError, "unknown placeholders: {{TYPO}}"):
+            PromptTemplate("{{PROCESS_TEXT}} {{TYPO}}", name="t").validate(
+                ("PROCESS_TEXT",)
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,262 @@
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.services import client_pool, rate_limiter
+from app.services.llm_service import LLMService
+from config import TestingConfig
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, headers=None):
+        super().__init__("Error code: 429")
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class TestRetryAfter(unittest.TestCase):
+    def test_reads_openai_headers(self):
+        self.assertEqual(
+            rate_limiter.retry_after_seconds(_RateLimited({"retry-after-ms": "250"})),
+            0.25,
+        )
+        self.assertEqual(
+            rate_limiter.retry_after_seconds(_RateLimited({"retry-after": "3"})), 3.0
+        )
+        self.assertEqual(
+            rate_limiter.retry_after_seconds(
+                _RateLimited({"x-ratelimit-reset-requests": "6m0.5s"})
+            ),
+            360.5,
+        )
+
+    def test_reads_gemini_retry_delay_from_message(self):
+        self.assertEqual(
+            rate_limiter.retry_after_seconds(
+                RuntimeError("429 Quota exceeded. Please retry in 23.4s.")
+            ),
+            23.4,
+        )
+        self.assertEqual(
+            rate_limiter.retry_after_seconds(
+                RuntimeError("429 quota [retry_delay {\n  seconds: 7\n}]")
+            ),
+            7.0,
+        )
+        self.assertIsNone(rate_limiter.retry_after_seconds(RuntimeError("boom")))
+
+    def test_detects_rate_limit_errors(self):
+        self.assertTrue(rate_limiter.is_rate_limit_error(_RateLimited()))
+        self.assertTrue(
+            rate_limiter.is_rate_limit_error(RuntimeError("ResourceExhausted: quota"))
+        )
+        self.assertFalse(rate_limiter.is_rate_limit_error(RuntimeError("timeout")))
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def test_window_halves_on_rate_limit_and_grows_on_success(self):
+        limiter = rate_limiter.AdaptiveLimiter("openai", max_concurrency=8)
+
+        limiter.acquire()
+        limiter.release(_RateLimited({"retry-after-ms": "0"}))
+        self.assertEqual(limiter.window, 4.0)
+
+        limiter.acquire()
+        limiter.release(RuntimeError("unrelated failure"))
+        self.assertEqual(limiter.window, 4.0)
+
+        for _ in range(4):
+            limiter.acquire()
+            limiter.release()
+        self.assertAlmostEqual(limiter.window, 5.0, delta=0.1)
+
+    def test_retry_after_pauses_new_requests(self):
+        limiter = rate_limiter.AdaptiveLimiter("openai", max_concurrency=4)
+        limiter.acquire()
+        limiter.release(_RateLimited({"retry-after-ms": "100"}))
+
+        started = time.monotonic()
+        limiter.acquire()
+        limiter.release()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.08)
+
+    def test_full_queue_is_shed_immediately(self):
+        limiter = rate_limiter.AdaptiveLimiter("gemini", max_concurrency=1, max_queue=0)
+        limiter.acquire()
+
+        with self.assertRaises(rate_limiter.ProviderBusyError) as ctx:
+            limiter.acquire()
+        self.assertEqual(ctx.exception.reason, "queue_full")
+
+    def test_wait_beyond_deadline_is_shed(self):
+        limiter = rate_limiter.AdaptiveLimiter(
+            "gemini", max_concurrency=1, max_wait_seconds=0.05
+        )
+        limiter.acquire()
+
+        with self.assertRaises(rate_limiter.ProviderBusyError) as ctx:
+            limiter.acquire()
+        self.assertEqual(ctx.exception.reason, "timeout")
+
+    def test_waiting_request_gets_released_slot(self):
+        limiter = rate_limiter.AdaptiveLimiter("openai", max_concurrency=1)
+        limiter.acquire()
+        admitted = threading.Event()
+
+        def wait_for_slot():
+            with limiter.slot():
+                admitted.set()
+
+        worker = threading.Thread(target=wait_for_slot)
+        worker.start()
+        self.assertFalse(admitted.wait(0.05))
+        limiter.release()
+        worker.join(timeout=2)
+
+        self.assertTrue(admitted.is_set())
+
+    def test_async_waiter_is_woken_by_release_from_another_thread(self):
+        limiter = rate_limiter.AdaptiveLimiter("openai", max_concurrency=1)
+        limiter.acquire()
+
+        async def wait_for_slot():
+            threading.Timer(0.05, limiter.release).start()
+            started = time.monotonic()
+            async with limiter.async_slot():
+                return time.monotonic() - started
+
+        waited = asyncio.run(wait_for_slot())
+
+        self.assertGreaterEqual(waited, 0.04)
+        self.assertLess(waited, 1.0)
+
+    def test_cancelled_async_waiter_leaves_no_slot_or_queue_entry(self):
+        limiter = rate_limiter.AdaptiveLimiter("gemini", max_concurrency=1, max_queue=1)
+        limiter.acquire()
+
+        async def cancel_waiter():
+            task = asyncio.ensure_future(limiter.acquire_async())
+            await asyncio.sleep(0.02)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_waiter())
+        limiter.release()
+
+        self.assertEqual(limiter._waiting, 0)
+        self.assertEqual(limiter._in_flight, 0)
+
+    def test_async_full_queue_is_shed(self):
+        limiter = rate_limiter.AdaptiveLimiter("gemini", max_concurrency=1, max_queue=0)
+        limiter.acquire()
+
+        with self.assertRaises(rate_limiter.ProviderBusyError):
+            asyncio.run(limiter.acquire_async())
+
+    def test_requests_per_minute_paces_calls(self):
+        limiter = rate_limiter.AdaptiveLimiter(
+            "openai", max_concurrency=1, requests_per_minute=1200
+        )
+
+        started = time.monotonic()
+        for _ in range(3):
+            with limiter.slot():
+                pass
+
+        # One token is available up front; the next two refill at 20/s.
+        self.assertGreaterEqual(time.monotonic() - started, 0.08)
+
+
+class TestLimiterRegistry(unittest.TestCase):
+    def setUp(self):
+        rate_limiter.clear()
+        self.addCleanup(rate_limiter.clear)
+        self.addCleanup(rate_limiter.configure, {})
+
+    def test_least_recently_used_keys_are_dropped(self):
+        rate_limiter.configure({"PROVIDER_LIMITER_MAX_KEYS": 2})
+        first = rate_limiter.limiter_for("openai", "key-a", "gpt-4o")
+        second = rate_limiter.limiter_for("openai", "key-b", "gpt-4o")
+        rate_limiter.limiter_for("openai", "key-a", "gpt-4o")
+
+        rate_limiter.limiter_for("openai", "key-c", "gpt-4o")
+
+        self.assertIs(rate_limiter.limiter_for("openai", "key-a", "gpt-4o"), first)
+        self.assertIsNot(rate_limiter.limiter_for("openai", "key-b", "gpt-4o"), second)
+
+
+class TestLLMServiceLimiter(unittest.TestCase):
+    @patch("app.model_registry.refresh_model_cache")
+    def setUp(self, mock_refresh_model_cache):
+        client_pool.clear()
+        rate_limiter.clear()
+        self.addCleanup(rate_limiter.clear)
+        self.app = create_app(TestingConfig)
+        self.app.config.update(
+            PROVIDER_LIMITER_ENABLED=True,
+            PROVIDER_LIMITER_MAX_CONCURRENCY={"openai": 4},
+            PROVIDER_RETRY_BASE_DELAY_SECONDS=0,
+            PROVIDER_RETRY_MAX_DELAY_SECONDS=0,
+        )
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.addCleanup(self.app_context.pop)
+        self.service = LLMService()
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_provider_rate_limit_shrinks_the_key_window(self, mock_openai):
+        self.app.config["PROVIDER_RETRY_MAX_ATTEMPTS"] = 1
+        mock_openai.return_value.chat.completions.create.side_effect = _RateLimited(
+            {"retry-after-ms": "0"}
+        )
+
+        with self.assertRaises(_RateLimited):
+            self.service.generate("key", "openai", "gpt-4o", "text", "system")
+
+        limiter = rate_limiter.limiter_for("openai", "key", "gpt-4o")
+        self.assertEqual(limiter.window, 2.0)
+        other_key = rate_limiter.limiter_for(
+            "openai", "other-key", "gpt-4o", max_concurrency=4
+        )
+        self.assertEqual(other_key.window, 4.0)
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_every_provider_attempt_takes_a_slot(self, mock_openai):
+        choice = MagicMock()
+        choice.message.content = "{}"
+        mock_openai.return_value.chat.completions.create.side_effect = [
+            _RateLimited({"retry-after-ms": "0"}),
+            MagicMock(choices=[choice]),
+        ]
+        limiter = rate_limiter.limiter_for("openai", "key", "gpt-4o", max_concurrency=4)
+
+        with patch.object(limiter, "acquire", wraps=limiter.acquire) as acquire:
+            self.service.generate("key", "openai", "gpt-4o", "text", "system")
+
+        self.assertEqual(acquire.call_count, 2)
+        self.assertEqual(limiter.window, 2.0 + 1 / 2.0)
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_disabled_limiter_is_not_consulted(self, mock_openai):
+        mock_choice = MagicMock()
+        mock_choice.message.content = "{}"
+        mock_openai.return_value.chat.completions.create.return_value.choices = [
+            mock_choice
+        ]
+        self.app.config["PROVIDER_LIMITER_ENABLED"] = False
+
+        with patch.object(rate_limiter, "limiter_for") as limiter_for:
+            self.service.generate("key", "openai", "gpt-4o", "text", "system")
+
+        limiter_for.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+
+from app.services import response_cache
+from app.services.response_cache import ResponseCache
+
+
+def _memory_cache(**overrides):
+    config = {"RESPONSE_CACHE_ENABLED": True, "RESPONSE_CACHE_BACKEND": "memory"}
+    config.update(overrides)
+    return response_cache.from_config(config)
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_disabled_by_default(self):
+        self.assertIsNone(response_cache.from_config({}))
+
+    def test_key_depends_on_every_component(self):
+        cache = _memory_cache()
+        base = ("prompt", "system", "openai", "gpt-4o", "zero_shot")
+        base_key = cache.make_key(*base)
+        self.assertEqual(base_key, cache.make_key(*base))
+        for index in range(len(base)):
+            changed = list(base)
+            changed[index] = changed[index] + "-x"
+            self.assertNotEqual(base_key, cache.make_key(*changed))
+
+    def test_memory_backend_round_trip_and_lru_eviction(self):
+        cache = _memory_cache(RESPONSE_CACHE_MAX_ENTRIES=2)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        self.assertEqual(cache.get("a"), "A")  # a is now most recent
+        cache.set("c", "C")  # evicts b
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "A")
+        self.assertEqual(cache.get("c"), "C")
+
+    @patch("app.services.response_cache.time.monotonic")
+    def test_memory_backend_expires_entries(self, mock_monotonic):
+        cache = _memory_cache(RESPONSE_CACHE_TTL_SECONDS=10)
+        mock_monotonic.return_value = 100.0
+        cache.set("a", "A")
+        mock_monotonic.return_value = 110.0
+        self.assertIsNone(cache.get("a"))
+
+    def test_skips_empty_and_oversized_values(self):
+        cache = _memory_cache(RESPONSE_CACHE_MAX_VALUE_BYTES=4)
+        self.assertFalse(cache.set("empty", ""))
+        self.assertFalse(cache.set("big", "12345"))
+        self.assertTrue(cache.set("ok", "1234"))
+
+    def test_redis_backend_uses_job_store_connection_settings(self):
+        config = {
+            "RESPONSE_CACHE_ENABLED": True,
+            "RESPONSE_CACHE_BACKEND": "redis",
+            "REDIS_URL": "redis://127.0.0.1:6379/7",
+            "REDIS_USE_MOCK": True,
+        }
+        first = response_cache.from_config(config)
+        second = response_cache.from_config(config)
+        self.assertIsInstance(first, ResponseCache)
+        self.assertEqual(first.backend_name, "redis")
+
+        key = first.make_key("p", "s", "openai", "gpt-4o", "zero_shot")
+        first.set(key, "RAW")
+        self.assertEqual(second.get(key), "RAW")
+
+
+if __name__ == "__main__":
+    unittest.main()
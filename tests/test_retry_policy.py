@@ -0,0 +1,169 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from app import create_app
+from app.services import client_pool, retry_policy
+from app.services.llm_service import LLMService
+from config import TestingConfig
+
+_NO_WAIT = retry_policy.RetryPolicy(
+    max_attempts=3, base_delay=0, max_delay=0, deadline_seconds=5
+)
+
+
+class _HttpError(Exception):
+    def __init__(self, status_code, message="", headers=None):
+        super().__init__(message or f"Error code: {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class TestTransientReason(unittest.TestCase):
+    def test_classifies_transient_errors(self):
+        cases = [
+            (_HttpError(503), "server_error"),
+            (_HttpError(504), "timeout"),
+            (APITimeoutError("Request timed out."), "timeout"),
+            (ConnectionResetError("reset by peer"), "connection"),
+            (SimpleNamespace(code=500), "server_error"),
+            (_HttpError(429, headers={"retry-after": "1"}), "rate_limited"),
+        ]
+        for exc, reason in cases:
+            with self.subTest(exc=exc):
+                self.assertEqual(retry_policy.transient_reason(exc), reason)
+
+    def test_other_errors_are_not_retried(self):
+        cases = [
+            ValueError("bad"),
+            _HttpError(400),
+            _HttpError(429),
+            _HttpError(
+                429,
+                "You exceeded your current quota (insufficient_quota)",
+                headers={"retry-after": "1"},
+            ),
+        ]
+        for exc in cases:
+            with self.subTest(exc=exc):
+                self.assertIsNone(retry_policy.transient_reason(exc))
+
+
+class TestCall(unittest.TestCase):
+    def test_transient_errors_are_retried_until_success(self):
+        fn = MagicMock(side_effect=[_HttpError(502), ConnectionResetError(), "ok"])
+
+        self.assertEqual(retry_policy.call("openai", fn, _NO_WAIT), "ok")
+        self.assertEqual(fn.call_count, 3)
+
+    def test_gives_up_after_max_attempts(self):
+        fn = MagicMock(side_effect=_HttpError(503))
+
+        with self.assertRaises(_HttpError):
+            retry_policy.call("gemini", fn, _NO_WAIT)
+        self.assertEqual(fn.call_count, 3)
+
+    def test_permanent_error_is_raised_at_once(self):
+        fn = MagicMock(side_effect=ValueError("bad request"))
+
+        with self.assertRaises(ValueError):
+            retry_policy.call("openai", fn, _NO_WAIT)
+        fn.assert_called_once()
+
+    @patch("app.services.retry_policy.time.sleep")
+    def test_retry_after_beyond_deadline_is_not_waited_for(self, mock_sleep):
+        fn = MagicMock(side_effect=_HttpError(429, headers={"retry-after": "30"}))
+
+        with self.assertRaises(_HttpError):
+            retry_policy.call("openai", fn, _NO_WAIT)
+        fn.assert_called_once()
+        mock_sleep.assert_not_called()
+
+    @patch("app.services.retry_policy.time.sleep")
+    def test_backoff_is_jittered_and_capped(self, mock_sleep):
+        policy = retry_policy.RetryPolicy(
+            max_attempts=5, base_delay=1, max_delay=2, deadline_seconds=60
+        )
+        fn = MagicMock(side_effect=[_HttpError(500)] * 4 + ["ok"])
+
+        with patch("app.services.retry_policy.random.uniform", side_effect=max):
+            retry_policy.call("openai", fn, policy)
+
+        self.assertEqual([c.args[0] for c in mock_sleep.call_args_list], [1, 2, 2, 2])
+
+    def test_async_call_retries(self):
+        attempts = []
+
+        async def fn():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise TimeoutError()
+            return "ok"
+
+        result = asyncio.run(retry_policy.call_async("gemini", fn, _NO_WAIT))
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(attempts), 2)
+
+
+class TestLLMServiceRetries(unittest.TestCase):
+    @patch("app.model_registry.refresh_model_cache")
+    def setUp(self, mock_refresh_model_cache):
+        client_pool.clear()
+        self.app = create_app(TestingConfig)
+        self.app.config.update(
+            PROVIDER_RETRY_BASE_DELAY_SECONDS=0, PROVIDER_RETRY_MAX_DELAY_SECONDS=0
+        )
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.addCleanup(self.app_context.pop)
+        self.service = LLMService()
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_openai_connection_error_is_retried(self, mock_openai):
+        choice = MagicMock()
+        choice.message.content = "RAW BPMN JSON"
+        completion = MagicMock(choices=[choice])
+        create = mock_openai.return_value.chat.completions.create
+        create.side_effect = [ConnectionResetError("reset"), completion]
+
+        result = self.service.generate("key", "openai", "gpt-4o", "text", "system")
+
+        self.assertEqual(result, "RAW BPMN JSON")
+        self.assertEqual(create.call_count, 2)
+
+    @patch("app.services.llm_service.genai")
+    def test_gemini_retries_stop_at_configured_attempts(self, mock_genai):
+        self.app.config["PROVIDER_RETRY_MAX_ATTEMPTS"] = 2
+        gen_model = mock_genai.GenerativeModel.return_value
+        gen_model.generate_content.side_effect = _HttpError(503)
+
+        with self.assertRaises(_HttpError):
+            self.service.generate("key", "gemini", "gemini-2.0-flash", "text", "system")
+        self.assertEqual(gen_model.generate_content.call_count, 2)
+
+    @patch("app.services.llm_service.genai")
+    def test_gemini_stream_open_is_retried(self, mock_genai):
+        gen_model = mock_genai.GenerativeModel.return_value
+        gen_model.generate_content.side_effect = [
+            _HttpError(503),
+            [SimpleNamespace(text="RAW BPMN JSON")],
+        ]
+
+        chunks = list(
+            self.service.stream_gemini(
+                "key", "system", "text", model="gemini-2.0-flash"
+            )
+        )
+
+        self.assertEqual(chunks, ["RAW BPMN JSON"])
+        self.assertEqual(gen_model.generate_content.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from app.services import step_schemas
+from app.services.step_schemas import StepSchemaError
+
+
+class TestStepSchemas(unittest.TestCase):
+    def test_valid_step_outputs_pass(self):
+        step_schemas.validate_step(
+            "gateways",
+            {
+                "gateways": [
+                    {
+                        "id": "gateway1",
+                        "type": "exclusiveGateway",
+                        "role": "split",
+                        "branch_count": 2,
+                        "branch_cues": ["defect remains", "passes test"],
+                    }
+                ]
+            },
+        )
+        step_schemas.validate_step(
+            "merge_and_validate",
+            {"events": [], "tasks": [], "gateways": [], "flows": []},
+        )
+
+    def test_error_names_the_offending_field(self):
+        with self.assertRaisesRegex(StepSchemaError, "flows/0"):
+            step_schemas.validate_step(
+                "flows", {"flows": [{"id": "flow1", "source": "startEvent1"}]}
+            )
+        with self.assertRaisesRegex(StepSchemaError, "events/0/type"):
+            step_schemas.validate_step(
+                "start_event", {"events": [{"id": "e1", "type": "endEvent"}]}
+            )
+
+    def test_schema_error_is_a_value_error(self):
+        # run_json_step treats ValueError as "retry, then fall back".
+        with self.assertRaises(ValueError):
+            step_schemas.validate_step("context_summary", {"summary": "x"})
+
+    def test_unknown_step_is_not_checked(self):
+        step_schemas.validate_step("not_a_step", ["anything"])
+        self.assertIsNone(step_schemas.response_schema("not_a_step"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock
 import json
 import os
 import config
+from app.services import client_pool
 from app.services.llm_service import LLMService
 from app.utils.prompt_builder import STRICT_JSON_REMINDER
 from app.services.model_validator import ModelValidator
@@ -22,6 +23,7 @@ RUN_LLM_TESTS = os.getenv("RUN_LLM_TESTS", "false").strip().lower() in {
 )
 class TestT2PService(unittest.TestCase):
     def setUp(self):
+        client_pool.clear()
         config_instance = config.get_config()()
         self.api_key = "test-api-key"  # Static test API key
         self.system_prompt = config_instance.SYSTEM_PROMPT
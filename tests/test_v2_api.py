@@ -1,14 +1,32 @@
+import json
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
 from app import create_app
 from app.api import routes as api_routes
+from app.services import client_pool, model_registry, rate_limiter, response_cache
 from config import TestingConfig
 
 
 class TestV2Api(unittest.TestCase):
     @patch("app.model_registry.refresh_model_cache")
     def setUp(self, mock_refresh_model_cache):
+        # Provider clients are pooled per API key; drop clients built from a
+        # previous test's mocked SDK class.
+        client_pool.clear()
+        # Keep request tests hermetic: live model discovery would reach the
+        # network and pool real provider clients under the test API key.
+        # Without it the registry serves its fallback lists (any model name).
+        model_registry.clear_model_cache()
+        model_registry.clear_connectivity_cache()
+        discovery_patcher = patch(
+            "app.services.model_registry._discover_live",
+            side_effect=ConnectionError("model discovery disabled in tests"),
+        )
+        discovery_patcher.start()
+        self.addCleanup(discovery_patcher.stop)
         self.app = create_app(TestingConfig)
         self.client = self.app.test_client()
         self.app_context = self.app.app_context()
@@ -34,10 +52,7 @@ class TestV2Api(unittest.TestCase):
 
     # --- /models ----------------------------------------------------------
     @patch("app.api.routes.model_registry.get_cached_models")
-    @patch("app.api.routes.model_registry.refresh_model_cache")
-    def test_models_returns_registry(
-        self, mock_refresh_model_cache, mock_get_cached_models
-    ):
+    def test_models_returns_registry(self, mock_get_cached_models):
         mock_get_cached_models.return_value = [
             {"provider": "openai", "model": "gpt-4o"},
             {"provider": "gemini", "model": "gemini-2.0-flash"},
@@ -49,8 +64,24 @@ class TestV2Api(unittest.TestCase):
         pairs = {(m["provider"], m["model"]) for m in data["models"]}
         self.assertIn(("openai", "gpt-4o"), pairs)
         self.assertIn(("gemini", "gemini-2.0-flash"), pairs)
-        mock_refresh_model_cache.assert_called_once_with(provider=None, api_key=None)
-        mock_get_cached_models.assert_called_once_with(provider=None)
+        mock_get_cached_models.assert_called_once_with(provider=None, api_key=None)
+
+    @patch("app.services.model_registry._discover_live")
+    def test_models_does_not_wait_for_discovery(self, mock_discover):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        mock_discover.side_effect = lambda provider, api_key: release.wait(5) and []
+
+        response = self.client.get(
+            "/models?provider=openai",
+            headers={"Authorization": "Bearer unseen-key"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.get_json()["models"],
+            [{"provider": "openai", "model": "gpt-5-mini"}],
+        )
 
     # --- /health/providers -----------------------------------------------
     @patch("app.api.routes.model_registry.provider_connectivity")
@@ -169,6 +200,26 @@ class TestV2Api(unittest.TestCase):
         payload = response.get_json()
         self.assertFalse(payload["ready"])
 
+    @patch("app.api.routes.model_registry.provider_connectivity")
+    def test_readiness_reuses_fresh_probe_result(self, mock_provider_connectivity):
+        mock_provider_connectivity.return_value = [
+            {
+                "provider": "openai",
+                "url": "https://api.openai.com/v1/models",
+                "reachable": True,
+                "http_status": 401,
+                "error": None,
+            }
+        ]
+
+        for _ in range(3):
+            self.assertEqual(self.client.get("/health/ready").status_code, 200)
+        mock_provider_connectivity.assert_called_once()
+
+        self.app.config["READINESS_CACHE_SECONDS"] = 0
+        self.assertEqual(self.client.get("/health/ready").status_code, 200)
+        self.assertEqual(mock_provider_connectivity.call_count, 2)
+
     # --- /generate success ------------------------------------------------
     @patch("app.services.llm_service.OpenAI")
     def test_generate_openai_success(self, mock_openai):
@@ -185,7 +236,7 @@ class TestV2Api(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.get_json(), {"raw_response": "RAW BPMN JSON"})
         # The API key is taken from the header, never the body.
-        mock_openai.assert_called_once_with(api_key="secret-token")
+        mock_openai.assert_called_once_with(api_key="secret-token", max_retries=0)
 
     @patch.object(api_routes._llm_service, "generate", return_value="RAW BPMN JSON")
     def test_generate_accepts_new_openai_model_for_supported_provider(
@@ -246,6 +297,32 @@ class TestV2Api(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.get_json()["error"]["code"], "invalid_provider")
 
+    @patch("app.services.llm_service.OpenAI")
+    @patch("app.services.model_registry._discover_live")
+    def test_generate_validates_against_in_memory_models_of_key(
+        self, mock_discover, mock_openai
+    ):
+        mock_discover.return_value = ["gpt-4o"]
+        model_registry.refresh_model_cache("openai", api_key="secret-token")
+        self._mock_openai(mock_openai)
+        body = {"user_text": "x", "provider": "openai", "model": "gpt-4o"}
+
+        for _ in range(2):
+            response = self.client.post(
+                "/generate",
+                headers={"Authorization": "Bearer secret-token"},
+                json=body,
+            )
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json={**body, "model": "gpt-4.1"},
+        )
+
+        self.assertEqual(response.get_json()["error"]["code"], "invalid_provider")
+        mock_discover.assert_called_once_with("openai", "secret-token")
+
     # --- /generate upstream failure --------------------------------------
     @patch("app.services.llm_service.OpenAI")
     def test_generate_provider_error_is_500_upstream(self, mock_openai):
@@ -276,6 +353,19 @@ class TestV2Api(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.get_json()["error"]["code"], "invalid_request")
 
+    @patch("app.services.llm_service.OpenAI")
+    def test_generate_oversized_prompt_is_400_without_provider_call(self, mock_openai):
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json={"user_text": "x" * 600_000, "provider": "openai", "model": "gpt-4o"},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"]["code"], "invalid_request")
+        self.assertIn("too long", response.get_json()["error"]["message"])
+        mock_openai.return_value.chat.completions.create.assert_not_called()
+
     @patch("app.services.llm_service.OpenAI")
     def test_generate_openai_quota_error_is_429_rate_limited(self, mock_openai):
         mock_openai.return_value.chat.completions.create.side_effect = RuntimeError(
@@ -289,6 +379,34 @@ class TestV2Api(unittest.TestCase):
         self.assertEqual(response.status_code, 429)
         self.assertEqual(response.get_json()["error"]["code"], "rate_limited")
 
+    @patch("app.services.llm_service.OpenAI")
+    def test_generate_shed_by_provider_limiter_is_429(self, mock_openai):
+        self._mock_openai(mock_openai)
+        rate_limiter.clear()
+        self.addCleanup(rate_limiter.clear)
+        self.app.config.update(
+            PROVIDER_LIMITER_ENABLED=True,
+            PROVIDER_LIMITER_MAX_CONCURRENCY={"openai": 1},
+            PROVIDER_LIMITER_MAX_QUEUE=0,
+        )
+        busy = rate_limiter.limiter_for(
+            "openai", "secret-token", "gpt-4o", max_concurrency=1, max_queue=0
+        )
+        busy.acquire()
+        self.addCleanup(busy.release)
+
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json={"user_text": "x", "provider": "openai", "model": "gpt-4o"},
+        )
+
+        self.assertEqual(response.status_code, 429)
+        error = response.get_json()["error"]
+        self.assertEqual(error["code"], "rate_limited")
+        self.assertIn("waiting for this provider", error["message"])
+        mock_openai.return_value.chat.completions.create.assert_not_called()
+
     @patch("app.services.llm_service.genai")
     def test_generate_gemini_provider_error_is_500_upstream(self, mock_genai):
         # The Gemini provider must map a provider-side failure to the same
@@ -394,13 +512,211 @@ class TestV2Api(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.get_json()["error"]["code"], "invalid_request")
 
+    # --- /generate response cache ---------------------------------------
+    @patch("app.services.llm_service.OpenAI")
+    def test_generate_serves_repeated_request_from_cache(self, mock_openai):
+        self._mock_openai(mock_openai)
+        self.app.extensions["response_cache"] = response_cache.from_config(
+            {"RESPONSE_CACHE_ENABLED": True}
+        )
+        body = {"user_text": "describe a process", "provider": "openai", "model": "gpt-4o"}
+        headers = {"Authorization": "Bearer secret-token"}
+
+        first = self.client.post("/generate", headers=headers, json=body)
+        second = self.client.post("/generate", headers=headers, json=body)
+
+        self.assertEqual(first.get_json(), second.get_json())
+        create = mock_openai.return_value.chat.completions.create
+        self.assertEqual(create.call_count, 1)
+
+        bypassed = self.client.post(
+            "/generate", headers={**headers, "X-Cache-Bypass": "true"}, json=body
+        )
+        self.assertEqual(bypassed.status_code, 200)
+        self.assertEqual(create.call_count, 2)
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_streamed_response_is_not_served_to_generate(self, mock_openai):
+        self.app.extensions["response_cache"] = response_cache.from_config(
+            {"RESPONSE_CACHE_ENABLED": True}
+        )
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value = iter([self._openai_chunk("STREAMED")])
+        headers = {"Authorization": "Bearer secret-token"}
+        self.client.post("/generate", headers=headers, json=self._stream_body())
+
+        self._mock_openai(mock_openai)
+        response = self.client.post(
+            "/generate",
+            headers=headers,
+            json={
+                "user_text": "describe a process",
+                "provider": "openai",
+                "model": "gpt-4o",
+            },
+        )
+
+        self.assertEqual(response.get_json()["raw_response"], "RAW BPMN JSON")
+        self.assertEqual(create.call_count, 2)
+
+    # --- /generate streaming -------------------------------------------
+    @staticmethod
+    def _sse_events(response):
+        events = []
+        for block in response.get_data(as_text=True).split("\n\n"):
+            lines = dict(
+                line.split(": ", 1) for line in block.splitlines() if ": " in line
+            )
+            if "event" in lines:
+                events.append((lines["event"], json.loads(lines["data"])))
+        return events
+
+    @staticmethod
+    def _openai_chunk(text):
+        chunk = MagicMock()
+        chunk.choices = [MagicMock()]
+        chunk.choices[0].delta.content = text
+        return chunk
+
+    def _stream_body(self, provider="openai", model="gpt-4o", **extra):
+        return {
+            "user_text": "describe a process",
+            "provider": provider,
+            "model": model,
+            "stream": True,
+            **extra,
+        }
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_generate_stream_relays_openai_chunks(self, mock_openai):
+        create = mock_openai.return_value.chat.completions.create
+        create.return_value = iter(
+            [self._openai_chunk('{"events": '), self._openai_chunk(None)]
+            + [self._openai_chunk("[]}")]
+        )
+
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json=self._stream_body(),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        self.assertEqual(
+            self._sse_events(response),
+            [
+                ("chunk", {"text": '{"events": '}),
+                ("chunk", {"text": "[]}"}),
+                ("done", {"raw_response": '{"events": []}'}),
+            ],
+        )
+        self.assertTrue(create.call_args.kwargs["stream"])
+
+    @patch("app.services.llm_service.genai")
+    def test_generate_stream_relays_gemini_chunks(self, mock_genai):
+        chunks = [MagicMock(text="RAW "), MagicMock(text="GEMINI")]
+        mock_genai.GenerativeModel.return_value.generate_content.return_value = chunks
+
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json=self._stream_body(provider="gemini", model="gemini-2.0-flash"),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self._sse_events(response)[-1], ("done", {"raw_response": "RAW GEMINI"})
+        )
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_generate_stream_empty_response_is_400(self, mock_openai):
+        mock_openai.return_value.chat.completions.create.return_value = iter(
+            [self._openai_chunk(None), self._openai_chunk("  ")]
+        )
+
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json=self._stream_body(),
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"]["code"], "invalid_request")
+
+    @patch("app.services.llm_service.OpenAI")
+    def test_generate_stream_failure_mid_stream_sends_error_event(self, mock_openai):
+        def chunks():
+            yield self._openai_chunk("{")
+            raise RuntimeError("connection reset")
+
+        mock_openai.return_value.chat.completions.create.return_value = chunks()
+
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json=self._stream_body(),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self._sse_events(response)[-1],
+            (
+                "error",
+                {
+                    "error": {
+                        "code": "upstream_error",
+                        "message": "The LLM provider call failed.",
+                    }
+                },
+            ),
+        )
+
+    def test_generate_stream_rejects_few_shot(self):
+        response = self.client.post(
+            "/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json=self._stream_body(prompting_strategy="few_shot"),
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"]["code"], "invalid_request")
+
     # --- /internal/jobs/* -----------------------------------------------
-    @patch("app.api.routes.threading.Thread")
+    @patch("app.api.routes._job_workers")
     @patch("app.api.routes._job_store")
-    def test_internal_async_submit_returns_job_id(self, mock_job_store, mock_thread):
+    def test_internal_async_submit_returns_job_id(self, mock_job_store, mock_workers):
         store = MagicMock()
         store.create.return_value = "job-123"
         mock_job_store.return_value = store
+        workers = MagicMock()
+        workers.is_full.return_value = False
+        mock_workers.return_value = workers
+        body = {
+            "user_text": "describe a process",
+            "provider": "openai",
+            "model": "gpt-4o",
+        }
+
+        response = self.client.post(
+            "/internal/jobs/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json=body,
+        )
+
+        self.assertEqual(response.status_code, 202)
+        payload = response.get_json()
+        self.assertEqual(payload["job_id"], "job-123")
+        self.assertEqual(payload["status"], "queued")
+        workers.submit.assert_called_once_with("job-123", "secret-token", body, True)
+
+    @patch("app.api.routes._job_workers")
+    @patch("app.api.routes._job_store")
+    def test_internal_async_submit_full_queue_is_503(
+        self, mock_job_store, mock_workers
+    ):
+        workers = MagicMock()
+        workers.is_full.return_value = True
+        mock_workers.return_value = workers
 
         response = self.client.post(
             "/internal/jobs/generate",
@@ -412,11 +728,37 @@ class TestV2Api(unittest.TestCase):
             },
         )
 
-        self.assertEqual(response.status_code, 202)
-        payload = response.get_json()
-        self.assertEqual(payload["job_id"], "job-123")
-        self.assertEqual(payload["status"], "queued")
-        mock_thread.assert_called_once()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()["error"]["code"], "queue_full")
+        self.assertIn("Retry-After", response.headers)
+        mock_job_store.return_value.create.assert_not_called()
+        workers.submit.assert_not_called()
+
+    @patch("app.api.routes._job_workers")
+    @patch("app.api.routes._job_store")
+    def test_internal_async_submit_losing_depth_race_is_503(
+        self, mock_job_store, mock_workers
+    ):
+        store = mock_job_store.return_value
+        store.create.return_value = "job-123"
+        workers = MagicMock()
+        workers.is_full.return_value = False
+        workers.submit.return_value = False
+        mock_workers.return_value = workers
+
+        response = self.client.post(
+            "/internal/jobs/generate",
+            headers={"Authorization": "Bearer secret-token"},
+            json={
+                "user_text": "describe a process",
+                "provider": "openai",
+                "model": "gpt-4o",
+            },
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.get_json()["error"]["code"], "queue_full")
+        store.discard.assert_called_once_with(["job-123"])
 
     @patch("app.api.routes._job_store")
     def test_internal_async_status_returns_job_payload(self, mock_job_store):
@@ -437,6 +779,145 @@ class TestV2Api(unittest.TestCase):
         self.assertEqual(payload["status"], "succeeded")
         self.assertEqual(payload["result"]["raw_response"], "RAW BPMN JSON")
 
+    @patch("app.api.routes._job_workers")
+    def test_internal_batch_submit_queues_one_job_per_item(self, mock_workers):
+        workers = MagicMock()
+        workers.has_capacity.return_value = True
+        mock_workers.return_value = workers
+        items = [
+            {"user_text": "first process", "provider": "openai", "model": "gpt-4o"},
+            {
+                "user_text": "second process",
+                "provider": "gemini",
+                "model": "gemini-2.0-flash",
+                "prompting_strategy": "few_shot",
+            },
+        ]
+
+        response = self.client.post(
+            "/internal/jobs/generate:batch",
+            headers={"Authorization": "Bearer secret-token"},
+            json={"items": items},
+        )
+
+        self.assertEqual(response.status_code, 202)
+        payload = response.get_json()
+        self.assertEqual(payload["total"], 2)
+        self.assertEqual(
+            payload["status_url"], f"/internal/jobs/batches/{payload['batch_id']}"
+        )
+        workers.has_capacity.assert_called_once_with(2)
+        workers.submit_many.assert_called_once_with(
+            [
+                (payload["job_ids"][0], "secret-token", items[0], True),
+                (payload["job_ids"][1], "secret-token", items[1], True),
+            ]
+        )
+
+    @patch("app.api.routes._job_workers")
+    def test_internal_batch_submit_reports_invalid_items(self, mock_workers):
+        response = self.client.post(
+            "/internal/jobs/generate:batch",
+            headers={"Authorization": "Bearer secret-token"},
+            json={
+                "items": [
+                    {"user_text": "ok", "provider": "openai", "model": "gpt-4o"},
+                    {"user_text": "", "provider": "openai", "model": "gpt-4o"},
+                ]
+            },
+        )
+
+        self.assertEqual(response.status_code, 400)
+        error = response.get_json()["error"]
+        self.assertEqual(error["code"], "invalid_request")
+        self.assertEqual([item["index"] for item in error["items"]], [1])
+        mock_workers.assert_not_called()
+
+    def test_internal_batch_status_reports_counts_and_pages(self):
+        store = api_routes._job_store()
+        batch_id, job_ids = store.create_batch(3)
+        store.update_status(job_ids[0], "running")
+        store.update_status(
+            job_ids[0], "succeeded", result={"raw_response": "RAW BPMN JSON"}
+        )
+        store.update_status(job_ids[1], "running")
+
+        first = self.client.get(f"/internal/jobs/batches/{batch_id}?limit=2")
+        self.assertEqual(first.status_code, 200)
+        page = first.get_json()
+        self.assertEqual(
+            page["counts"],
+            {"queued": 1, "running": 1, "succeeded": 1, "failed": 0, "expired": 0},
+        )
+        self.assertFalse(page["done"])
+        self.assertEqual([item["index"] for item in page["items"]], [0, 1])
+        self.assertEqual(page["items"][0]["result"], {"raw_response": "RAW BPMN JSON"})
+        self.assertEqual(page["next_offset"], 2)
+
+        second = self.client.get(
+            f"/internal/jobs/batches/{batch_id}?offset={page['next_offset']}&limit=2"
+        ).get_json()
+        self.assertEqual([item["job_id"] for item in second["items"]], [job_ids[2]])
+        self.assertIsNone(second["next_offset"])
+
+    def test_internal_batch_status_unknown_batch_is_404(self):
+        response = self.client.get("/internal/jobs/batches/does-not-exist")
+        self.assertEqual(response.status_code, 404)
+
+    def test_internal_async_status_long_poll_returns_on_change(self):
+        store = api_routes._job_store()
+        job_id = store.create()
+        timer = threading.Timer(
+            0.2, store.update_status, args=(job_id, "running"), kwargs={}
+        )
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        started = time.monotonic()
+        response = self.client.get(f"/internal/jobs/{job_id}?wait=10")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["status"], "running")
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_internal_async_status_rejects_invalid_wait(self):
+        response = self.client.get("/internal/jobs/job-123?wait=soon")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"]["code"], "invalid_request")
+
+    def test_internal_async_events_streams_status_changes(self):
+        store = api_routes._job_store()
+        job_id = store.create()
+
+        def finish():
+            store.update_status(job_id, "running")
+            time.sleep(0.1)
+            store.update_status(
+                job_id, "succeeded", result={"raw_response": "RAW BPMN JSON"}
+            )
+
+        timer = threading.Timer(0.2, finish)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+        response = self.client.get(f"/internal/jobs/{job_id}/events")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = [
+            json.loads(line[len("data: "):])
+            for line in response.get_data(as_text=True).splitlines()
+            if line.startswith("data: ")
+        ]
+        self.assertEqual(
+            [event["status"] for event in events], ["queued", "running", "succeeded"]
+        )
+        self.assertEqual(events[-1]["result"], {"raw_response": "RAW BPMN JSON"})
+
+    def test_internal_async_events_unknown_job_is_404(self):
+        response = self.client.get("/internal/jobs/does-not-exist/events")
+        self.assertEqual(response.status_code, 404)
+
 
 if __name__ == "__main__":
     unittest.main()